@@ -3,15 +3,15 @@ Online Presence Middleware
 Har requestda foydalanuvchi online statusini yangilaydi.
 """
 
-from django.utils import timezone
-from django.core.cache import cache
+from accounts.presence import mark_online
 
 
 class OnlinePresenceMiddleware:
     """
     Kirgan foydalanuvchi har requestda online deb belgilanadi.
-    Redis da 5 daqiqa TTL bilan saqlanadi.
-    DB ga esa 60 soniyada bir marta yoziladi (cache orqali).
+    Holat presence servisida (Redis ZSET) saqlanadi — jarayon ichida
+    30 soniyada bir marta yoziladi. DB dagi last_online ni esa
+    persist_presence task barcha faol userlar uchun bitta UPDATE bilan yozadi.
     """
 
     def __init__(self, get_response):
@@ -19,21 +19,10 @@ class OnlinePresenceMiddleware:
 
     def __call__(self, request):
         if request.user.is_authenticated:
-            user_id = request.user.id
-            cache_key = f'online:{user_id}'
-            db_write_key = f'online_db_write:{user_id}'
-
-            # Redis da online belgisi qo'yish (5 daqiqa TTL)
-            cache.set(cache_key, 1, timeout=300)
-
-            # DB ga 60 soniyada bir marta yozish
-            if not cache.get(db_write_key):
-                try:
-                    from accounts.models import User
-                    User.objects.filter(pk=user_id).update(last_online=timezone.now())
-                except Exception:
-                    pass
-                cache.set(db_write_key, 1, timeout=60)
+            try:
+                mark_online(request.user.id)
+            except Exception:
+                pass
 
         response = self.get_response(request)
         return response
@@ -193,10 +193,12 @@ class User(AbstractUser):
 
     @property
     def is_online(self):
-        """Redis da onlinemi tekshirish (5 daqiqa ichida faol)"""
+        """Presence servisida onlinemi tekshirish (5 daqiqa ichida faol)"""
+        if getattr(self, '_is_online', None) is not None:
+            return self._is_online  # presence.annotate_online() bilan oldindan olingan
         try:
-            from django.core.cache import cache
-            return bool(cache.get(f'online:{self.id}'))
+            from accounts.presence import is_online
+            return is_online(self.id)
         except Exception:
             if self.last_online:
                 from django.utils import timezone
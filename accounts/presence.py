@@ -0,0 +1,175 @@
+"""
+TestMakon.uz - Presence Service
+Foydalanuvchilarning online holati — Redis sorted set'larda.
+"""
+
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, Value, When
+
+from core.redis_client import get_redis, redis_key
+
+ONLINE_WINDOW = 300                 # 5 daqiqa ichida faol — online
+PRESENCE_SHARDS = 16
+PRESENCE_MARK_INTERVAL = 30         # bir jarayonda bir user uchun ZADD oralig'i
+PRESENCE_RETENTION = 60 * 60        # 1 soatdan eski yozuvlar o'chiriladi
+PERSIST_BATCH_SIZE = 1000
+PERSIST_CURSOR_KEY = 'presence:persisted_at'
+PENDING_KEY = 'presence:pending'    # faqat Redis'siz rejim uchun
+
+_last_marked = {}                   # jarayon ichidagi throttle: user_id -> ts
+_LAST_MARKED_LIMIT = 50000
+
+
+def _shard_key(shard):
+    return redis_key(f'presence:{shard}')
+
+
+def _group_by_shard(user_ids):
+    shards = {}
+    for user_id in user_ids:
+        shards.setdefault(user_id % PRESENCE_SHARDS, []).append(user_id)
+    return shards
+
+
+# ============================================================
+# YOZISH
+# ============================================================
+
+def mark_online(user_id, now=None):
+    """Foydalanuvchini online deb belgilash (har requestda chaqirilsa ham arzon)"""
+    now = now or time.time()
+    if now - _last_marked.get(user_id, 0) < PRESENCE_MARK_INTERVAL:
+        return
+    if len(_last_marked) > _LAST_MARKED_LIMIT:
+        _last_marked.clear()
+    _last_marked[user_id] = now
+
+    r = get_redis()
+    if r is None:
+        cache.set(f'online:{user_id}', now, ONLINE_WINDOW)
+        pending = cache.get(PENDING_KEY) or {}
+        pending[user_id] = now
+        cache.set(PENDING_KEY, pending, None)
+        return
+    r.zadd(_shard_key(user_id % PRESENCE_SHARDS), {user_id: now})
+
+
+# ============================================================
+# O'QISH
+# ============================================================
+
+def last_seen(user_ids):
+    """{user_id: ts} — faqat presence'da bor userlar"""
+    user_ids = [int(uid) for uid in user_ids]
+    if not user_ids:
+        return {}
+
+    r = get_redis()
+    if r is None:
+        found = cache.get_many([f'online:{uid}' for uid in user_ids])
+        return {int(key.split(':')[1]): ts for key, ts in found.items()}
+
+    shards = _group_by_shard(user_ids)
+    pipe = r.pipeline(transaction=False)
+    for shard, ids in shards.items():
+        pipe.zmscore(_shard_key(shard), ids)
+    result = {}
+    for ids, scores in zip(shards.values(), pipe.execute()):
+        result.update({uid: score for uid, score in zip(ids, scores) if score is not None})
+    return result
+
+
+def online_ids(user_ids, now=None):
+    """Berilgan userlardan online bo'lganlari (set)"""
+    cutoff = (now or time.time()) - ONLINE_WINDOW
+    return {uid for uid, ts in last_seen(user_ids).items() if ts >= cutoff}
+
+
+def is_online(user_id):
+    return user_id in online_ids([user_id])
+
+
+def annotate_online(users):
+    """User obyektlariga online holatini bitta so'rov bilan biriktirish (User.is_online shuni o'qiydi)"""
+    users = list(users)
+    online = online_ids([u.id for u in users])
+    for user in users:
+        user._is_online = user.id in online
+    return users
+
+
+# ============================================================
+# DB GA YOZISH (last_online)
+# ============================================================
+
+def _collect_since(r, since):
+    seen = {}
+    pipe = r.pipeline(transaction=False)
+    for shard in range(PRESENCE_SHARDS):
+        pipe.zrangebyscore(_shard_key(shard), f'({since}', '+inf', withscores=True)
+    for members in pipe.execute():
+        seen.update({int(member): ts for member, ts in members})
+    return seen
+
+
+def _prune(r, now):
+    pipe = r.pipeline(transaction=False)
+    for shard in range(PRESENCE_SHARDS):
+        pipe.zremrangebyscore(_shard_key(shard), '-inf', now - PRESENCE_RETENTION)
+    pipe.execute()
+
+
+def apply_last_online(seen):
+    """{user_id: ts} ni User.last_online ga yozish — har PERSIST_BATCH_SIZE userga bitta UPDATE"""
+    from accounts.models import User
+
+    items = sorted(
+        (uid, datetime.fromtimestamp(ts, tz=dt_timezone.utc)) for uid, ts in seen.items()
+    )
+    table = User._meta.db_table
+    with transaction.atomic():
+        for start in range(0, len(items), PERSIST_BATCH_SIZE):
+            chunk = items[start:start + PERSIST_BATCH_SIZE]
+            if connection.vendor == 'postgresql':
+                values = ', '.join(['(%s, %s::timestamptz)'] * len(chunk))
+                params = [x for pair in chunk for x in pair]
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'UPDATE {table} AS u SET last_online = v.seen '
+                        f'FROM (VALUES {values}) AS v(id, seen) WHERE u.id = v.id',
+                        params,
+                    )
+            else:
+                User.objects.filter(id__in=[uid for uid, _ in chunk]).update(
+                    last_online=Case(
+                        *[When(id=uid, then=Value(seen)) for uid, seen in chunk],
+                        output_field=DateTimeField(),
+                    )
+                )
+
+
+def persist_last_online():
+    """
+    Oxirgi persist'dan beri faol bo'lgan userlarning last_online ini yozish.
+    Returns: yangilangan userlar soni.
+    """
+    now = time.time()
+    r = get_redis()
+    if r is None:
+        seen = cache.get(PENDING_KEY) or {}
+        cache.delete(PENDING_KEY)
+    else:
+        since = float(r.get(redis_key(PERSIST_CURSOR_KEY)) or now - PRESENCE_RETENTION)
+        seen = _collect_since(r, since)
+
+    if seen:
+        apply_last_online(seen)
+    if r is not None:
+        if seen:
+            r.set(redis_key(PERSIST_CURSOR_KEY), max(seen.values()))
+        _prune(r, now)
+    return len(seen)
@@ -37,3 +37,16 @@ def send_subscription_confirmation(self, user_id):
         )
     except Exception as exc:
         raise self.retry(exc=exc)
+
+
+@shared_task(ignore_result=True)
+def persist_presence():
+    """
+    Presence'dagi oxirgi faollik vaqtlarini User.last_online ga yozish.
+    Celery beat har daqiqada — barcha faol userlar bitta UPDATE bilan.
+    """
+    from accounts.presence import persist_last_online
+    updated = persist_last_online()
+    if updated:
+        logger.info(f"persist_presence: {updated} ta user last_online yangilandi")
+    return updated
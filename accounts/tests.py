@@ -429,3 +429,44 @@ class ProfileViewTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context['profile_user'], other_user)
+
+
+class PresenceTest(TestCase):
+    """Presence servisi — batch online so'rovi va last_online bulk yozish"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import presence
+        cache.clear()
+        presence._last_marked.clear()
+        self.users = [
+            User.objects.create_user(phone_number=f'+99890777000{i}', password='password123', first_name=f'P{i}')
+            for i in range(3)
+        ]
+
+    def test_online_ids_batch(self):
+        """Faqat belgilangan userlar online"""
+        from .presence import mark_online, online_ids
+        mark_online(self.users[0].id)
+        mark_online(self.users[2].id)
+        self.assertEqual(online_ids([u.id for u in self.users]), {self.users[0].id, self.users[2].id})
+        self.assertTrue(self.users[0].is_online)
+        self.assertFalse(self.users[1].is_online)
+
+    def test_middleware_does_not_write_db(self):
+        """Request paytida last_online DB ga yozilmaydi, persist task bitta UPDATE bilan yozadi"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .presence import persist_last_online
+
+        client = Client()
+        client.force_login(self.users[1])
+        client.get(reverse('accounts:profile'))
+        self.users[1].refresh_from_db()
+        self.assertIsNone(self.users[1].last_online)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(persist_last_online(), 1)
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]), 1)
+        self.users[1].refresh_from_db()
+        self.assertIsNotNone(self.users[1].last_online)
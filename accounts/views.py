@@ -20,6 +20,7 @@ from django.utils import timezone
 from django.conf import settings as django_settings
 
 from .models import User, Friendship, UserActivity, PhoneVerification, Badge, UserBadge, TelegramAuthCode
+from .presence import annotate_online
 
 # ====================
 # TELEGRAM SETTINGS
@@ -536,6 +537,7 @@ def friends_list(request):
     for f in friendships:
         friend = f.to_user if f.from_user == request.user else f.from_user
         friends.append(friend)
+    annotate_online(friends)
 
     pending_requests = Friendship.objects.filter(
         to_user=request.user, status='pending'
@@ -0,0 +1,175 @@
+"""
+TestMakon.uz - Behavioral Notifications
+send_smart_behavioral_notifications uchun to'plamli (set-based) tahlil.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Avg, F, Max, Q
+
+BATCH_SIZE = 1000
+IMPROVEMENT_THRESHOLD = 5
+
+# Tur -> (notification_type, sarlavha boshlanishi) — dedup shu bo'yicha
+KINDS = {
+    'best': ('achievement', '🏆 Bugun ajoyib'),
+    'streak': ('system', '🔥'),
+    'improved': ('system', '📈'),
+}
+
+
+# ============================================================
+# KOHORTALAR
+# ============================================================
+
+def today_best(today):
+    """{user_id: (eng yaxshi foiz, streak)} — bugun test yakunlaganlar"""
+    from tests_app.models import TestAttempt
+
+    rows = (
+        TestAttempt.objects.filter(status='completed', started_at__date=today)
+        .values('user_id', 'user__current_streak')
+        .annotate(best=Max('percentage'))
+    )
+    return {row['user_id']: (row['best'], row['user__current_streak']) for row in rows}
+
+
+def streak_cohort(today, exclude_ids):
+    """[(user_id, streak), ...] — 3+ kunlik streak, bugun faol, lekin test ishlamagan"""
+    from accounts.models import User
+
+    return list(
+        User.objects.filter(current_streak__gte=3, last_activity_date=today)
+        .exclude(id__in=exclude_ids)
+        .values_list('id', 'current_streak')
+    )
+
+
+def improved_cohort(today):
+    """[(user_id, bu hafta o'rtacha, o'tgan hafta o'rtacha), ...] — sezilarli o'sganlar"""
+    from tests_app.models import TestAttempt
+
+    this_week_start = today - timedelta(days=7)
+    last_week_start = today - timedelta(days=14)
+    rows = (
+        TestAttempt.objects.filter(
+            status='completed',
+            started_at__date__gte=last_week_start,
+            user__last_activity_date__gte=this_week_start,
+        )
+        .values('user_id')
+        .annotate(
+            this_avg=Avg('percentage', filter=Q(started_at__date__gte=this_week_start)),
+            last_avg=Avg('percentage', filter=Q(started_at__date__lt=this_week_start)),
+        )
+        .filter(last_avg__gt=0, this_avg__gt=F('last_avg') + IMPROVEMENT_THRESHOLD)
+    )
+    return [(row['user_id'], row['this_avg'], row['last_avg']) for row in rows]
+
+
+def already_notified(today):
+    """{(user_id, tur), ...} — bugun yuborilgan behavioral bildirishnomalar"""
+    from news.models import Notification
+
+    match = Q()
+    for notification_type, prefix in KINDS.values():
+        match |= Q(notification_type=notification_type, title__startswith=prefix)
+    sent = set()
+    for user_id, notification_type, title in (
+        Notification.objects.filter(match, created_at__date=today)
+        .values_list('user_id', 'notification_type', 'title')
+    ):
+        for kind, (kind_type, prefix) in KINDS.items():
+            if notification_type == kind_type and title.startswith(prefix):
+                sent.add((user_id, kind))
+    return sent
+
+
+# ============================================================
+# XABARLAR
+# ============================================================
+
+def _best_message(user_id, best_pct, streak):
+    return dict(
+        user_id=user_id,
+        notification_type='achievement',
+        title="🏆 Bugun ajoyib natija!",
+        message=(
+            f"Bugun {best_pct:.0f}% natija ko'rsatdingiz! "
+            f"Joriy streak: {streak or 1} kun. "
+            f"Shunday davom eting — maqsadga yaqinlashyapsiz!"
+        ),
+        link='/ai/progress/',
+    )
+
+
+def _streak_message(user_id, streak):
+    return dict(
+        user_id=user_id,
+        notification_type='system',
+        title=f"🔥 {streak} kunlik streak!",
+        message=(
+            f"Siz {streak} kun ketma-ket o'qidingiz — bu zo'r! "
+            f"DTM imtihoniga tayyorgarlikni shu tartibda davom ettiring."
+        ),
+        link='/ai/progress/',
+    )
+
+
+def _improved_message(user_id, this_avg, last_avg):
+    return dict(
+        user_id=user_id,
+        notification_type='system',
+        title="📈 Natijangiz yaxshilandi!",
+        message=(
+            f"Bu hafta o'rtacha natijangiz {this_avg:.0f}% — "
+            f"o'tgan haftaga nisbatan +{this_avg - last_avg:.0f}% oshdi. "
+            f"Shu sur'atda davom etsangiz, DTMda yaxshi natija olasiz!"
+        ),
+        link='/ai/progress/',
+    )
+
+
+def build_notifications(today):
+    """Bugun yuborilishi kerak bo'lgan bildirishnomalar (dict lar ro'yxati)"""
+    from tests_app.models import TestAttempt
+
+    sent = already_notified(today)
+    pending = []
+
+    best = today_best(today)
+    for user_id, (best_pct, streak) in best.items():
+        if (user_id, 'best') not in sent:
+            pending.append(_best_message(user_id, best_pct, streak))
+
+    todays_users = TestAttempt.objects.filter(
+        status='completed', started_at__date=today,
+    ).values('user_id')
+    for user_id, streak in streak_cohort(today, todays_users):
+        if (user_id, 'streak') not in sent:
+            pending.append(_streak_message(user_id, streak))
+
+    for user_id, this_avg, last_avg in improved_cohort(today):
+        if (user_id, 'improved') not in sent:
+            pending.append(_improved_message(user_id, this_avg, last_avg))
+
+    return pending
+
+
+def send_behavioral_notifications(today):
+    """Bildirishnomalarni bo'laklarda yozish va push qilish. Returns: yaratilganlar soni"""
+    from accounts.presence import online_ids
+    from news.fanout import push_many
+    from news.inbox import invalidate
+    from news.models import Notification
+
+    pending = build_notifications(today)
+    for start in range(0, len(pending), BATCH_SIZE):
+        notifications = Notification.objects.bulk_create(
+            [Notification(**data) for data in pending[start:start + BATCH_SIZE]]
+        )
+        user_ids = [n.user_id for n in notifications]
+        invalidate(*user_ids)
+        online = online_ids(user_ids)
+        push_many([n for n in notifications if n.user_id in online])
+    return len(pending)
@@ -0,0 +1,186 @@
+"""
+TestMakon.uz - Inactivity Reminders
+send_inactivity_reminders uchun bo'laklangan (streaming) pipeline.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+TELEGRAM_RATE = 25                  # xabar/sekund (Telegram limiti: 30/sek)
+TELEGRAM_WORKERS = 8
+
+# Kohorta: (kamida kun, ko'pi bilan kun yoki None, cooldown kun, sarlavha, matn, telegram)
+COHORTS = {
+    'short': (
+        2, 4, 3,
+        "📚 Testlar sizi kutmoqda",
+        "{days} kun test ishlamadingiz. DTMga tayyorgarlik muntazam mashq talab qiladi. "
+        "Bugun qaytib keling!",
+        False,
+    ),
+    'long': (
+        5, None, 5,
+        "⚠️ Uzoq vaqt bo'lmadingiz!",
+        "{days} kun davomida platformaga kirmadingiz. DTM imtihoni yaqinlashmoqda — "
+        "bugun eng muhim qadam qiling!",
+        True,
+    ),
+}
+
+TELEGRAM_TEXT = (
+    "⚠️ Salom, {name}!\n\n"
+    "{days} kun TestMakon.uzga kirmagansiz.\n"
+    "DTMga tayyorgarlik to'xtamaydi — bugun testlar ishlab keling! 💪\n\n"
+    "🌐 testmakon.uz"
+)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def cohort(today, kind):
+    """
+    Kohorta userlari — cooldown ichida reminder olmaganlar.
+    Cooldown NOT EXISTS subquery sifatida shu so'rovning o'zida tekshiriladi.
+    """
+    from accounts.models import User
+    from news.models import Notification
+
+    min_days, max_days, cooldown_days, *_ = COHORTS[kind]
+    recent_reminder = Notification.objects.filter(
+        user_id=OuterRef('pk'),
+        notification_type='reminder',
+        created_at__gte=_day_start(today - timedelta(days=cooldown_days)),
+    )
+    qs = User.objects.filter(
+        is_active=True,
+        last_activity_date__lte=today - timedelta(days=min_days),
+    )
+    if max_days is not None:
+        qs = qs.filter(last_activity_date__gt=today - timedelta(days=max_days + 1))
+    return qs.exclude(Exists(recent_reminder))
+
+
+def iter_chunks(qs, fields, size=CHUNK_SIZE):
+    """Keyset pagination — (id, ...) tuple'lar ro'yxatlari"""
+    last_id = 0
+    while True:
+        rows = list(qs.filter(id__gt=last_id).order_by('id').values_list('id', *fields)[:size])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+# ============================================================
+# TELEGRAM
+# ============================================================
+
+def _send_one(message):
+    from tgbot.tasks import _tg_call
+
+    user_id, chat_id, text = message
+    try:
+        result = _tg_call('sendMessage', {'chat_id': chat_id, 'text': text})
+    except Exception as e:
+        logger.warning(f"Telegram xabar xatosi: user={user_id}, {e}")
+        return user_id, False, False
+    return user_id, bool(result.get('ok')), _chat_gone(result)
+
+
+def _chat_gone(result):
+    """403 — user botni bloklagan, 400 "chat not found" — chat yo'q"""
+    error_code = result.get('error_code')
+    if error_code == 403:
+        return True
+    return error_code == 400 and 'chat not found' in (result.get('description') or '').lower()
+
+
+def send_telegram(messages, rate=TELEGRAM_RATE):
+    """
+    [(user_id, chat_id, text), ...] ni parallel yuborish, sekundiga `rate` tadan.
+    Returns: (yuborilganlar soni, botni bloklagan user_id lar)
+    """
+    sent = 0
+    blocked = []
+    if not messages or not settings.TELEGRAM_BOT_TOKEN:
+        return sent, blocked
+
+    with ThreadPoolExecutor(max_workers=TELEGRAM_WORKERS) as pool:
+        for start in range(0, len(messages), rate):
+            window_started = time.monotonic()
+            for user_id, ok, chat_gone in pool.map(_send_one, messages[start:start + rate]):
+                if ok:
+                    sent += 1
+                elif chat_gone:
+                    blocked.append(user_id)
+            if start + rate < len(messages):
+                time.sleep(max(0.0, 1 - (time.monotonic() - window_started)))
+    return sent, blocked
+
+
+# ============================================================
+# PIPELINE
+# ============================================================
+
+def _remind_chunk(today, kind, rows):
+    """Bir bo'lak: bildirishnomalar, push va (kerak bo'lsa) Telegram"""
+    from accounts.models import User
+    from accounts.presence import online_ids
+    from news.fanout import push_many
+    from news.inbox import invalidate
+    from news.models import Notification
+
+    _, _, _, title, template, telegram = COHORTS[kind]
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            user_id=user_id,
+            notification_type='reminder',
+            title=title,
+            message=template.format(days=(today - last_activity).days),
+            link='/tests/',
+        )
+        for user_id, last_activity, *_ in rows
+    ])
+    user_ids = [row[0] for row in rows]
+    invalidate(*user_ids)
+    online = online_ids(user_ids)
+    push_many([n for n in notifications if n.user_id in online])
+
+    tg_sent = 0
+    if telegram:
+        # Bildirishnoma allaqachon yozilgan — cooldown Telegram'ni ham qamraydi
+        messages = [
+            (user_id, telegram_id, TELEGRAM_TEXT.format(
+                name=first_name or username or "O'quvchi",
+                days=(today - last_activity).days,
+            ))
+            for user_id, last_activity, telegram_id, first_name, username in rows
+            if telegram_id
+        ]
+        tg_sent, blocked = send_telegram(messages)
+        if blocked:
+            User.objects.filter(id__in=blocked).update(telegram_id=None)
+    return len(notifications), tg_sent
+
+
+def send_inactivity_reminders(today):
+    """Barcha kohortalar bo'yicha eslatmalar. Returns: (yaratilgan, telegram yuborilgan)"""
+    created = tg_sent = 0
+    for kind in COHORTS:
+        fields = ('last_activity_date', 'telegram_id', 'first_name', 'telegram_username')
+        for rows in iter_chunks(cohort(today, kind), fields):
+            chunk_created, chunk_sent = _remind_chunk(today, kind, rows)
+            created += chunk_created
+            tg_sent += chunk_sent
+    return created, tg_sent
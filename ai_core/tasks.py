@@ -561,122 +561,13 @@ def send_smart_behavioral_notifications():
     - Bugun test ishlaganlarni yutuq bilan tabriklaydi
     - 3+ kun streak foydalanuvchilarga maxsus tashakkur
     - O'tgan haftaga nisbatan natijasi yaxshilanganlarga motivatsiya
+    Kohortalar bir necha GROUP BY so'rovda hisoblanadi (ai_core.behavioral).
     """
-    from accounts.models import User
-    from news.models import Notification
-    from tests_app.models import TestAttempt
-    import django.db.models as dj_models
-
-    today = timezone.localdate()
-    this_week_start = today - timedelta(days=7)
-    last_week_start = today - timedelta(days=14)
-    created = 0
-
-    # Bugun test ishlaganlar
-    todays_attempts = TestAttempt.objects.filter(
-        status='completed',
-        created_at__date=today,
-    ).values('user_id', 'percentage')
-
-    user_today_best = {}
-    for row in todays_attempts:
-        uid = row['user_id']
-        if uid not in user_today_best or row['percentage'] > user_today_best[uid]:
-            user_today_best[uid] = row['percentage']
-
-    for user_id, best_pct in user_today_best.items():
-        already = Notification.objects.filter(
-            user_id=user_id,
-            notification_type='achievement',
-            created_at__date=today,
-            title__startswith='🏆 Bugun ajoyib'
-        ).exists()
-        if already:
-            continue
-        try:
-            user = User.objects.get(id=user_id)
-            streak = user.current_streak or 1
-            Notification.objects.create(
-                user_id=user_id,
-                notification_type='achievement',
-                title="🏆 Bugun ajoyib natija!",
-                message=(
-                    f"Bugun {best_pct:.0f}% natija ko'rsatdingiz! "
-                    f"Joriy streak: {streak} kun. "
-                    f"Shunday davom eting — maqsadga yaqinlashyapsiz!"
-                ),
-                link='/ai/progress/',
-            )
-            created += 1
-        except User.DoesNotExist:
-            continue
-
-    # 3+ kun streak foydalanuvchilar (bugun test ishlamaganlar)
-    streak_users = User.objects.filter(
-        current_streak__gte=3,
-        last_activity_date=today,
-    ).exclude(id__in=list(user_today_best.keys()))
-
-    for user in streak_users:
-        already = Notification.objects.filter(
-            user_id=user.id,
-            notification_type='system',
-            created_at__date=today,
-            title__startswith='🔥'
-        ).exists()
-        if already:
-            continue
-        Notification.objects.create(
-            user_id=user.id,
-            notification_type='system',
-            title=f"🔥 {user.current_streak} kunlik streak!",
-            message=(
-                f"Siz {user.current_streak} kun ketma-ket o'qidingiz — bu zo'r! "
-                f"DTM imtihoniga tayyorgarlikni shu tartibda davom ettiring."
-            ),
-            link='/ai/progress/',
-        )
-        created += 1
-
-    # O'tgan haftaga nisbatan yaxshilanganlar
-    for user in User.objects.filter(last_activity_date__gte=this_week_start):
-        try:
-            this_avg = TestAttempt.objects.filter(
-                user=user, status='completed',
-                created_at__date__gte=this_week_start,
-            ).aggregate(avg=dj_models.Avg('percentage'))['avg'] or 0
-
-            last_avg = TestAttempt.objects.filter(
-                user=user, status='completed',
-                created_at__date__gte=last_week_start,
-                created_at__date__lt=this_week_start,
-            ).aggregate(avg=dj_models.Avg('percentage'))['avg'] or 0
-
-            if this_avg > last_avg + 5 and last_avg > 0:
-                already = Notification.objects.filter(
-                    user_id=user.id,
-                    notification_type='system',
-                    created_at__date=today,
-                    title__startswith='📈'
-                ).exists()
-                if not already:
-                    improvement = this_avg - last_avg
-                    Notification.objects.create(
-                        user_id=user.id,
-                        notification_type='system',
-                        title="📈 Natijangiz yaxshilandi!",
-                        message=(
-                            f"Bu hafta o'rtacha natijangiz {this_avg:.0f}% — "
-                            f"o'tgan haftaga nisbatan +{improvement:.0f}% oshdi. "
-                            f"Shu sur'atda davom etsangiz, DTMda yaxshi natija olasiz!"
-                        ),
-                        link='/ai/progress/',
-                    )
-                    created += 1
-        except Exception:
-            continue
+    from .behavioral import send_behavioral_notifications
 
+    created = send_behavioral_notifications(timezone.localdate())
     logger.info(f"Behavioral notifications: {created} ta yaratildi")
+    return created
 
 
 @shared_task
@@ -692,109 +583,13 @@ def send_inactivity_reminders():
         yuborilmagan bo'lsa yuboriladi.
       - Telegram xabarlari ham Notification qator bilan bir vaqtda yaratiladi,
         shuning uchun bir marta yuborilsa keyingi 5 kun ichida qayta yuborilmaydi.
+    Kohorta va cooldown SQL da, yozish bo'laklarda (ai_core.inactivity).
     """
-    from accounts.models import User
-    from news.models import Notification
-
-    today = timezone.localdate()
-    two_days_ago = today - timedelta(days=2)
-    five_days_ago = today - timedelta(days=5)
-
-    # Cooldown oynalar: bu muddat ichida reminder yuborilgan bo'lsa qaytadan yubormaymiz
-    reminder_cooldown_2 = today - timedelta(days=3)   # 2-4 kun inactive uchun
-    reminder_cooldown_5 = today - timedelta(days=5)   # 5+ kun inactive uchun
-
-    created = 0
-    tg_sent = 0
-
-    # ═════ 2-4 kun faol bo'lmaganlar — faqat sayt Notification ═════
-    inactive_2 = User.objects.filter(
-        last_activity_date__lte=two_days_ago,
-        last_activity_date__gt=five_days_ago,
-        is_active=True,
-    )
-    for user in inactive_2:
-        # Oxirgi 3 kun ichida reminder bormi?
-        already = Notification.objects.filter(
-            user_id=user.id,
-            notification_type='reminder',
-            created_at__date__gte=reminder_cooldown_2,
-        ).exists()
-        if already:
-            continue
-        days_inactive = (today - user.last_activity_date).days
-        Notification.objects.create(
-            user_id=user.id,
-            notification_type='reminder',
-            title="📚 Testlar sizi kutmoqda",
-            message=(
-                f"{days_inactive} kun test ishlamadingiz. "
-                f"DTMga tayyorgarlik muntazam mashq talab qiladi. "
-                f"Bugun qaytib keling!"
-            ),
-            link='/tests/',
-        )
-        created += 1
-
-    # ═════ 5+ kun faol bo'lmaganlar — sayt + telegram ═════
-    inactive_5 = User.objects.filter(
-        last_activity_date__lte=five_days_ago,
-        is_active=True,
-    ).exclude(last_activity_date=None)
-
-    for user in inactive_5:
-        # Oxirgi 5 kun ichida reminder bormi? (sayt + telegram har ikkisi
-        # ham shu Notification bilan birga yaratiladi, shuning uchun
-        # bir marta tekshirish kifoya — spam oldini oladi)
-        already = Notification.objects.filter(
-            user_id=user.id,
-            notification_type='reminder',
-            created_at__date__gte=reminder_cooldown_5,
-        ).exists()
-        if already:
-            continue
-        days_inactive = (today - user.last_activity_date).days
-        Notification.objects.create(
-            user_id=user.id,
-            notification_type='reminder',
-            title="⚠️ Uzoq vaqt bo'lmadingiz!",
-            message=(
-                f"{days_inactive} kun davomida platformaga kirmadingiz. "
-                f"DTM imtihoni yaqinlashmoqda — bugun eng muhim qadam qiling!"
-            ),
-            link='/tests/',
-        )
-        created += 1
-
-        # Telegram xabar yuborish — yuqoridagi cooldown tekshirildi,
-        # shuning uchun 5 kunda bir martadan ko'p yuborilmaydi
-        if user.telegram_id:
-            try:
-                import requests
-                from django.conf import settings as dj_settings
-                bot_token = dj_settings.TELEGRAM_BOT_TOKEN
-                if bot_token:
-                    name = user.first_name or user.username or "O'quvchi"
-                    text = (
-                        f"⚠️ Salom, {name}!\n\n"
-                        f"{days_inactive} kun TestMakon.uzga kirmagansiz.\n"
-                        f"DTMga tayyorgarlik to'xtamaydi — bugun testlar ishlab keling! 💪\n\n"
-                        f"🌐 testmakon.uz"
-                    )
-                    resp = requests.post(
-                        f"https://api.telegram.org/bot{bot_token}/sendMessage",
-                        json={"chat_id": user.telegram_id, "text": text},
-                        timeout=5,
-                    )
-                    # Agar user botni bloklagan bo'lsa, telegram_id ni tozalash
-                    if resp.status_code == 403:
-                        User.objects.filter(id=user.id).update(telegram_id=None)
-                    elif resp.ok:
-                        tg_sent += 1
-            except Exception as tg_err:
-                logger.warning(f"Telegram xabar xatosi: user={user.id}, {tg_err}")
+    from .inactivity import send_inactivity_reminders as run_reminders
 
+    created, tg_sent = run_reminders(timezone.localdate())
     logger.info(f"Inactivity reminders: {created} ta Notification, {tg_sent} ta Telegram yuborildi")
+    return created
 
 
 @shared_task(bind=True, max_retries=2, default_retry_delay=60)
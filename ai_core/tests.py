@@ -455,7 +455,7 @@ class SendSmartBehavioralNotificationsTest(TestCase):
             user=self.user, test=test, status='completed',
             total_questions=10, correct_answers=5, percentage=50.0,
         )
-        TestAttempt.objects.filter(id=att1.id).update(created_at=last_week)
+        TestAttempt.objects.filter(id=att1.id).update(started_at=last_week)
 
         # Bu hafta: 80%
         test2 = make_test(self.user, self.subject, slug='imp-test2')
@@ -479,7 +479,7 @@ class SendSmartBehavioralNotificationsTest(TestCase):
             user=self.user, test=test, status='completed',
             total_questions=10, correct_answers=8, percentage=80.0,
         )
-        TestAttempt.objects.filter(id=att1.id).update(created_at=last_week)
+        TestAttempt.objects.filter(id=att1.id).update(started_at=last_week)
 
         # Bu hafta: 60%
         test2 = make_test(self.user, self.subject, slug='no-imp-test2')
@@ -494,6 +494,23 @@ class SendSmartBehavioralNotificationsTest(TestCase):
         ).first()
         self.assertIsNone(notif)
 
+    def test_query_count_independent_of_user_count(self):
+        """Userlar soni oshsa ham so'rovlar soni o'zgarmaydi (set-based)"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        test = make_test(self.user, self.subject, slug='bulk-test')
+        for i in range(5):
+            user = make_user(phone=f'+99890555000{i}', current_streak=4,
+                             last_activity_date=timezone.localdate())
+            if i % 2:
+                make_attempt(user, test, percentage=60.0 + i)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self._run()
+        self.assertLessEqual(len(ctx.captured_queries), 8)
+        self.assertEqual(Notification.objects.filter(title__startswith='🏆').count(), 2)
+        self.assertEqual(Notification.objects.filter(title__startswith='🔥').count(), 3)
+
 
 class SendInactivityRemindersTest(TestCase):
     def setUp(self):
@@ -572,6 +589,81 @@ class SendInactivityRemindersTest(TestCase):
             Notification.objects.filter(user=self.user).exists()
         )
 
+    @patch('requests.post')
+    def test_blocked_telegram_ids_cleared(self, mock_post):
+        """403 va "chat not found" userlarining telegram_id si tozalanadi, boshqa 400 da saqlanadi."""
+        from django.test import override_settings
+        from ai_core.inactivity import send_inactivity_reminders
+
+        blocked = make_user(phone='+998907770001', telegram_id=111)
+        ok_user = make_user(phone='+998907770002', telegram_id=222)
+        missing = make_user(phone='+998907770003', telegram_id=333)
+        bad_request = make_user(phone='+998907770004', telegram_id=444)
+        users = [blocked, ok_user, missing, bad_request]
+        User.objects.filter(id__in=[u.id for u in users]).update(
+            last_activity_date=timezone.localdate() - timedelta(days=7)
+        )
+        responses = {
+            111: {'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'},
+            222: {'ok': True},
+            333: {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat not found'},
+            444: {'ok': False, 'error_code': 400, 'description': 'Bad Request: message is too long'},
+        }
+
+        def fake_post(url, json=None, timeout=None, **kwargs):
+            resp = MagicMock()
+            resp.json.return_value = responses[json['chat_id']]
+            return resp
+
+        mock_post.side_effect = fake_post
+        with override_settings(TELEGRAM_BOT_TOKEN='test-token'):
+            created, tg_sent = send_inactivity_reminders(timezone.localdate())
+
+        self.assertEqual((created, tg_sent), (4, 1))
+        for user in users:
+            user.refresh_from_db()
+        self.assertIsNone(blocked.telegram_id)
+        self.assertIsNone(missing.telegram_id)
+        self.assertEqual(ok_user.telegram_id, 222)
+        self.assertEqual(bad_request.telegram_id, 444)
+
+    @patch('requests.post')
+    def test_telegram_greeting_falls_back_to_username(self, mock_post):
+        """Ismi bo'lmagan userga username bilan murojaat qilinadi."""
+        from django.test import override_settings
+        from ai_core.inactivity import send_inactivity_reminders
+
+        user = make_user(phone='+998907770005', telegram_id=555, telegram_username='olim')
+        User.objects.filter(id=user.id).update(
+            first_name='', last_activity_date=timezone.localdate() - timedelta(days=7)
+        )
+        mock_post.return_value.json.return_value = {'ok': True}
+        with override_settings(TELEGRAM_BOT_TOKEN='test-token'):
+            send_inactivity_reminders(timezone.localdate())
+
+        self.assertIn('Salom, olim!', mock_post.call_args.kwargs['json']['text'])
+
+    def test_query_count_does_not_grow_with_users(self):
+        """Kohorta bo'lakda yoziladi — so'rovlar soni user soniga bog'liq emas."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def run_for(count, prefix):
+            users = [make_user(phone=f'+99890{prefix}{i:04d}') for i in range(count)]
+            User.objects.filter(id__in=[u.id for u in users]).update(
+                last_activity_date=timezone.localdate() - timedelta(days=3)
+            )
+            with CaptureQueriesContext(connection) as ctx:
+                self._run()
+            return len(ctx.captured_queries)
+
+        small = run_for(2, '555')
+        large = run_for(12, '666')
+        self.assertEqual(small, large)
+        self.assertEqual(
+            Notification.objects.filter(notification_type='reminder').count(), 14
+        )
+
 
 class GenerateWeeklyAiReportTest(TestCase):
     def setUp(self):
@@ -19,6 +19,7 @@ from ai_core.models import AIConversation, AIMessage, AIRecommendation
 from universities.models import University
 from news.models import Article
 from leaderboard.models import GlobalLeaderboard
+from tests_app.question_stats import record_question_answers
 
 from .serializers import (
     RegisterSerializer, LoginSerializer, UserProfileSerializer,
@@ -290,6 +291,7 @@ class TestFinishView(APIView):
         correct = 0
         wrong = 0
         skipped = 0
+        stats_results = []
 
         for ans_data in serializer.validated_data['answers']:
             question_id = ans_data['question_id']
@@ -328,10 +330,10 @@ class TestFinishView(APIView):
                 }
             )
 
-            question.times_answered += 1
-            if is_correct:
-                question.times_correct += 1
-            question.save(update_fields=['times_answered', 'times_correct'])
+            stats_results.append((question.id, is_correct))
+
+        # Savol statistikasi — bitta batch (hisoblagichlar pipeline orqali)
+        record_question_answers(stats_results)
 
         attempt.correct_answers = correct
         attempt.wrong_answers = wrong
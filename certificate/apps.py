@@ -5,3 +5,6 @@ class CertificateConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'certificate'
     verbose_name = 'Milliy Sertifikat'
+
+    def ready(self):
+        import certificate.signals  # noqa: F401
@@ -0,0 +1,209 @@
+"""
+TestMakon.uz — Milliy Sertifikat Autosave
+Mock yechish sahifasi uchun write-behind javob buferi.
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from tests_app.buffer_meta import get_buffer_meta, mark_flushed, meta_keys, needs_flush, touch_buffer
+
+from .grading import get_answer_key
+from .models import CertMockAttempt, CertAttemptAnswer
+
+AUTOSAVE_TTL = 60 * 60 * 12           # 12 soat — eng uzun mock ham sig'adi
+AUTOSAVE_IDLE_SECONDS = 30            # 30 soniya o'zgarish bo'lmasa — flush
+AUTOSAVE_MAX_AGE_SECONDS = 120        # 2 daqiqadan eski bufer — flush
+AUTOSAVE_MAX_BATCH = 100              # bitta so'rovdagi o'zgarishlar chegarasi
+ACTIVE_STATUSES = ('started', 'in_progress')
+BUFFERED_FIELDS = ['selected_choice', 'text_answer', 'structured_answer', 'is_skipped']
+
+
+def _context_key(uuid):
+    return f'cert_autosave_ctx:{uuid}'
+
+
+def _answer_key(uuid, question_id):
+    return f'cert_autosave:{uuid}:{question_id}'
+
+
+META_PREFIX = 'cert_autosave_meta'
+
+
+# ============================================================
+# URINISH KONTEKSTI
+# ============================================================
+
+def get_attempt_context(uuid, user_id):
+    """
+    {'id', 'uuid', 'user_id', 'mock_id', 'status'} — faqat urinish egasi uchun,
+    bo'lmasa None. Birinchi chaqiruvda bitta so'rov, keyin cache'dan.
+    """
+    context = cache.get(_context_key(uuid))
+    if context is None:
+        context = CertMockAttempt.objects.filter(uuid=uuid).values(
+            'id', 'uuid', 'user_id', 'mock_id', 'status'
+        ).first()
+        if context is None:
+            return None
+        cache.set(_context_key(uuid), context, AUTOSAVE_TTL)
+    if context['user_id'] != user_id:
+        return None
+    return context
+
+
+# ============================================================
+# BUFER
+# ============================================================
+
+def normalize_delta(spec, delta):
+    """
+    Bitta o'zgarishni submit_answer qoidalari bo'yicha javob holatiga aylantirish.
+    Returns: (choice_id, text_answer, structured_answer, is_skipped) yoki noto'g'ri bo'lsa None.
+    """
+    if delta.get('skipped'):
+        return None, '', None, True
+
+    qtype = spec['type']
+    if qtype == 'choice':
+        try:
+            choice_id = int(delta.get('choice_id'))
+        except (TypeError, ValueError):
+            return None
+        if choice_id not in spec['choices']:
+            return None
+        return choice_id, '', None, False
+    if qtype == 'short_open':
+        text = str(delta.get('text_answer', '')).strip()
+        return None, text, None, not text
+    structured = delta.get('structured_answer')
+    if structured and isinstance(structured, dict):
+        return None, '', structured, False
+    return None, '', None, True
+
+
+def buffer_answers(context, deltas):
+    """
+    O'zgarishlar paketini buferga yozish (bir savolga bir nechta — oxirgisi qoladi).
+    Returns: {question_id: is_skipped} — qabul qilinganlar.
+    """
+    key = get_answer_key(context['mock_id'])
+    now = time.time()
+    entries, accepted = {}, {}
+    for delta in deltas[:AUTOSAVE_MAX_BATCH]:
+        if not isinstance(delta, dict):
+            continue
+        try:
+            question_id = int(delta.get('question_id'))
+        except (TypeError, ValueError):
+            continue
+        spec = key.get(question_id)
+        if spec is None or not spec['active']:
+            continue
+        state = normalize_delta(spec, delta)
+        if state is None:
+            continue
+        entries[_answer_key(context['uuid'], question_id)] = state + (now,)
+        accepted[question_id] = state[3]
+
+    if entries:
+        cache.set_many(entries, AUTOSAVE_TTL)
+        touch_buffer(META_PREFIX, context['uuid'], now, AUTOSAVE_TTL)
+    return accepted
+
+
+def get_buffered_answers(uuid, question_ids):
+    """Buferdagi javoblar: {question_id: (choice_id, text, structured, is_skipped, ts)}"""
+    keys = {_answer_key(uuid, qid): qid for qid in question_ids}
+    return {keys[k]: v for k, v in cache.get_many(list(keys)).items()}
+
+
+def discard_buffered_answer(uuid, question_id):
+    """submit_answer to'g'ridan-to'g'ri yozganda — eski bufer qiymati ustidan yozmasin"""
+    cache.delete(_answer_key(uuid, question_id))
+
+
+def flush_attempt_buffer(attempt_id, uuid, mock_id):
+    """
+    Buferdagi javoblarni CertAttemptAnswer ga bulk yozish (idempotent upsert).
+    Returns: yozilgan (yaratilgan + o'zgargan) javoblar soni.
+    """
+    if not get_buffer_meta(META_PREFIX, [uuid]):
+        return 0
+    buffered = get_buffered_answers(uuid, get_answer_key(mock_id).keys())
+    if not buffered:
+        return 0
+
+    existing = {
+        a.question_id: a
+        for a in CertAttemptAnswer.objects.filter(attempt_id=attempt_id, question_id__in=list(buffered))
+    }
+    to_create, to_update = [], []
+    for qid, (choice_id, text, structured, is_skipped, _) in buffered.items():
+        ans = existing.get(qid)
+        if ans is None:
+            to_create.append(CertAttemptAnswer(
+                attempt_id=attempt_id,
+                question_id=qid,
+                selected_choice_id=choice_id,
+                text_answer=text,
+                structured_answer=structured,
+                is_skipped=is_skipped,
+            ))
+        elif (ans.selected_choice_id, ans.text_answer, ans.structured_answer, ans.is_skipped) != (
+            choice_id, text, structured, is_skipped
+        ):
+            ans.selected_choice_id = choice_id
+            ans.text_answer = text
+            ans.structured_answer = structured
+            ans.is_skipped = is_skipped
+            to_update.append(ans)
+
+    with transaction.atomic():
+        # ignore_conflicts — mock_finish va davriy flush bir vaqtda ishlasa ham xato yo'q
+        CertAttemptAnswer.objects.bulk_create(to_create, ignore_conflicts=True)
+        if to_update:
+            CertAttemptAnswer.objects.bulk_update(to_update, BUFFERED_FIELDS)
+        if to_create or to_update:
+            CertMockAttempt.objects.filter(id=attempt_id, status='started').update(status='in_progress')
+
+    mark_flushed(META_PREFIX, uuid, buffered.values(), AUTOSAVE_TTL)
+    return len(to_create) + len(to_update)
+
+
+def finalize_attempt_buffer(attempt):
+    """Urinish yakunlanganda: buferni yozish va tozalash"""
+    flush_attempt_buffer(attempt.id, attempt.uuid, attempt.mock_id)
+    clear_attempt_buffer(attempt.uuid, get_answer_key(attempt.mock_id).keys())
+
+
+def clear_attempt_buffer(uuid, question_ids=()):
+    cache.delete_many(
+        [_answer_key(uuid, qid) for qid in question_ids]
+        + meta_keys(META_PREFIX, uuid) + [_context_key(uuid)]
+    )
+
+
+def flush_idle_attempts():
+    """
+    Davriy flush: jim qolgan yoki bufer eskirgan faol urinishlarni yozish.
+    Returns: flush qilingan urinishlar soni.
+    """
+    since = timezone.now() - timedelta(seconds=AUTOSAVE_TTL)
+    attempts = list(
+        CertMockAttempt.objects.filter(status__in=ACTIVE_STATUSES, started_at__gte=since)
+        .values_list('id', 'uuid', 'mock_id')
+    )
+    metas = get_buffer_meta(META_PREFIX, [uuid for _, uuid, _ in attempts])
+
+    now = time.time()
+    flushed = 0
+    for attempt_id, uuid, mock_id in attempts:
+        if needs_flush(metas.get(uuid), now, AUTOSAVE_IDLE_SECONDS, AUTOSAVE_MAX_AGE_SECONDS):
+            flush_attempt_buffer(attempt_id, uuid, mock_id)
+            flushed += 1
+    return flushed
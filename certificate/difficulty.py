@@ -0,0 +1,105 @@
+"""
+TestMakon.uz — Milliy Sertifikat Difficulty Table
+IRT ball uchun har bir mockning savol qiyinligi jadvali.
+"""
+
+from django.core.cache import cache
+
+from core.redis_client import get_redis
+from tests_app.calibration import calibrate_responses, expected_difficulty, save_estimates
+from tests_app.question_stats import drain_question_stats, record_question_answers
+
+from .models import CertQuestion
+
+CERT_QSTATS_PREFIX = 'cert_qstats'
+DIFFICULTY_TTL = 60 * 60 * 6   # 6 soat — drain jadvalni o'zi yangilaydi
+MIN_ANSWERS = 10                # bundan kam javobli savol — neytral
+NEUTRAL_DIFFICULTY = 0.5
+
+
+def _table_key(mock_id):
+    return f'cert_difficulty:{mock_id}'
+
+
+def build_difficulty_table(mock_id):
+    """[qiyinlik, ...] — indeks savol raqami (0-indeks ishlatilmaydi)"""
+    rows = list(CertQuestion.objects.filter(mock_id=mock_id).values_list(
+        'number', 'times_answered', 'times_correct', 'irt_difficulty', 'irt_discrimination'
+    ))
+    table = [NEUTRAL_DIFFICULTY] * (max((row[0] for row in rows), default=0) + 1)
+    for number, answered, correct, b, a in rows:
+        if b is not None and a is not None:
+            table[number] = expected_difficulty(b, a)
+        elif answered >= MIN_ANSWERS:
+            table[number] = round(1 - correct / answered, 4)
+    return table
+
+
+def get_difficulty_table(mock_id):
+    table = cache.get(_table_key(mock_id))
+    if table is None:
+        table = refresh_difficulty_table(mock_id)
+    return table
+
+
+def refresh_difficulty_table(mock_id):
+    table = build_difficulty_table(mock_id)
+    cache.set(_table_key(mock_id), table, DIFFICULTY_TTL)
+    return table
+
+
+def difficulty_of(table, number):
+    """Jadvaldan savol qiyinligi (jadvaldan keyin qo'shilgan savol — neytral)"""
+    return table[number] if number < len(table) else NEUTRAL_DIFFICULTY
+
+
+# ============================================================
+# HISOBLAGICHLAR
+# ============================================================
+
+def _refresh_for_questions(question_ids):
+    mock_ids = CertQuestion.objects.filter(id__in=list(question_ids)).values_list('mock_id', flat=True).distinct()
+    for mock_id in mock_ids:
+        refresh_difficulty_table(mock_id)
+
+
+def record_cert_question_answers(results):
+    """
+    Javob natijalarini savol hisoblagichlariga qo'shish.
+    results: [(question_id, is_correct), ...] — skipped ham javob berilgan hisoblanadi
+    """
+    record_question_answers(results, model=CertQuestion, prefix=CERT_QSTATS_PREFIX)
+    if get_redis() is None:
+        # Redis yo'q — hisoblagichlar darhol yozildi, jadval ham darhol yangilanadi
+        _refresh_for_questions({question_id for question_id, _ in results})
+
+
+def drain_cert_question_stats():
+    """Yig'ilgan hisoblagichlarni yozish va tegishli mocklar jadvalini yangilash"""
+    return drain_question_stats(
+        model=CertQuestion, prefix=CERT_QSTATS_PREFIX,
+        on_drained=lambda counts: _refresh_for_questions(counts.keys()),
+    )
+
+
+# ============================================================
+# KALIBRLASH
+# ============================================================
+
+def calibrate_cert_questions():
+    """
+    CertAttemptAnswer dan IRT parametrlarini baholash (tests_app.calibration),
+    bulk_update bilan yozish va barcha mock jadvallarini yangilash.
+    Returns: kalibrlangan savollar soni.
+    """
+    from .models import CertAttemptAnswer, CertMock
+
+    estimates = calibrate_responses(
+        CertAttemptAnswer.objects.filter(
+            attempt__status='completed', is_correct__isnull=False,  # qo'lda tekshiriladiganlar — yo'q
+        )
+    )
+    count = save_estimates(CertQuestion, estimates)
+    for mock_id in CertMock.objects.values_list('id', flat=True):
+        refresh_difficulty_table(mock_id)
+    return count
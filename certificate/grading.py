@@ -0,0 +1,225 @@
+"""
+TestMakon.uz — Milliy Sertifikat Grading
+Mock javoblarini xotirada, bitta javob kaliti bo'yicha baholash.
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    CertQuestion, CertChoice, CertGroupedItem, CertShortOpen,
+    CertMultiPart, CertAttemptAnswer,
+)
+
+ANSWER_KEY_TTL = 60 * 60 * 24  # 1 kun
+GRADED_FIELDS = ['is_correct', 'earned_points', 'requires_manual_check', 'checked_at']
+
+
+# ============================================================
+# JAVOB KALITI
+# ============================================================
+
+def _version_key(mock_id):
+    return f'cert_key_version:{mock_id}'
+
+
+def answer_key_version(mock_id):
+    """Tasodifiy token — cache tozalansa ham eski kalitga qaytilmaydi"""
+    return cache.get_or_set(_version_key(mock_id), lambda: uuid.uuid4().hex[:12], None)
+
+
+def bump_answer_key(mock_id):
+    cache.set(_version_key(mock_id), uuid.uuid4().hex[:12], None)
+
+
+def _answer_key_key(mock_id):
+    return f'cert_answer_key:{mock_id}:{answer_key_version(mock_id)}'
+
+
+def build_answer_key(mock_id):
+    """
+    {question_id: spec} — 5 ta so'rov bilan, mockning barcha savollari uchun.
+    spec: {'number', 'type', 'points', 'active', 'choices', 'correct_choices',
+           'items', 'short_open', 'parts'}
+    """
+    key = {}
+    for qid, number, qtype, points, active in CertQuestion.objects.filter(
+        mock_id=mock_id
+    ).values_list('id', 'number', 'question_type', 'points', 'is_active'):
+        key[qid] = {
+            'number': number,
+            'type': qtype,
+            'points': points,
+            'active': active,
+            'choices': [],        # barcha variantlar (autosave tekshiruvi uchun)
+            'correct_choices': [],
+            'items': [],          # [(item_id, correct_option_id), ...]
+            'short_open': None,   # {'correct', 'answer_type', 'tolerance', 'case_sensitive'}
+            'parts': [],          # [(label, correct, tolerance, points, manual), ...]
+        }
+
+    for qid, choice_id, is_correct in CertChoice.objects.filter(
+        question__mock_id=mock_id
+    ).values_list('question_id', 'id', 'is_correct'):
+        key[qid]['choices'].append(choice_id)
+        if is_correct:
+            key[qid]['correct_choices'].append(choice_id)
+
+    for qid, item_id, option_id in CertGroupedItem.objects.filter(
+        question__mock_id=mock_id
+    ).values_list('question_id', 'id', 'correct_option_id'):
+        key[qid]['items'].append((item_id, option_id))
+
+    for qid, correct, answer_type, tolerance, case_sensitive in CertShortOpen.objects.filter(
+        question__mock_id=mock_id
+    ).values_list('question_id', 'correct_answer', 'answer_type', 'tolerance', 'case_sensitive'):
+        key[qid]['short_open'] = {
+            'correct': correct,
+            'answer_type': answer_type,
+            'tolerance': tolerance,
+            'case_sensitive': case_sensitive,
+        }
+
+    for qid, label, correct, tolerance, points, manual in CertMultiPart.objects.filter(
+        question__mock_id=mock_id
+    ).values_list('question_id', 'part_label', 'correct_answer', 'tolerance', 'points', 'requires_manual_check'):
+        key[qid]['parts'].append((label, correct, tolerance, points, manual))
+
+    return key
+
+
+def get_answer_key(mock_id):
+    """Cache'dagi javob kaliti, bo'lmasa quriladi"""
+    cache_key = _answer_key_key(mock_id)
+    key = cache.get(cache_key)
+    if key is None:
+        key = build_answer_key(mock_id)
+        cache.set(cache_key, key, ANSWER_KEY_TTL)
+    return key
+
+
+# ============================================================
+# BAHOLASH
+# ============================================================
+
+def _numbers_match(user_value, correct_value, tolerance):
+    """float() bo'lmasa ValueError — chaqiruvchi o'zi hal qiladi"""
+    return abs(float(user_value) - float(correct_value)) <= tolerance
+
+
+def grade_answer(spec, answer, now=None):
+    """
+    Bitta javobni kalit bo'yicha baholash (answer maydonlari o'zgaradi, save yo'q).
+    Qo'lda tekshiriladiganlarda faqat requires_manual_check o'rnatiladi.
+    """
+    if answer.is_skipped:
+        answer.is_correct = False
+        answer.earned_points = 0
+        answer.checked_at = now or timezone.now()
+        return
+
+    qtype = spec['type']
+
+    if qtype == 'choice':
+        answer.is_correct = (
+            answer.selected_choice_id is not None and
+            answer.selected_choice_id in spec['correct_choices']
+        )
+        answer.earned_points = spec['points'] if answer.is_correct else 0
+
+    elif qtype == 'grouped_af':
+        if not answer.structured_answer:
+            answer.is_correct = False
+            answer.earned_points = 0
+        else:
+            correct_count = 0
+            for item_id, option_id in spec['items']:
+                user_choice_id = answer.structured_answer.get(str(item_id))
+                if option_id and str(option_id) == str(user_choice_id):
+                    correct_count += 1
+            answer.is_correct = (correct_count == len(spec['items']))
+            answer.earned_points = spec['points'] if answer.is_correct else 0
+
+    elif qtype == 'short_open':
+        detail = spec['short_open']
+        if detail is None or detail['answer_type'] not in ('text', 'integer', 'float'):
+            answer.requires_manual_check = True
+            return
+
+        user_ans = answer.text_answer.strip()
+        correct = detail['correct'].strip()
+
+        if detail['answer_type'] == 'text':
+            if not detail['case_sensitive']:
+                answer.is_correct = user_ans.lower() == correct.lower()
+            else:
+                answer.is_correct = user_ans == correct
+        else:
+            try:
+                answer.is_correct = _numbers_match(user_ans, correct, detail['tolerance'])
+            except ValueError:
+                answer.is_correct = False
+
+        answer.earned_points = spec['points'] if answer.is_correct else 0
+
+    elif qtype == 'multi_part':
+        parts = spec['parts']
+        if any(manual for *_, manual in parts):
+            answer.requires_manual_check = True
+            return
+
+        if not answer.structured_answer:
+            answer.is_correct = False
+            answer.earned_points = 0
+        else:
+            total_pts = 0
+            all_correct = True
+            for label, correct, tolerance, points, _ in parts:
+                user_part = str(answer.structured_answer.get(label, '')).strip()
+                correct_part = correct.strip()
+                try:
+                    part_ok = _numbers_match(user_part, correct_part, tolerance)
+                except ValueError:
+                    part_ok = (user_part.lower() == correct_part.lower())
+                if part_ok:
+                    total_pts += points
+                else:
+                    all_correct = False
+            answer.is_correct = all_correct
+            answer.earned_points = total_pts
+
+    answer.checked_at = now or timezone.now()
+
+
+def grade_attempt(attempt):
+    """
+    Urinishning barcha javoblarini baholash va saqlash.
+    Javobsiz faol savollar skipped sifatida qo'shiladi.
+    Returns: baholangan javoblar ro'yxati — calculate_results uchun.
+    """
+    key = get_answer_key(attempt.mock_id)
+    answers = list(attempt.answers.all())
+
+    answered_ids = {a.question_id for a in answers}
+    new_answers = [
+        CertAttemptAnswer(attempt=attempt, question_id=qid, is_skipped=True)
+        for qid, spec in key.items()
+        if spec['active'] and qid not in answered_ids
+    ]
+
+    now = timezone.now()
+    for answer in answers + new_answers:
+        spec = key.get(answer.question_id)
+        if spec is not None:
+            grade_answer(spec, answer, now)
+
+    with transaction.atomic():
+        if new_answers:
+            CertAttemptAnswer.objects.bulk_create(new_answers)
+        if answers:
+            CertAttemptAnswer.objects.bulk_update(answers, GRADED_FIELDS)
+
+    return answers + new_answers
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-17 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificate', '0004_irt_scoring_saved_questions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certquestion',
+            name='irt_difficulty',
+            field=models.FloatField(blank=True, null=True, verbose_name='IRT qiyinlik (b)'),
+        ),
+        migrations.AddField(
+            model_name='certquestion',
+            name='irt_discrimination',
+            field=models.FloatField(blank=True, null=True, verbose_name='IRT farqlash (a)'),
+        ),
+    ]
@@ -102,6 +102,9 @@ class CertMock(models.Model):
         self.total_points = sum(q.points for q in qs)
         self.save(update_fields=['questions_count', 'total_points'])
 
+        from .grading import bump_answer_key
+        bump_answer_key(self.pk)
+
 
 # ─────────────────────────────────────────────────────────────
 # 3. UNIVERSAL QUESTION
@@ -165,6 +168,8 @@ class CertQuestion(models.Model):
     difficulty = models.CharField('Qiyinlik', max_length=10, choices=DIFFICULTY_CHOICES, default='medium')
     times_answered = models.PositiveIntegerField('Javob berilgan', default=0)
     times_correct  = models.PositiveIntegerField('To\'g\'ri javoblar', default=0)
+    irt_difficulty     = models.FloatField('IRT qiyinlik (b)', null=True, blank=True)
+    irt_discrimination = models.FloatField('IRT farqlash (a)', null=True, blank=True)
 
     # Control
     requires_manual_check = models.BooleanField('Qo\'lda tekshirish', default=False)
@@ -408,16 +413,29 @@ class CertMockAttempt(models.Model):
     def __str__(self):
         return f"{self.user} — {self.mock} ({self.status})"
 
-    def calculate_results(self):
-        """IRT asosida natijalarni hisoblash (maks 100 ball)"""
-        answers = self.answers.select_related('question').all()
-        correct  = answers.filter(is_correct=True).count()
-        wrong    = answers.filter(is_correct=False, is_skipped=False).count()
-        skipped  = answers.filter(is_skipped=True).count()
+    def calculate_results(self, answers=None):
+        """
+        IRT asosida natijalarni hisoblash (maks 100 ball).
+        answers — grading.grade_attempt natijasi; berilmasa bitta so'rov bilan o'qiladi.
+        Savol qiyinligi — mockning keshlangan jadvalidan (certificate.difficulty).
+        """
+        from .difficulty import NEUTRAL_DIFFICULTY, difficulty_of, get_difficulty_table
+        from .grading import get_answer_key
+
+        if answers is None:
+            answers = list(self.answers.all())
+        correct  = sum(1 for a in answers if a.is_correct)
+        wrong    = sum(1 for a in answers if a.is_correct is False and not a.is_skipped)
+        skipped  = sum(1 for a in answers if a.is_skipped)
         total_q  = self.mock.questions_count or 1
 
         # IRT score (0–100)
-        irt = self._compute_irt_score(answers, correct, total_q)
+        table = get_difficulty_table(self.mock_id)
+        difficulty = {
+            qid: difficulty_of(table, spec['number'])
+            for qid, spec in get_answer_key(self.mock_id).items()
+        }
+        irt = self._compute_irt_score(answers, correct, total_q, difficulty, NEUTRAL_DIFFICULTY)
 
         self.correct_answers   = correct
         self.wrong_answers     = wrong
@@ -432,10 +450,11 @@ class CertMockAttempt(models.Model):
         self.save()
 
     @staticmethod
-    def _compute_irt_score(answers, correct_count, total_q):
+    def _compute_irt_score(answers, correct_count, total_q, difficulty, neutral=0.5):
         """
         1) To'g'ri javoblar sonidan bazaviy ball (jadval bo'yicha, 40 savolga o'lchab)
         2) Har savol qiyinligiga qarab IRT korreksiyasi
+        difficulty: {question_id: 0 (oson) – 1 (qiyin)}
         """
         # --- Base score ---
         scale = 40  # standart asos
@@ -456,17 +475,12 @@ class CertMockAttempt(models.Model):
         # --- IRT korreksiyasi (maks ±8 ball) ---
         adj = 0.0
         for ans in answers:
-            q = ans.question
-            if q.times_answered >= 10:
-                cr = q.times_correct / q.times_answered   # 0–1, 1=koʻpchilik toʻgʻri
-                difficulty = 1 - cr                        # 0=oson, 1=qiyin
-            else:
-                difficulty = 0.5  # neytral
+            d = difficulty.get(ans.question_id, neutral)
 
             if ans.is_correct:
-                adj += (difficulty - 0.3) * 4   # qiyin → katta bonus
+                adj += (d - 0.3) * 4   # qiyin → katta bonus
             elif not ans.is_skipped:
-                adj -= (0.7 - difficulty) * 3   # oson savolni xato → katta jarima
+                adj -= (0.7 - d) * 3   # oson savolni xato → katta jarima
 
         # Normallash: ±8 ball
         if total_q:
@@ -547,97 +561,11 @@ class CertAttemptAnswer(models.Model):
         return f"Answer #{self.question.number} — attempt {self.attempt_id}"
 
     def auto_check(self):
-        """Avtomatik tekshirish — question type ga qarab"""
-        q = self.question
-        qtype = q.question_type
-
-        if self.is_skipped:
-            self.is_correct = False
-            self.earned_points = 0
-            self.checked_at = timezone.now()
-            self.save(update_fields=['is_correct', 'earned_points', 'checked_at'])
-            return
-
-        if qtype == 'choice':
-            self.is_correct = (
-                self.selected_choice is not None and
-                self.selected_choice.is_correct
-            )
-            self.earned_points = q.points if self.is_correct else 0
-
-        elif qtype == 'grouped_af':
-            if not self.structured_answer:
-                self.is_correct = False
-                self.earned_points = 0
-            else:
-                items = q.grouped_items.select_related('correct_option').all()
-                correct_count = 0
-                for item in items:
-                    user_choice_id = self.structured_answer.get(str(item.id))
-                    if item.correct_option and str(item.correct_option.id) == str(user_choice_id):
-                        correct_count += 1
-                self.is_correct = (correct_count == items.count())
-                self.earned_points = q.points if self.is_correct else 0
-
-        elif qtype == 'short_open':
-            try:
-                detail = q.short_open
-            except CertShortOpen.DoesNotExist:
-                self.requires_manual_check = True
-                self.save(update_fields=['requires_manual_check'])
-                return
-
-            user_ans = self.text_answer.strip()
-            correct = detail.correct_answer.strip()
-
-            if detail.answer_type == 'text':
-                if not detail.case_sensitive:
-                    self.is_correct = user_ans.lower() == correct.lower()
-                else:
-                    self.is_correct = user_ans == correct
-            elif detail.answer_type in ('integer', 'float'):
-                try:
-                    diff = abs(float(user_ans) - float(correct))
-                    self.is_correct = diff <= detail.tolerance
-                except ValueError:
-                    self.is_correct = False
-            else:
-                self.requires_manual_check = True
-                self.save(update_fields=['requires_manual_check'])
-                return
-
-            self.earned_points = q.points if self.is_correct else 0
-
-        elif qtype == 'multi_part':
-            parts = q.parts.all()
-            if any(p.requires_manual_check for p in parts):
-                self.requires_manual_check = True
-                self.save(update_fields=['requires_manual_check'])
-                return
-
-            if not self.structured_answer:
-                self.is_correct = False
-                self.earned_points = 0
-            else:
-                total_pts = 0
-                all_correct = True
-                for part in parts:
-                    user_part = str(self.structured_answer.get(part.part_label, '')).strip()
-                    correct_part = part.correct_answer.strip()
-                    try:
-                        diff = abs(float(user_part) - float(correct_part))
-                        part_ok = diff <= part.tolerance
-                    except ValueError:
-                        part_ok = (user_part.lower() == correct_part.lower())
-                    if part_ok:
-                        total_pts += part.points
-                    else:
-                        all_correct = False
-                self.is_correct = all_correct
-                self.earned_points = total_pts
-
-        self.checked_at = timezone.now()
-        self.save(update_fields=['is_correct', 'earned_points', 'requires_manual_check', 'checked_at'])
+        """Avtomatik tekshirish — question type ga qarab (grading.grade_answer)"""
+        from .grading import GRADED_FIELDS, get_answer_key, grade_answer
+
+        grade_answer(get_answer_key(self.question.mock_id)[self.question_id], self)
+        self.save(update_fields=GRADED_FIELDS)
 
 
 # ─────────────────────────────────────────────────────────────
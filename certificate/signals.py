@@ -0,0 +1,31 @@
+"""
+TestMakon.uz - Milliy Sertifikat Signals
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .grading import bump_answer_key
+from .models import CertQuestion, CertChoice, CertGroupedItem, CertShortOpen, CertMultiPart
+
+
+@receiver(post_save, sender=CertQuestion)
+@receiver(post_delete, sender=CertQuestion)
+def refresh_answer_key_for_question(sender, instance, **kwargs):
+    """Savol qo'shilsa/o'zgarsa/o'chirilsa — mockning keshlangan javob kaliti eskiradi"""
+    bump_answer_key(instance.mock_id)
+
+
+@receiver(post_save, sender=CertChoice)
+@receiver(post_delete, sender=CertChoice)
+@receiver(post_save, sender=CertGroupedItem)
+@receiver(post_delete, sender=CertGroupedItem)
+@receiver(post_save, sender=CertShortOpen)
+@receiver(post_delete, sender=CertShortOpen)
+@receiver(post_save, sender=CertMultiPart)
+@receiver(post_delete, sender=CertMultiPart)
+def refresh_answer_key_for_detail(sender, instance, **kwargs):
+    """To'g'ri javob ma'lumotlari o'zgarsa — savolning mocki bo'yicha kalit eskiradi"""
+    mock_id = CertQuestion.objects.filter(pk=instance.question_id).values_list('mock_id', flat=True).first()
+    if mock_id is not None:
+        bump_answer_key(mock_id)
@@ -1,21 +1,19 @@
 """
 TestMakon — Milliy Sertifikat Celery Tasks
 """
+import logging
+
 from celery import shared_task
 
+logger = logging.getLogger(__name__)
+
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=10)
 def update_cert_question_stats(self, question_id, is_correct):
-    """Savol statistikasini background da yangilash (IRT uchun)"""
+    """Savol statistikasini hisoblagichlarga qo'shish (IRT uchun, drain_cert_question_stats yozadi)"""
     try:
-        from .models import CertQuestion
-        CertQuestion.objects.filter(pk=question_id).update(
-            times_answered=__import__('django.db.models', fromlist=['F']).F('times_answered') + 1,
-        )
-        if is_correct:
-            CertQuestion.objects.filter(pk=question_id).update(
-                times_correct=__import__('django.db.models', fromlist=['F']).F('times_correct') + 1,
-            )
+        from .difficulty import record_cert_question_answers
+        record_cert_question_answers([(question_id, is_correct)])
     except Exception as exc:
         raise self.retry(exc=exc)
 
@@ -24,30 +22,22 @@ def update_cert_question_stats(self, question_id, is_correct):
 def process_cert_attempt_results(self, attempt_id):
     """
     Mock yakunlangandan so'ng background da:
-    1. Har savol statistikasini yangilash (IRT)
+    1. Savol hisoblagichlariga qo'shish (IRT) — DB ga drain_cert_question_stats yozadi
     2. User umumiy statistikasini yangilash
     3. Sust mavzularni aniqlash
     """
     try:
-        from django.db.models import F
-        from .models import CertMockAttempt, CertQuestion
+        from .difficulty import record_cert_question_answers
+        from .models import CertMockAttempt
 
         attempt = CertMockAttempt.objects.select_related(
             'user', 'mock__cert_subject__subject'
         ).get(pk=attempt_id)
 
-        answers = attempt.answers.select_related('question__topic').all()
+        answers = list(attempt.answers.all())
 
-        # 1. Har savol stats yangilash
-        for ans in answers:
-            q = ans.question
-            CertQuestion.objects.filter(pk=q.pk).update(
-                times_answered=F('times_answered') + 1
-            )
-            if ans.is_correct:
-                CertQuestion.objects.filter(pk=q.pk).update(
-                    times_correct=F('times_correct') + 1
-                )
+        # 1. Savol statistikasi — bitta HINCRBY pipeline (Redis yo'q bo'lsa bitta UPDATE)
+        record_cert_question_answers([(a.question_id, bool(a.is_correct)) for a in answers])
 
         # 2. User umumiy statistikasi
         _update_user_cert_stats(attempt, answers)
@@ -56,14 +46,48 @@ def process_cert_attempt_results(self, attempt_id):
         raise self.retry(exc=exc)
 
 
+@shared_task
+def drain_cert_question_stats():
+    """
+    Sertifikat savollari hisoblagichlarini bitta batch UPDATE bilan yozish
+    va qiyinlik jadvallarini yangilash. Celery beat tomonidan har daqiqada.
+    """
+    from .difficulty import drain_cert_question_stats as drain
+    report = drain()
+    if report and report.get('questions'):
+        logger.info(
+            f"drain_cert_question_stats: {report['questions']} savol, {report['answers']} javob, "
+            f"lag={report['lag_seconds']}s"
+        )
+    return report
+
+
+@shared_task
+def calibrate_cert_questions():
+    """Sertifikat savollarini IRT bo'yicha kalibrlash — har kecha (certificate.difficulty)"""
+    from .difficulty import calibrate_cert_questions as calibrate
+    count = calibrate()
+    logger.info(f"calibrate_cert_questions: {count} ta savol kalibrlandi")
+    return count
+
+
+@shared_task
+def flush_cert_autosave():
+    """
+    Mock autosave buferini davriy flush qilish (Celery beat, har daqiqada).
+    Jim qolgan yoki tashlab ketilgan urinishlarning javoblari ham DB ga tushadi.
+    """
+    from .autosave import flush_idle_attempts
+    flushed = flush_idle_attempts()
+    if flushed:
+        logger.info(f"flush_cert_autosave: {flushed} ta urinish yozildi")
+    return flushed
+
+
 def _update_user_cert_stats(attempt, answers):
-    """User statistikasini yangilash — sust mavzularni aniqlash"""
+    """User XP va natija hodisasi (kunlik/fan/mavzu statistikasini stats_rollup yig'adi)"""
     try:
-        from django.utils import timezone
-        from tests_app.models import DailyUserStats
-
         user = attempt.user
-        today = timezone.now().date()
 
         # XP: to'g'ri har javob uchun 3 XP
         xp = attempt.correct_answers * 3
@@ -76,16 +100,29 @@ def _update_user_cert_stats(attempt, answers):
             user.xp_points = getattr(user, 'xp_points', 0) + xp
             user.save(update_fields=['xp_points'])
 
-        # Kunlik statistika
-        daily, _ = DailyUserStats.objects.get_or_create(user=user, date=today)
-        daily.tests_taken       += 1
-        daily.questions_answered += attempt.total_questions
-        daily.correct_answers   += attempt.correct_answers
-        daily.wrong_answers     += attempt.wrong_answers
-        daily.xp_earned         += xp
-        total_q = (daily.correct_answers + daily.wrong_answers) or 1
-        daily.accuracy_rate = round(daily.correct_answers / total_q * 100, 1)
-        daily.save()
+        record_cert_result_event(attempt, xp)
 
     except Exception:
         pass  # statistika xatosi asosiy oqimni to'xtatmasin
+
+
+def record_cert_result_event(attempt, xp):
+    """
+    Mock natijasini tests_app.StatsEvent jurnaliga yozish — DailyUserStats,
+    UserSubjectPerformance va UserTopicPerformance ga agregator qo'shadi.
+    """
+    from tests_app.stats_rollup import record_stats_event, topic_breakdown
+
+    rows = attempt.answers.values_list('question__topic_id', 'question__topic__subject_id', 'is_correct')
+    record_stats_event(
+        attempt.user_id, 'cert', attempt.id,
+        subject_id=attempt.mock.cert_subject.subject_id,
+        questions=attempt.total_questions,
+        correct=attempt.correct_answers,
+        wrong=attempt.wrong_answers,
+        time_spent=attempt.time_spent,
+        xp=xp,
+        score=attempt.percentage,
+        topics=topic_breakdown((topic_id, subject_id, is_correct, 0) for topic_id, subject_id, is_correct in rows),
+        occurred_at=attempt.completed_at,
+    )
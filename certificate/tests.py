@@ -0,0 +1,271 @@
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tests_app.models import Subject
+
+from .models import (
+    CertSubject, CertMock, CertQuestion, CertChoice, CertGroupedOption,
+    CertGroupedItem, CertShortOpen, CertMultiPart, CertMockAttempt, CertAttemptAnswer,
+)
+
+User = get_user_model()
+
+
+def make_mock(choice_count=3, slug='mock-1'):
+    """choice savollar + bittadan grouped_af, short_open, multi_part"""
+    subject, _ = Subject.objects.get_or_create(slug='matematika', defaults={'name': 'Matematika'})
+    cert_subject, _ = CertSubject.objects.get_or_create(subject=subject)
+    mock = CertMock.objects.create(cert_subject=cert_subject, title=slug, slug=slug, is_free=True)
+
+    number = 0
+    for number in range(1, choice_count + 1):
+        q = CertQuestion.objects.create(mock=mock, number=number, question_type='choice')
+        CertChoice.objects.create(question=q, label='A', text='a', is_correct=True)
+        CertChoice.objects.create(question=q, label='B', text='b')
+
+    grouped = CertQuestion.objects.create(mock=mock, number=number + 1, question_type='grouped_af', points=2)
+    options = [CertGroupedOption.objects.create(question=grouped, label=l, text=l) for l in 'AB']
+    for i, option in enumerate(options, start=1):
+        CertGroupedItem.objects.create(question=grouped, item_number=i, text=str(i), correct_option=option)
+
+    short = CertQuestion.objects.create(mock=mock, number=number + 2, question_type='short_open')
+    CertShortOpen.objects.create(question=short, correct_answer='2.5', answer_type='float', tolerance=0.01)
+
+    multi = CertQuestion.objects.create(mock=mock, number=number + 3, question_type='multi_part')
+    CertMultiPart.objects.create(question=multi, part_label='a', text='a', correct_answer='10', points=1)
+    CertMultiPart.objects.create(question=multi, part_label='b', text='b', correct_answer='Ha', points=2)
+
+    mock.update_cached_stats()
+    return mock
+
+
+class MockGradingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+998901230001', password='pass12345')
+        self.client.force_login(self.user)
+
+    def _attempt(self, mock):
+        return CertMockAttempt.objects.create(
+            user=self.user, mock=mock, total_questions=mock.questions_count, total_points=mock.total_points,
+        )
+
+    def test_finish_grades_every_question_type(self):
+        mock = make_mock()
+        attempt = self._attempt(mock)
+        questions = {q.number: q for q in mock.questions.all()}
+        right = questions[1].choices.get(is_correct=True)
+        wrong = questions[2].choices.get(is_correct=False)
+        items = list(questions[4].grouped_items.all())
+
+        CertAttemptAnswer.objects.create(attempt=attempt, question=questions[1], selected_choice=right)
+        CertAttemptAnswer.objects.create(attempt=attempt, question=questions[2], selected_choice=wrong)
+        CertAttemptAnswer.objects.create(
+            attempt=attempt, question=questions[4],
+            structured_answer={str(item.id): item.correct_option_id for item in items},
+        )
+        CertAttemptAnswer.objects.create(attempt=attempt, question=questions[5], text_answer='2.505')
+        CertAttemptAnswer.objects.create(
+            attempt=attempt, question=questions[6], structured_answer={'a': '10', 'b': 'yo\'q'},
+        )
+
+        response = self.client.post(reverse('certificate:mock_finish', args=[attempt.uuid]))
+        self.assertEqual(response.status_code, 302)
+
+        graded = {a.question.number: a for a in attempt.answers.select_related('question')}
+        self.assertEqual(len(graded), 6)
+        self.assertTrue(graded[1].is_correct)
+        self.assertFalse(graded[2].is_correct)
+        self.assertTrue(graded[3].is_skipped)
+        self.assertEqual((graded[4].is_correct, graded[4].earned_points), (True, 2))
+        self.assertTrue(graded[5].is_correct)
+        self.assertEqual((graded[6].is_correct, graded[6].earned_points), (False, 1))
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, 'completed')
+        self.assertEqual(
+            (attempt.correct_answers, attempt.wrong_answers, attempt.skipped_questions), (3, 2, 1)
+        )
+
+    def test_grading_queries_do_not_grow_with_questions(self):
+        from .grading import grade_attempt
+
+        def count_queries(mock):
+            attempt = self._attempt(mock)
+            for q in mock.questions.filter(question_type='choice'):
+                CertAttemptAnswer.objects.create(attempt=attempt, question=q, selected_choice=q.choices.first())
+            grade_attempt(attempt)  # kalit cache'ga tushadi
+            attempt.answers.filter(is_skipped=True).delete()
+            with CaptureQueriesContext(connection) as ctx:
+                answers = grade_attempt(attempt)
+                attempt.calculate_results(answers)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(count_queries(make_mock(3, 'small')), count_queries(make_mock(30, 'big')))
+
+    def test_answer_key_refreshes_when_correct_choice_changes(self):
+        mock = make_mock(1)
+        question = mock.questions.get(number=1)
+        choice_b = question.choices.get(label='B')
+        answer = CertAttemptAnswer.objects.create(
+            attempt=self._attempt(mock), question=question, selected_choice=choice_b,
+        )
+        answer.auto_check()
+        self.assertFalse(answer.is_correct)
+
+        question.choices.update(is_correct=False)
+        choice_b.is_correct = True
+        choice_b.save()
+
+        answer.auto_check()
+        answer.refresh_from_db()
+        self.assertTrue(answer.is_correct)
+
+
+class DifficultyTableTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+998901230002', password='pass12345')
+        self.mock = make_mock(2)
+
+    def test_table_is_indexed_by_question_number(self):
+        from .difficulty import NEUTRAL_DIFFICULTY, get_difficulty_table
+        CertQuestion.objects.filter(mock=self.mock, number=2).update(times_answered=20, times_correct=5)
+
+        table = get_difficulty_table(self.mock.id)
+        self.assertEqual(len(table), 6)
+        self.assertEqual(table[1], NEUTRAL_DIFFICULTY)
+        self.assertEqual(table[2], 0.75)
+
+    def test_attempt_stats_written_in_one_update(self):
+        from .difficulty import get_difficulty_table
+        from .tasks import process_cert_attempt_results
+        attempt = CertMockAttempt.objects.create(user=self.user, mock=self.mock)
+        for q in self.mock.questions.all():
+            CertAttemptAnswer.objects.create(attempt=attempt, question=q, is_correct=q.number == 1)
+        CertQuestion.objects.filter(mock=self.mock).update(times_answered=9, times_correct=0)
+        get_difficulty_table(self.mock.id)
+
+        with CaptureQueriesContext(connection) as ctx:
+            process_cert_attempt_results(attempt.id)
+        updates = [
+            c for c in ctx.captured_queries
+            if c['sql'].startswith('UPDATE') and CertQuestion._meta.db_table in c['sql']
+        ]
+        self.assertEqual(len(updates), 1)
+
+        q1 = self.mock.questions.get(number=1)
+        self.assertEqual((q1.times_answered, q1.times_correct), (10, 1))
+        self.assertEqual(get_difficulty_table(self.mock.id)[1], 0.9)
+
+    def test_calibrated_parameters_override_raw_ratio(self):
+        from tests_app.calibration import expected_difficulty
+        from .difficulty import get_difficulty_table
+        CertQuestion.objects.filter(mock=self.mock, number=1).update(
+            times_answered=100, times_correct=90, irt_difficulty=1.2, irt_discrimination=0.8,
+        )
+        self.assertEqual(get_difficulty_table(self.mock.id)[1], expected_difficulty(1.2, 0.8))
+
+
+class AutosaveTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+998901230003', password='pass12345')
+        self.client.force_login(self.user)
+        self.mock = make_mock(2)
+        self.attempt = CertMockAttempt.objects.create(
+            user=self.user, mock=self.mock, total_questions=self.mock.questions_count,
+        )
+        self.questions = {q.number: q for q in self.mock.questions.all()}
+        self.url = reverse('certificate:autosave_answers', args=[self.attempt.uuid])
+
+    def _autosave(self, answers):
+        return self.client.post(self.url, data=json.dumps({'answers': answers}), content_type='application/json')
+
+    def test_batch_is_buffered_without_answer_writes(self):
+        short = self.questions[4]
+        right = self.questions[1].choices.get(is_correct=True)
+        self._autosave([{'question_id': short.id, 'text_answer': '2'}])  # kontekst va kalit cache'ga
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._autosave([
+                {'question_id': short.id, 'text_answer': '2.'},
+                {'question_id': short.id, 'text_answer': '2.5'},
+                {'question_id': self.questions[1].id, 'choice_id': right.id},
+                {'question_id': self.questions[2].id, 'choice_id': 999999},
+            ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(s['question_id'], s['skipped']) for s in response.json()['saved']],
+            [(short.id, False), (self.questions[1].id, False)],
+        )
+        self.assertFalse([c for c in ctx.captured_queries if 'certificate_' in c['sql']])
+        self.assertFalse(self.attempt.answers.exists())
+
+        self.client.post(reverse('certificate:mock_finish', args=[self.attempt.uuid]))
+        graded = {a.question_id: a for a in self.attempt.answers.all()}
+        self.assertEqual(graded[short.id].text_answer, '2.5')
+        self.assertTrue(graded[short.id].is_correct)
+        self.assertTrue(graded[self.questions[1].id].is_correct)
+
+    def test_idle_buffer_flushed_as_upsert(self):
+        from . import autosave
+        question = self.questions[1]
+        CertAttemptAnswer.objects.create(attempt=self.attempt, question=question, is_skipped=True)
+        self._autosave([{'question_id': question.id, 'choice_id': question.choices.first().id}])
+
+        with patch.object(autosave, 'AUTOSAVE_IDLE_SECONDS', 0):
+            self.assertEqual(autosave.flush_idle_attempts(), 1)
+            self.assertEqual(autosave.flush_idle_attempts(), 0)
+
+        answer = self.attempt.answers.get(question=question)
+        self.assertFalse(answer.is_skipped)
+        self.assertEqual(answer.selected_choice_id, question.choices.first().id)
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, 'in_progress')
+
+    def test_answer_buffered_during_flush_is_flushed_later(self):
+        from . import autosave
+        first, second = self.questions[1], self.questions[2]
+        self._autosave([{'question_id': first.id, 'choice_id': first.choices.first().id}])
+        original = autosave.get_buffered_answers
+
+        def autosave_during_flush(uuid, question_ids):
+            buffered = original(uuid, question_ids)
+            self._autosave([{'question_id': second.id, 'choice_id': second.choices.first().id}])
+            return buffered
+
+        with patch.object(autosave, 'get_buffered_answers', side_effect=autosave_during_flush):
+            autosave.flush_attempt_buffer(self.attempt.id, self.attempt.uuid, self.mock.id)
+        self.assertFalse(self.attempt.answers.filter(question=second).exists())
+
+        with patch.object(autosave, 'AUTOSAVE_IDLE_SECONDS', 0):
+            self.assertEqual(autosave.flush_idle_attempts(), 1)
+        self.assertTrue(self.attempt.answers.filter(question=second).exists())
+
+    def test_direct_submit_overrides_buffered_value(self):
+        question = self.questions[4]
+        self._autosave([{'question_id': question.id, 'text_answer': '1'}])
+        self.client.post(
+            reverse('certificate:submit_answer', args=[self.attempt.uuid]),
+            data=json.dumps({'question_id': question.id, 'text_answer': '2.5'}),
+            content_type='application/json',
+        )
+        from .autosave import finalize_attempt_buffer
+        finalize_attempt_buffer(self.attempt)
+        self.assertEqual(self.attempt.answers.get(question=question).text_answer, '2.5')
+
+    def test_solve_page_prefills_buffered_answers(self):
+        question = self.questions[4]
+        self._autosave([{'question_id': question.id, 'text_answer': '7.25'}])
+        response = self.client.get(reverse('certificate:mock_solve', args=[self.attempt.uuid]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(question.id, response.context['answered_ids'])
+        self.assertEqual(json.loads(response.context['prefill_json'])[str(question.id)]['text_answer'], '7.25')
@@ -10,6 +10,7 @@ urlpatterns = [
     # attempt/* URL lar — slug patternlardan OLDIN turishi shart!
     path('attempt/<uuid:attempt_uuid>/', views.mock_solve, name='mock_solve'),
     path('attempt/<uuid:attempt_uuid>/submit/', views.submit_answer, name='submit_answer'),
+    path('attempt/<uuid:attempt_uuid>/autosave/', views.autosave_answers, name='autosave_answers'),
     path('attempt/<uuid:attempt_uuid>/finish/', views.mock_finish, name='mock_finish'),
     path('attempt/<uuid:attempt_uuid>/result/', views.mock_result, name='mock_result'),
     path('attempt/<uuid:attempt_uuid>/export/', views.export_result_json, name='export_result_json'),
@@ -20,9 +20,7 @@ from .models import (
 def _update_user_stats(attempt):
     """Urinish tugagach user statistikasini yangilash"""
     try:
-        from tests_app.models import DailyUserStats
         user = attempt.user
-        today = timezone.now().date()
 
         # User umumiy statistikasi
         user.total_tests_taken = getattr(user, 'total_tests_taken', 0) + 1
@@ -39,26 +37,9 @@ def _update_user_stats(attempt):
             'total_wrong_answers', 'xp_points'
         ])
 
-        # Kunlik statistika
-        daily, _ = DailyUserStats.objects.get_or_create(user=user, date=today)
-        daily.tests_taken += 1
-        daily.questions_answered += attempt.total_questions
-        daily.correct_answers += attempt.correct_answers
-        daily.wrong_answers += attempt.wrong_answers
-        daily.total_time_spent += attempt.time_spent
-        daily.xp_earned += xp_gained
-        total_q = (daily.correct_answers + daily.wrong_answers) or 1
-        daily.accuracy_rate = round((daily.correct_answers / total_q) * 100, 1)
-
-        # Fan statistikasi
-        subject_name = attempt.mock.cert_subject.subject.slug
-        subjects_data = daily.subjects_practiced or {}
-        if subject_name not in subjects_data:
-            subjects_data[subject_name] = {'correct': 0, 'total': 0}
-        subjects_data[subject_name]['correct'] += attempt.correct_answers
-        subjects_data[subject_name]['total'] += attempt.total_questions
-        daily.subjects_practiced = subjects_data
-        daily.save()
+        # Kunlik, fan va mavzu statistikasi — hodisa orqali (tests_app.stats_rollup)
+        from .tasks import record_cert_result_event
+        record_cert_result_event(attempt, xp_gained)
     except Exception:
         pass  # Statistika xatosi asosiy oqimni to'xtatmasin
 
@@ -258,12 +239,29 @@ def mock_solve(request, attempt_uuid):
             'structured_answer': a.structured_answer or {},
         }
 
+    # Autosave buferidagi (hali DB ga yozilmagan) javoblar ustun
+    from .autosave import get_buffered_answers
+    from .grading import get_answer_key
+    buffered = get_buffered_answers(attempt.uuid, get_answer_key(mock.id).keys())
+    for qid, (choice_id, text_answer, structured_answer, is_skipped, _) in buffered.items():
+        if is_skipped:
+            answered_ids.discard(qid)
+        else:
+            answered_ids.add(qid)
+        prefill_data[qid] = {
+            'choice_id': choice_id,
+            'text_answer': text_answer,
+            'structured_answer': structured_answer or {},
+        }
+
     # Vaqt qoldi (soniya)
     elapsed = (timezone.now() - attempt.started_at).total_seconds()
     time_limit_seconds = mock.time_limit * 60
     time_remaining = max(0, int(time_limit_seconds - elapsed))
 
     if time_remaining == 0 and attempt.status != 'completed':
+        from .autosave import finalize_attempt_buffer
+        finalize_attempt_buffer(attempt)
         attempt.status = 'timeout'
         attempt.calculate_results()
         return redirect('certificate:mock_result', attempt_uuid=attempt.uuid)
@@ -290,7 +288,7 @@ def mock_solve(request, attempt_uuid):
 
 
 # ─────────────────────────────────────────────────────────────
-# 6. SUBMIT ANSWER (AJAX)
+# 6. SUBMIT ANSWER / AUTOSAVE (AJAX)
 # ─────────────────────────────────────────────────────────────
 
 @login_required
@@ -343,6 +341,10 @@ def submit_answer(request, attempt_uuid):
 
     answer.save()
 
+    # Autosave buferidagi eski qiymat keyingi flush'da bu javob ustidan yozmasin
+    from .autosave import discard_buffered_answer
+    discard_buffered_answer(attempt.uuid, question.id)
+
     # Status update
     if attempt.status == 'started':
         attempt.status = 'in_progress'
@@ -355,6 +357,35 @@ def submit_answer(request, attempt_uuid):
     })
 
 
+@login_required
+@require_POST
+def autosave_answers(request, attempt_uuid):
+    """
+    Javob o'zgarishlari paketi: {"answers": [{question_id, choice_id | text_answer |
+    structured_answer, skipped}, ...]} — buferga yoziladi, DB ga davriy flush.
+    """
+    from .autosave import ACTIVE_STATUSES, buffer_answers, get_attempt_context
+
+    context = get_attempt_context(attempt_uuid, request.user.id)
+    if context is None:
+        return JsonResponse({'error': 'Urinish topilmadi'}, status=404)
+    if context['status'] not in ACTIVE_STATUSES:
+        return JsonResponse({'error': 'Test yakunlangan'}, status=400)
+
+    try:
+        answers = json.loads(request.body).get('answers')
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': 'Noto\'g\'ri JSON'}, status=400)
+    if not isinstance(answers, list):
+        return JsonResponse({'error': 'answers ro\'yxat bo\'lishi kerak'}, status=400)
+
+    accepted = buffer_answers(context, answers)
+    return JsonResponse({
+        'success': True,
+        'saved': [{'question_id': qid, 'skipped': skipped} for qid, skipped in accepted.items()],
+    })
+
+
 # ─────────────────────────────────────────────────────────────
 # 7. MOCK FINISH
 # ─────────────────────────────────────────────────────────────
@@ -362,28 +393,27 @@ def submit_answer(request, attempt_uuid):
 @login_required
 @require_POST
 def mock_finish(request, attempt_uuid):
-    attempt = get_object_or_404(CertMockAttempt, uuid=attempt_uuid, user=request.user)
+    attempt = get_object_or_404(
+        CertMockAttempt.objects.select_related('mock'), uuid=attempt_uuid, user=request.user
+    )
 
     if attempt.status == 'completed':
         return redirect('certificate:mock_result', attempt_uuid=attempt.uuid)
 
-    # Javob bermaganlarni skipped qilib qo'sh
-    answered_ids = attempt.answers.values_list('question_id', flat=True)
-    unanswered = attempt.mock.questions.filter(is_active=True).exclude(id__in=answered_ids)
-    for q in unanswered:
-        CertAttemptAnswer.objects.create(attempt=attempt, question=q, is_skipped=True)
+    # Autosave buferidagi javoblar avval yoziladi
+    from .autosave import finalize_attempt_buffer
+    finalize_attempt_buffer(attempt)
 
-    # Hammani auto-check
-    for ans in attempt.answers.select_related('question', 'selected_choice').all():
-        ans.auto_check()
+    # Javob bermaganlar skipped qilib qo'shiladi, hammasi xotirada baholanadi
+    from .grading import grade_attempt
+    answers = grade_attempt(attempt)
 
-    # Vaqt hisoblash
+    # Vaqt hisoblash (calculate_results bilan birga saqlanadi)
     elapsed = (timezone.now() - attempt.started_at).total_seconds()
     attempt.time_spent = int(elapsed)
-    attempt.save(update_fields=['time_spent'])
 
     # Natijalar
-    attempt.calculate_results()
+    attempt.calculate_results(answers)
 
     # Celery task orqali background statistika
     try:
@@ -5,3 +5,6 @@ class CodingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'coding'
     verbose_name = 'Dasturlash'
+
+    def ready(self):
+        import coding.signals  # noqa: F401
@@ -0,0 +1,156 @@
+"""
+TestMakon.uz — Judge Scheduler
+Test case'larni parallel ishlatish va natijalarni oqim bilan yozish.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_PARALLEL_CASES = 4
+PROGRESS_INTERVAL = 0.5  # soniya — results ni DB ga yozish oralig'i
+
+# Shu natijadan keyin qolgan case'larni ishlatish ma'nosiz
+FATAL_VERDICTS = ('internal_error', 'time_limit')
+
+
+def normalize_output(text):
+    """Output normallashtirish — solishtirish uchun"""
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = [line.rstrip() for line in text.strip().split('\n')]
+    while lines and lines[-1] == '':
+        lines.pop()
+    return '\n'.join(lines)
+
+
+def parallel_cases():
+    from django.conf import settings
+    return max(1, getattr(settings, 'SANDBOX_PARALLEL_CASES', DEFAULT_PARALLEL_CASES))
+
+
+def case_status(result, tc):
+    """Bitta case natijasi -> status"""
+    if result['error']:
+        return 'internal_error'
+    if result['timed_out']:
+        return 'time_limit'
+    if result['exit_code'] != 0:
+        return 'runtime_error'
+    if normalize_output(result['stdout']) == normalize_output(tc.expected_output):
+        return 'accepted'
+    return 'wrong_answer'
+
+
+def case_result(tc, status, result):
+    return {
+        'test_case_id': tc.id,
+        'order': tc.order,
+        'is_sample': tc.is_sample,
+        'status': status,
+        'execution_time': result['execution_time'],
+        'stdout': result['stdout'][:1000] if tc.is_sample else '',
+        'stderr': result['stderr'][:500] if tc.is_sample else '',
+        'expected': tc.expected_output[:500] if tc.is_sample else '',
+        'input': tc.input_data[:500] if tc.is_sample else '',
+    }
+
+
+class Judgement:
+    """Yuborish natijalari — tartib bo'yicha saralangan"""
+
+    def __init__(self, total):
+        self.total = total
+        self.results = []
+        self.error_message = ''
+        # ms — bench_judge uchun (keshdan olingan verdictda 0)
+        self.compile_time = 0
+        self.run_time = 0
+
+    def add(self, tc_result):
+        self.results.append(tc_result)
+        self.results.sort(key=lambda r: (r['order'], r['test_case_id']))
+
+    @property
+    def passed(self):
+        return sum(1 for r in self.results if r['status'] == 'accepted')
+
+    @property
+    def max_time(self):
+        return max((r['execution_time'] for r in self.results), default=0)
+
+    @property
+    def status(self):
+        for r in self.results:
+            if r['status'] != 'accepted':
+                return r['status']
+        return 'accepted'
+
+
+def judge(session, test_cases, on_progress=None, parallel=None):
+    """
+    Kompilyatsiya + barcha case'lar. Returns: Judgement.
+    on_progress(judgement) asosiy thread'da, PROGRESS_INTERVAL dan siyrak emas
+    chaqiriladi (oxirgi holat doim beriladi).
+    """
+    judgement = Judgement(len(test_cases))
+    if not test_cases:
+        return judgement
+
+    from .judge_cache import compile_cached
+
+    started = time.monotonic()
+    compiled = compile_cached(session)
+    judgement.compile_time = (time.monotonic() - started) * 1000
+    if compiled and (compiled['error'] or compiled['timed_out'] or compiled['exit_code'] != 0):
+        # Compilation error — barchasida bir xil, birinchi case bilan to'xtatish
+        status = 'internal_error' if compiled['error'] else 'compilation_error'
+        judgement.add(case_result(test_cases[0], status, compiled))
+        judgement.error_message = compiled['stderr'] or compiled['error'] or ''
+        if on_progress:
+            on_progress(judgement)
+        return judgement
+
+    # Har case o'z konteynerida — bo'sh konteyner topilmasa ketma-ket
+    parallel = session.expand(parallel or parallel_cases())
+    started = time.monotonic()
+    queue = iter(test_cases)
+    pending = {}
+    fatal_order = None
+    last_progress = 0
+
+    with ThreadPoolExecutor(max_workers=min(parallel, len(test_cases))) as pool:
+        while True:
+            # Bir vaqtda ko'pi bilan `parallel` ta case; fatal natijadan keyingilari boshlanmaydi
+            for tc in queue:
+                if fatal_order is not None and tc.order > fatal_order:
+                    continue
+                pending[pool.submit(session.run, tc.input_data)] = tc
+                if len(pending) >= parallel:
+                    break
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                tc = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {
+                        'stdout': '', 'stderr': '', 'exit_code': -1,
+                        'execution_time': 0, 'timed_out': False, 'error': str(e),
+                    }
+                status = case_status(result, tc)
+                judgement.add(case_result(tc, status, result))
+                if status == 'internal_error' and not judgement.error_message:
+                    judgement.error_message = result['error'] or ''
+                if status in FATAL_VERDICTS and (fatal_order is None or tc.order < fatal_order):
+                    fatal_order = tc.order
+
+            if on_progress and time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                on_progress(judgement)
+                last_progress = time.monotonic()
+
+    judgement.run_time = (time.monotonic() - started) * 1000
+    if on_progress:
+        on_progress(judgement)
+    return judgement
@@ -0,0 +1,118 @@
+"""
+TestMakon.uz — Judge Cache
+Kod hash'i bo'yicha verdict va kompilyatsiya natijasi (binary) keshi.
+"""
+
+import hashlib
+import logging
+import uuid
+
+from django.core.cache import cache
+
+from .judge import Judgement
+
+logger = logging.getLogger(__name__)
+
+VERDICT_TTL = 60 * 60 * 24          # 1 kun
+ARTIFACT_TTL = 60 * 60 * 24
+ARTIFACT_MAX_SIZE = 2 * 1024 * 1024  # 2MB dan katta binary keshlanmaydi
+# Faqat deterministik verdictlar: time_limit va internal_error serverning yuklamasiga
+# bog'liq bo'lishi mumkin, ular qayta tekshiriladi
+CACHEABLE_STATUSES = ('accepted', 'wrong_answer', 'runtime_error', 'compilation_error')
+
+
+def code_hash(code):
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def normalized_code_hash(code):
+    """CRLF va qator oxiridagi bo'shliqlarsiz — kompilyator natijasi o'zgarmaydi"""
+    lines = [line.rstrip() for line in code.replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+    while lines and lines[-1] == '':
+        lines.pop()
+    return code_hash('\n'.join(lines))
+
+
+# ============================================================
+# TEST TO'PLAMI VERSIYASI
+# ============================================================
+
+def _testset_key(problem_id):
+    return f'judge:testset:{problem_id}'
+
+
+def testset_version(problem_id):
+    """Tasodifiy token — kesh tozalansa ham eski verdictlarga qaytilmaydi"""
+    return cache.get_or_set(_testset_key(problem_id), lambda: uuid.uuid4().hex[:12], None)
+
+
+def bump_testset_version(problem_id):
+    cache.set(_testset_key(problem_id), uuid.uuid4().hex[:12], None)
+
+
+# ============================================================
+# VERDICT
+# ============================================================
+
+def _verdict_key(submission):
+    problem = submission.problem
+    scope = 'sample' if submission.is_sample_run else 'all'
+    return (
+        f'judge:verdict:{submission.language_id}:{code_hash(submission.code)}:'
+        f'{problem.id}:{problem.time_limit}:{scope}:{testset_version(problem.id)}'
+    )
+
+
+def get_verdict(submission):
+    """Oldingi bir xil yuborish natijasi (Judgement) yoki None"""
+    data = cache.get(_verdict_key(submission))
+    if not data:
+        return None
+    judgement = Judgement(data['total'])
+    judgement.results = data['results']
+    judgement.error_message = data['error_message']
+    return judgement
+
+
+def store_verdict(submission, judgement):
+    if judgement.status not in CACHEABLE_STATUSES:
+        return
+    cache.set(_verdict_key(submission), {
+        'total': judgement.total,
+        'results': judgement.results,
+        'error_message': judgement.error_message,
+    }, VERDICT_TTL)
+
+
+# ============================================================
+# KOMPILYATSIYA NATIJASI
+# ============================================================
+
+def _artifact_key(session):
+    language = session.language
+    command = hashlib.sha256(f'{language.docker_image}|{language.compile_cmd}'.encode()).hexdigest()[:16]
+    return f'judge:artifact:{command}:{normalized_code_hash(session.code)}'
+
+
+def compile_cached(session):
+    """
+    session.compile() o'rniga: kesh topilsa binary /tmp ga tiklanadi.
+    Returns: session.compile() bilan bir xil (None — kompilyatsiya yo'q).
+    """
+    if not session.language.compile_cmd:
+        return None
+
+    key = _artifact_key(session)
+    blob = cache.get(key)
+    if blob:
+        restored = session.restore_artifact(blob)
+        if restored is not None:
+            return restored
+        cache.delete(key)
+
+    compiled = session.compile()
+    if compiled and not (compiled['error'] or compiled['timed_out'] or compiled['exit_code'] != 0):
+        blob = session.export_artifact()
+        if blob and len(blob) <= ARTIFACT_MAX_SIZE:
+            cache.set(key, blob, ARTIFACT_TTL)
+    return compiled
@@ -0,0 +1,41 @@
+"""
+TestMakon.uz — Submission Status Stream
+Yuborish holatlarini Channels orqali push qilish.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def submission_payload(submission):
+    """api_submission_status va WS xabari uchun umumiy ko'rinish"""
+    return {
+        'id': submission.id,
+        'status': submission.status,
+        'status_display': submission.get_status_display(),
+        'passed_count': submission.passed_count,
+        'total_count': submission.total_count,
+        'execution_time': submission.execution_time,
+        'error_message': submission.error_message,
+        # running — tugagan case'lar oqim bilan yoziladi (progress)
+        'results': submission.results if submission.status != 'pending' else [],
+    }
+
+
+def publish(submission):
+    """submission_status xabarini user_<id> guruhiga yuborish"""
+    try:
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        channel_layer = get_channel_layer()
+        if not channel_layer:
+            return
+        async_to_sync(channel_layer.group_send)(f'user_{submission.user_id}', {
+            'type': 'submission_status',
+            'submission': submission_payload(submission),
+        })
+    except Exception as e:
+        # WS ishlamasa ham natija DB da — sahifa zaxira so'rov bilan oladi
+        logger.warning(f'Submission push xatosi: {e}')
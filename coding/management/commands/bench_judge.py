@@ -0,0 +1,195 @@
+"""
+TestMakon.uz — Judge throughput benchmark
+execute_code_submission + sandbox bir worker'da necha yuborishni ko'tarishini o'lchash.
+
+Usage:
+    python manage.py bench_judge --fake --inline               # Docker'siz (CI)
+    python manage.py bench_judge --inline --submissions 40     # shu jarayonda, haqiqiy Docker
+    python manage.py bench_judge --submissions 200             # Celery worker'lar orqali
+"""
+
+import io
+import itertools
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from coding.models import CodeSubmission, CodingProblem, ProgrammingLanguage
+
+BENCH_PHONE = '+998000000099'
+METRICS = ('queue_wait', 'compile', 'run', 'total')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = "Judge throughput benchmark (p50/p95/p99 latency, konteyner almashinuvi)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submissions', type=int, default=20, help="Har bir til uchun yuborishlar soni")
+        parser.add_argument('--languages', default='', help="Til slug'lari, vergul bilan (default: barcha faol)")
+        parser.add_argument('--concurrency', type=int, default=4, help="--inline: parallel worker'lar")
+        parser.add_argument('--inline', action='store_true', help="Task'larni Celery'siz shu jarayonda ishlatish")
+        parser.add_argument('--fake', action='store_true', help="Soxta sandbox (Docker'siz, SANDBOX_BACKEND=fake)")
+        parser.add_argument('--duplicates', type=int, default=0, help="Bir xil kod ulushi, % (verdict keshi)")
+        parser.add_argument('--timeout', type=int, default=600, help="Natijalarni kutish, soniya")
+
+    def handle(self, *args, **options):
+        if options['fake'] and not options['inline']:
+            raise CommandError("--fake faqat --inline bilan (worker'lar o'z SANDBOX_BACKEND ini ishlatadi)")
+
+        from coding import sandbox
+        backend = getattr(settings, 'SANDBOX_BACKEND', 'docker')
+        if options['fake']:
+            settings.SANDBOX_BACKEND = 'fake'
+            sandbox._pool = None
+        try:
+            self._bench(options)
+        finally:
+            if options['fake']:
+                if sandbox._pool:
+                    sandbox._pool.drain()
+                settings.SANDBOX_BACKEND = backend
+                sandbox._pool = None
+
+    def _bench(self, options):
+        if not CodingProblem.objects.filter(is_active=True, test_cases__isnull=False).exists():
+            self.stdout.write("Masalalar yo'q — setup_coding ishga tushirilmoqda...")
+            call_command('setup_coding', stdout=io.StringIO())
+
+        languages = ProgrammingLanguage.objects.filter(is_active=True)
+        if options['languages']:
+            languages = languages.filter(slug__in=options['languages'].split(','))
+        languages = list(languages)
+        if not languages:
+            raise CommandError("Faol dasturlash tili topilmadi")
+
+        from accounts.models import User
+        user, _ = User.objects.get_or_create(phone_number=BENCH_PHONE, defaults={'first_name': 'Bench'})
+        problem_stats = {
+            p['id']: p for p in CodingProblem.objects.values('id', 'total_submissions', 'accepted_submissions')
+        }
+
+        try:
+            submission_ids = self._create_submissions(user, languages, options)
+            elapsed, churn = self._run(submission_ids, options)
+            timings = [cache.get(self._timings_key(sid)) for sid in submission_ids]
+            self._report([t for t in timings if t], len(submission_ids), elapsed, churn)
+        finally:
+            CodeSubmission.objects.filter(user=user).delete()
+            user.delete()
+            for problem_id, stats in problem_stats.items():
+                CodingProblem.objects.filter(id=problem_id).update(
+                    total_submissions=stats['total_submissions'],
+                    accepted_submissions=stats['accepted_submissions'],
+                )
+
+    @staticmethod
+    def _timings_key(submission_id):
+        from coding.tasks import timings_key
+        return timings_key(submission_id)
+
+    def _create_submissions(self, user, languages, options):
+        counter = itertools.count()
+        submissions = []
+        for language in languages:
+            problems = list(
+                CodingProblem.objects.filter(is_active=True, languages=language, test_cases__isnull=False)
+                .distinct().order_by('order')
+            )
+            if not problems:
+                self.stdout.write(self.style.WARNING(f"  {language.name}: masala yo'q, o'tkazildi"))
+                continue
+            comment = '#' if language.slug == 'python' else '//'
+            for i in range(options['submissions']):
+                problem = problems[i % len(problems)]
+                code = problem.starter_code.get(language.slug, '') or f'{comment} bench\n'
+                # Takrorlanmas kod — verdict keshiga tushmasligi uchun (--duplicates bundan mustasno)
+                if i * 100 >= options['duplicates'] * options['submissions']:
+                    code += f'\n{comment} bench {next(counter)}\n'
+                submissions.append(CodeSubmission(
+                    user=user, problem=problem, language=language, code=code, status='pending',
+                ))
+        created = CodeSubmission.objects.bulk_create(submissions)
+        return [s.id for s in created]
+
+    def _run(self, submission_ids, options):
+        from coding.tasks import execute_code_submission
+
+        started = time.monotonic()
+        if options['inline']:
+            from coding.sandbox import get_pool
+            pool_before = dict(get_pool().stats)
+
+            def run_one(submission_id):
+                from django.db import close_old_connections
+                try:
+                    execute_code_submission(submission_id, record_timings=True)
+                finally:
+                    close_old_connections()
+
+            if options['concurrency'] > 1:
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                    list(executor.map(run_one, submission_ids))
+            else:
+                for submission_id in submission_ids:
+                    execute_code_submission(submission_id, record_timings=True)
+            pool_after = get_pool().stats
+            churn = {key: pool_after[key] - pool_before[key] for key in ('created', 'removed', 'reused')}
+            return time.monotonic() - started, churn
+
+        for submission_id in submission_ids:
+            execute_code_submission.delay(submission_id, record_timings=True)
+        pending = set(submission_ids)
+        deadline = started + options['timeout']
+        while pending and time.monotonic() < deadline:
+            pending -= {sid for sid in pending if cache.get(self._timings_key(sid))}
+            time.sleep(0.5)
+        if pending:
+            self.stdout.write(self.style.WARNING(f"  {len(pending)} ta yuborish vaqtida tugamadi"))
+        return time.monotonic() - started, None
+
+    def _report(self, timings, total, elapsed, churn):
+        self.stdout.write('\n' + '=' * 72)
+        self.stdout.write('  JUDGE BENCHMARK')
+        self.stdout.write('=' * 72)
+        self.stdout.write(f"  Yuborishlar: {len(timings)}/{total}   vaqt: {elapsed:.1f}s   "
+                          f"throughput: {len(timings) / elapsed * 60 if elapsed else 0:.1f}/min")
+        self.stdout.write(f"  Verdict keshidan: {sum(1 for t in timings if t['cached'])}")
+
+        groups = {'ALL': timings}
+        for t in timings:
+            groups.setdefault(t['language'], []).append(t)
+
+        header = f"  {'til':<12}{'metrika':<12}{'p50':>10}{'p95':>10}{'p99':>10}   (ms)"
+        self.stdout.write('\n' + header)
+        self.stdout.write('  ' + '-' * (len(header) - 2))
+        for name, items in groups.items():
+            for metric in METRICS:
+                values = [t[metric] for t in items]
+                self.stdout.write(
+                    f"  {name:<12}{metric:<12}"
+                    f"{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}{percentile(values, 99):>10.1f}"
+                )
+
+        if churn is None:
+            churn = {
+                'created': sum(t['containers_created'] for t in timings),
+                'removed': sum(t['containers_removed'] for t in timings),
+                'reused': sum(t['containers_reused'] for t in timings),
+            }
+        self.stdout.write(
+            f"\n  Konteynerlar: yaratildi {churn['created']}, o'chirildi {churn['removed']}, "
+            f"qayta ishlatildi {churn['reused']}"
+        )
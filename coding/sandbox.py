@@ -6,6 +6,10 @@ Xavfsiz konteynerda kod ishlatish
 import docker
 import tempfile
 import os
+import queue
+import shutil
+import socket
+import threading
 import time
 import logging
 
@@ -13,169 +17,413 @@ logger = logging.getLogger(__name__)
 
 # Defaults — settings.py dan override qilinadi
 DEFAULT_TIME_LIMIT = 5  # seconds
+DEFAULT_COMPILE_TIME_LIMIT = 15  # seconds
 DEFAULT_MEMORY_LIMIT = '256m'
 DEFAULT_CPU_PERIOD = 100000
 DEFAULT_CPU_QUOTA = 50000  # 50% CPU
 DEFAULT_PIDS_LIMIT = 64
+DEFAULT_POOL_SIZE = 2  # har bir image uchun bo'sh turadigan konteynerlar
+DEFAULT_CONTAINER_MAX_USES = 100
 MAX_OUTPUT_SIZE = 5000  # chars
 
 # Docker-in-Docker uchun umumiy papka
 # Celery konteyner VA host bir xil papkani ko'radi
 SANDBOX_DIR = '/tmp/testmakon_sandbox'
 
+# Pul konteynerlari belgisi: qiymati "<host>:<pid>" — egasi o'lgan bo'lsa cleanup o'chiradi
+POOL_LABEL = 'testmakon.sandbox'
 
-class DockerSandbox:
-    """Docker konteynerda xavfsiz kod ishlatish"""
+# `timeout -s KILL` — vaqt tugasa 137 (ba'zi implementatsiyalarda 124)
+TIMEOUT_EXIT_CODES = (124, 137)
 
-    def __init__(self):
-        self.client = docker.from_env()
 
-    def execute(self, language, code, input_data='', time_limit=None, memory_limit=None):
-        """
-        Kodni Docker konteynerda ishlatadi.
+def _setting(name, default):
+    from django.conf import settings as django_settings
+    return getattr(django_settings, name, default)
 
-        Returns:
-            dict: {
-                'stdout': str,
-                'stderr': str,
-                'exit_code': int,
-                'execution_time': float (ms),
-                'timed_out': bool,
-                'error': str or None,
-            }
-        """
-        from django.conf import settings as django_settings
 
-        time_limit = time_limit or getattr(django_settings, 'SANDBOX_TIME_LIMIT', DEFAULT_TIME_LIMIT)
-        mem_limit = memory_limit or getattr(django_settings, 'SANDBOX_MEMORY_LIMIT', DEFAULT_MEMORY_LIMIT)
+def _result(stdout='', stderr='', exit_code=-1, execution_time=0, timed_out=False, error=None):
+    return {
+        'stdout': stdout[:MAX_OUTPUT_SIZE],
+        'stderr': stderr[:MAX_OUTPUT_SIZE],
+        'exit_code': exit_code,
+        'execution_time': round(execution_time, 2),
+        'timed_out': timed_out,
+        'error': error,
+    }
 
-        container = None
-        tmpdir = None
 
-        try:
-            # Umumiy papkada vaqtinchalik katalog yaratish
-            # Bu papka host va celery konteynerda bir xil path'da
-            os.makedirs(SANDBOX_DIR, exist_ok=True)
-            tmpdir = tempfile.mkdtemp(prefix='run_', dir=SANDBOX_DIR)
-
-            # Java uchun fayl nomi — public class nomi bilan mos bo'lishi SHART
-            if language.slug == 'java':
-                code_file = f"Solution{language.file_extension}"
-            else:
-                code_file = f"solution{language.file_extension}"
-
-            # Kod faylini yozish
-            code_path = os.path.join(tmpdir, code_file)
-            with open(code_path, 'w') as f:
-                f.write(code)
-
-            # Input file
-            input_path = os.path.join(tmpdir, 'input.txt')
-            with open(input_path, 'w') as f:
-                f.write(input_data)
-
-            # nobody user o'qiy olishi uchun ruxsat berish
-            os.chmod(tmpdir, 0o755)
-            os.chmod(code_path, 0o644)
-            os.chmod(input_path, 0o644)
-
-            # Command — compile + run yoki faqat run
-            if language.compile_cmd:
-                compile_cmd = language.compile_cmd.replace('{file}', f'/sandbox/{code_file}')
-                run_cmd = language.run_cmd.replace('{file}', f'/sandbox/{code_file}')
-                cmd = f"sh -c '{compile_cmd} && {run_cmd} < /sandbox/input.txt'"
-            else:
-                run_cmd = language.run_cmd.replace('{file}', f'/sandbox/{code_file}')
-                cmd = f"sh -c '{run_cmd} < /sandbox/input.txt'"
+def _code_filename(language):
+    # Java uchun fayl nomi — public class nomi bilan mos bo'lishi SHART
+    if language.slug == 'java':
+        return f"Solution{language.file_extension}"
+    return f"solution{language.file_extension}"
+
+
+# ============================================================
+# KONTEYNER PULI
+# ============================================================
+
+class PooledContainer:
+    """Puldagi konteyner va unga /sandbox sifatida bog'langan host papka"""
+
+    def __init__(self, container, workdir, key):
+        self.container = container
+        self.workdir = workdir
+        self.key = key
+        self.uses = 0
+
 
+class ContainerPool:
+    """
+    Worker jarayoni uchun (image, mem_limit) bo'yicha issiq konteynerlar.
+    Thread-safe: bir jarayonda bir nechta sessiya parallel ishlashi mumkin.
+    """
+
+    def __init__(self, client, size=None, max_uses=None):
+        self.client = client
+        self.size = size if size is not None else _setting('SANDBOX_POOL_SIZE', DEFAULT_POOL_SIZE)
+        self.max_uses = max_uses or _setting('SANDBOX_CONTAINER_MAX_USES', DEFAULT_CONTAINER_MAX_USES)
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.stats = {'created': 0, 'reused': 0, 'removed': 0}
+
+    def _create(self, image, mem_limit):
+        # Limitlar bitta case uchun: konteynerda bir vaqtda faqat bitta case ishlaydi
+        # (parallel case'lar — alohida konteynerlarda, SandboxSession.expand)
+        os.makedirs(SANDBOX_DIR, exist_ok=True)
+        workdir = tempfile.mkdtemp(prefix='pool_', dir=SANDBOX_DIR)
+        # nobody user o'qiy olishi uchun ruxsat berish
+        os.chmod(workdir, 0o755)
+        try:
             # /tmp — kompilatsiya uchun yozish + ishga tushirish ruxsati (exec)
-            # /sandbox — faqat o'qish (foydalanuvchi kodi)
+            # /sandbox — faqat o'qish (foydalanuvchi kodi va input'lar)
             container = self.client.containers.run(
-                image=language.docker_image,
-                command=cmd,
-                volumes={tmpdir: {'bind': '/sandbox', 'mode': 'ro'}},
+                image=image,
+                command=['tail', '-f', '/dev/null'],
+                volumes={workdir: {'bind': '/sandbox', 'mode': 'ro'}},
                 working_dir='/sandbox',
                 network_mode='none',          # Tarmoq yo'q
                 read_only=True,               # Faqat o'qish
                 mem_limit=mem_limit,
-                memswap_limit=mem_limit,       # Swap yo'q
+                memswap_limit=mem_limit,      # Swap yo'q
                 cpu_period=DEFAULT_CPU_PERIOD,
                 cpu_quota=DEFAULT_CPU_QUOTA,
-                pids_limit=DEFAULT_PIDS_LIMIT, # Fork bomb himoyasi
+                pids_limit=DEFAULT_PIDS_LIMIT,  # Fork bomb himoyasi
                 security_opt=['no-new-privileges'],
                 user='nobody',
                 tmpfs={'/tmp': 'size=50M,exec'},  # Yozish + ishga tushirish (kompilatsiya uchun)
+                labels={POOL_LABEL: self.owner},
                 detach=True,
-                stdout=True,
-                stderr=True,
             )
+        except Exception:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        with self._lock:
+            self.stats['created'] += 1
+        return PooledContainer(container, workdir, (image, mem_limit))
 
-            # Kutish — timeout bilan
-            start_time = time.time()
-            try:
-                result = container.wait(timeout=time_limit)
-                execution_time = (time.time() - start_time) * 1000  # ms
-                exit_code = result.get('StatusCode', -1)
-                timed_out = False
-            except Exception:
-                # Timeout
-                execution_time = time_limit * 1000
-                exit_code = -1
-                timed_out = True
-                try:
-                    container.kill()
-                except Exception:
-                    pass
+    def acquire(self, image, mem_limit):
+        """Bo'sh konteyner olish yoki yangisini yaratish"""
+        key = (image, mem_limit)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats['reused'] += 1
+                return idle.pop()
+        return self._create(image, mem_limit)
 
-            # Output olish
-            stdout = container.logs(stdout=True, stderr=False).decode('utf-8', errors='replace')
-            stderr = container.logs(stdout=False, stderr=True).decode('utf-8', errors='replace')
-
-            # Output limitlash
-            stdout = stdout[:MAX_OUTPUT_SIZE]
-            stderr = stderr[:MAX_OUTPUT_SIZE]
-
-            return {
-                'stdout': stdout,
-                'stderr': stderr,
-                'exit_code': exit_code,
-                'execution_time': round(execution_time, 2),
-                'timed_out': timed_out,
-                'error': None,
-            }
+    def acquire_idle(self, image, mem_limit):
+        """Faqat bo'sh turgan konteyner (yangisi yaratilmaydi) yoki None"""
+        with self._lock:
+            idle = self._idle.get((image, mem_limit))
+            if idle:
+                self.stats['reused'] += 1
+                return idle.pop()
+        return None
+
+    def release(self, pooled, clean=True):
+        """Sessiya tugadi — tozalab pulga qaytarish yoki o'chirish"""
+        pooled.uses += 1
+        if clean and pooled.uses < self.max_uses and self._reset(pooled):
+            with self._lock:
+                idle = self._idle.setdefault(pooled.key, [])
+                if len(idle) < self.size:
+                    idle.append(pooled)
+                    return
+        self.remove(pooled)
+
+    def _reset(self, pooled):
+        """Papka va /tmp ni tozalash; faqat `tail` qolgan bo'lsa qayta ishlatish mumkin"""
+        try:
+            for name in os.listdir(pooled.workdir):
+                os.remove(os.path.join(pooled.workdir, name))
+            pooled.container.exec_run(['sh', '-c', 'rm -rf /tmp/* /tmp/.[!.]* 2>/dev/null; true'])
+            processes = pooled.container.top().get('Processes') or []
+            return len(processes) == 1
+        except Exception as e:
+            logger.warning(f"Sandbox konteynerni tozalab bo'lmadi: {e}")
+            return False
+
+    def remove(self, pooled):
+        try:
+            pooled.container.remove(force=True)
+        except Exception:
+            pass
+        shutil.rmtree(pooled.workdir, ignore_errors=True)
+        with self._lock:
+            self.stats['removed'] += 1
+
+    def prewarm(self, image, mem_limit):
+        """Pulni `size` tagacha to'ldirish (worker ishga tushganda)"""
+        key = (image, mem_limit)
+        while True:
+            with self._lock:
+                if len(self._idle.get(key, [])) >= self.size:
+                    return
+            pooled = self._create(image, mem_limit)
+            with self._lock:
+                self._idle.setdefault(key, []).append(pooled)
+
+    def drain(self):
+        """Barcha bo'sh konteynerlarni o'chirish (worker to'xtaganda)"""
+        with self._lock:
+            idle = [p for containers in self._idle.values() for p in containers]
+            self._idle = {}
+        for pooled in idle:
+            self.remove(pooled)
+
+
+_pool = None
+_pool_lock = threading.Lock()
 
+
+def _make_client():
+    """SANDBOX_BACKEND: 'docker' (default) yoki 'fake' — Docker'siz (coding.fake_sandbox)"""
+    if _setting('SANDBOX_BACKEND', 'docker') == 'fake':
+        from coding.fake_sandbox import FakeDockerClient
+        return FakeDockerClient()
+    return docker.from_env()
+
+
+def get_pool():
+    """Joriy jarayon puli (fork'dan keyin yangisi yaratiladi)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.owner != f'{socket.gethostname()}:{os.getpid()}':
+            _pool = ContainerPool(_make_client())
+        return _pool
+
+
+# ============================================================
+# SESSIYA
+# ============================================================
+
+class SandboxSession:
+    """
+    Bitta yuborish uchun tayyorlangan muhit:
+        with sandbox.session(language, code, time_limit) as session:
+            compiled = session.compile()     # None — interpretatsiya tillari
+            result = session.run(input_data)
+    run() bir nechta thread'dan parallel chaqirilishi mumkin: har bir case bo'sh
+    konteynerda ishlaydi, expand() dan keyin — bir nechtasi bir vaqtda.
+    """
+
+    def __init__(self, pool, language, code, time_limit=None, memory_limit=None):
+        self.pool = pool
+        self.language = language
+        self.code = code
+        self.time_limit = time_limit or _setting('SANDBOX_TIME_LIMIT', DEFAULT_TIME_LIMIT)
+        self.mem_limit = memory_limit or _setting('SANDBOX_MEMORY_LIMIT', DEFAULT_MEMORY_LIMIT)
+        self.code_file = _code_filename(language)
+        self.pooled = None
+        self.extra = []
+        self.error = None
+        self.tainted = set()
+        self._free = queue.Queue()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        try:
+            self.pooled = self.pool.acquire(self.language.docker_image, self.mem_limit)
+            self._free.put(self.pooled)
+            self._write(self.pooled, self.code_file, self.code)
         except docker.errors.ImageNotFound:
-            return {
-                'stdout': '',
-                'stderr': '',
-                'exit_code': -1,
-                'execution_time': 0,
-                'timed_out': False,
-                'error': f"Docker image topilmadi: {language.docker_image}",
-            }
+            self.error = f"Docker image topilmadi: {self.language.docker_image}"
         except Exception as e:
             logger.exception(f"Sandbox xato: {e}")
-            return {
-                'stdout': '',
-                'stderr': '',
-                'exit_code': -1,
-                'execution_time': 0,
-                'timed_out': False,
-                'error': str(e),
-            }
+            self.error = str(e)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for pooled in filter(None, [self.pooled, *self.extra]):
+            self.pool.release(pooled, clean=pooled not in self.tainted and exc_type is None)
+        self.pooled = None
+        self.extra = []
+        return False
+
+    def _write(self, pooled, name, content):
+        path = os.path.join(pooled.workdir, name)
+        with open(path, 'wb' if isinstance(content, bytes) else 'w') as f:
+            f.write(content)
+        os.chmod(path, 0o644)
+
+    def _command(self, template):
+        return template.replace('{file}', f'/sandbox/{self.code_file}')
+
+    def _exec(self, command, limit, pooled=None):
+        if self.error:
+            return _result(error=self.error)
+        pooled = pooled or self.pooled
+        start_time = time.time()
+        try:
+            exit_code, (stdout, stderr) = pooled.container.exec_run(
+                ['timeout', '-s', 'KILL', str(limit), 'sh', '-c', command],
+                workdir='/sandbox',
+                demux=True,
+            )
+        except Exception as e:
+            logger.exception(f"Sandbox xato: {e}")
+            self.tainted.add(pooled)
+            return _result(error=str(e))
+        execution_time = (time.time() - start_time) * 1000  # ms
+        timed_out = exit_code in TIMEOUT_EXIT_CODES and execution_time >= limit * 1000
+        return _result(
+            stdout=(stdout or b'').decode('utf-8', errors='replace'),
+            stderr=(stderr or b'').decode('utf-8', errors='replace'),
+            exit_code=-1 if timed_out else exit_code,
+            execution_time=limit * 1000 if timed_out else execution_time,
+            timed_out=timed_out,
+        )
+
+    def compile(self):
+        """Bir marta kompilyatsiya. Returns: natija dict yoki None (kompilyatsiya yo'q)"""
+        if not self.language.compile_cmd:
+            return None
+        limit = _setting('SANDBOX_COMPILE_TIME_LIMIT', DEFAULT_COMPILE_TIME_LIMIT)
+        return self._exec(self._command(self.language.compile_cmd), limit)
+
+    def export_artifact(self):
+        """Kompilyatsiyadan keyingi /tmp — tar arxiv (bytes) yoki None"""
+        if self.error:
+            return None
+        try:
+            exit_code, (stdout, _) = self.pooled.container.exec_run(
+                ['tar', '-C', '/tmp', '-cf', '-', '.'], demux=True,
+            )
+        except Exception as e:
+            logger.warning(f"Kompilyatsiya natijasini olib bo'lmadi: {e}")
+            return None
+        return stdout if exit_code == 0 and stdout else None
+
+    def restore_artifact(self, blob, pooled=None):
+        """Keshdagi arxivni /tmp ga ochish. Returns: kompilyatsiya natijasi yoki None"""
+        if self.error:
+            return None
+        pooled = pooled or self.pooled
+        self._write(pooled, 'artifact.tar', blob)
+        limit = _setting('SANDBOX_COMPILE_TIME_LIMIT', DEFAULT_COMPILE_TIME_LIMIT)
+        result = self._exec('tar -C /tmp -xf /sandbox/artifact.tar', limit, pooled)
+        if result['error'] or result['exit_code'] != 0:
+            return None
+        return result
+
+    def expand(self, count):
+        """
+        Kompilyatsiyadan keyin parallel case'lar uchun qo'shimcha konteynerlar —
+        har case o'z konteyneri (cgroup) limitlari bilan ishlaydi. Faqat puldagi
+        bo'sh konteynerlar olinadi; ular bo'lmasa case'lar ketma-ket ishlaydi.
+        Returns: bir vaqtda ishlay oladigan case'lar soni.
+        """
+        if self.error or count <= 1:
+            return 1
+        blob = None
+        if self.language.compile_cmd:
+            blob = self.export_artifact()
+            if blob is None:
+                return 1
+        while 1 + len(self.extra) < count:
+            pooled = self.pool.acquire_idle(self.language.docker_image, self.mem_limit)
+            if pooled is None:
+                break
+            self.extra.append(pooled)
+            try:
+                self._write(pooled, self.code_file, self.code)
+            except Exception as e:
+                logger.warning(f"Sandbox konteynerini tayyorlab bo'lmadi: {e}")
+                self.tainted.add(pooled)
+                break
+            if blob and self.restore_artifact(blob, pooled) is None:
+                self.tainted.add(pooled)
+                break
+            self._free.put(pooled)
+        return self._free.qsize()
+
+    def run(self, input_data=''):
+        """Bitta test case — faqat o'z input fayli bilan (keyin o'chiriladi), bo'sh konteynerda"""
+        if self.error:
+            return _result(error=self.error)
+        with self._lock:
+            self._counter += 1
+            input_file = f'input_{self._counter}.txt'
+        pooled = self._free.get()
+        try:
+            self._write(pooled, input_file, input_data)
+            return self._exec(
+                f"{self._command(self.language.run_cmd)} < /sandbox/{input_file}",
+                self.time_limit,
+                pooled,
+            )
         finally:
-            # Cleanup
-            if container:
-                try:
-                    container.remove(force=True)
-                except Exception:
-                    pass
-            if tmpdir:
-                try:
-                    import shutil
-                    shutil.rmtree(tmpdir, ignore_errors=True)
-                except Exception:
-                    pass
+            # Keyingi case'lar (namunalar stdout'i ko'rsatiladi) oldingi input'larni o'qiy olmasin
+            try:
+                os.remove(os.path.join(pooled.workdir, input_file))
+            except OSError:
+                pass
+            self._free.put(pooled)
+
+
+class DockerSandbox:
+    """Docker konteynerda xavfsiz kod ishlatish"""
+
+    def __init__(self):
+        self.pool = get_pool()
+        self.client = self.pool.client
+
+    def session(self, language, code, time_limit=None, memory_limit=None):
+        """Yuborish uchun sessiya (kompilyatsiya bir marta, test case'lar shu konteynerda)"""
+        return SandboxSession(self.pool, language, code, time_limit, memory_limit)
+
+    def execute(self, language, code, input_data='', time_limit=None, memory_limit=None):
+        """
+        Kodni Docker konteynerda ishlatadi (bitta input uchun).
+
+        Returns:
+            dict: {
+                'stdout': str,
+                'stderr': str,
+                'exit_code': int,
+                'execution_time': float (ms),
+                'timed_out': bool,
+                'error': str or None,
+            }
+        """
+        with self.session(language, code, time_limit, memory_limit) as session:
+            compiled = session.compile()
+            if compiled and (compiled['error'] or compiled['exit_code'] != 0 or compiled['timed_out']):
+                return compiled
+            return session.run(input_data)
+
+    def prewarm(self, languages):
+        """Faol tillar uchun pulni oldindan to'ldirish"""
+        mem_limit = _setting('SANDBOX_MEMORY_LIMIT', DEFAULT_MEMORY_LIMIT)
+        for image in {lang.docker_image for lang in languages}:
+            try:
+                self.pool.prewarm(image, mem_limit)
+            except Exception as e:
+                logger.warning(f"Sandbox pulini to'ldirib bo'lmadi ({image}): {e}")
 
     def cleanup_old_containers(self, label='testmakon'):
         """Eski konteynerlarni tozalash"""
@@ -192,7 +440,30 @@ class DockerSandbox:
                         removed += 1
                 except Exception:
                     pass
+            removed += self._cleanup_orphan_pool_containers()
             return removed
         except Exception as e:
             logger.error(f"Cleanup xato: {e}")
             return 0
+
+    def _cleanup_orphan_pool_containers(self):
+        """Shu hostdagi o'lgan worker jarayonlarining pul konteynerlari"""
+        hostname = socket.gethostname()
+        removed = 0
+        for c in self.client.containers.list(filters={'label': POOL_LABEL}):
+            host, _, pid = c.labels.get(POOL_LABEL, '').partition(':')
+            if host != hostname or not pid.isdigit():
+                continue
+            try:
+                os.kill(int(pid), 0)
+                continue  # egasi tirik
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                continue
+            try:
+                c.remove(force=True)
+                removed += 1
+            except Exception:
+                pass
+        return removed
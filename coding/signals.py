@@ -0,0 +1,16 @@
+"""
+TestMakon.uz - Coding Signals
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .judge_cache import bump_testset_version
+from .models import TestCase
+
+
+@receiver(post_save, sender=TestCase)
+@receiver(post_delete, sender=TestCase)
+def refresh_testset_version(sender, instance, **kwargs):
+    """Test case qo'shilsa/o'zgarsa/o'chirilsa — masalaning keshlangan verdictlari eskiradi"""
+    bump_testset_version(instance.problem_id)
@@ -3,38 +3,42 @@ TestMakon.uz — Coding Celery Tasks
 """
 
 from celery import shared_task
+from celery.signals import worker_process_init, worker_process_shutdown
+from django.core.cache import cache
 from django.db.models import F
 from django.utils import timezone
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
-def _normalize_output(text):
-    """Output normallashtirish — solishtirish uchun"""
-    text = text.replace('\r\n', '\n').replace('\r', '\n')
-    lines = [line.rstrip() for line in text.strip().split('\n')]
-    while lines and lines[-1] == '':
-        lines.pop()
-    return '\n'.join(lines)
+def timings_key(submission_id):
+    return f'judge:timings:{submission_id}'
 
 
 @shared_task(bind=True, max_retries=2, time_limit=120)
-def execute_code_submission(self, submission_id):
-    """Kodni Docker sandbox'da ishlatish — barcha test case'lar"""
+def execute_code_submission(self, submission_id, record_timings=False):
+    """
+    Kodni Docker sandbox'da ishlatish — barcha test case'lar.
+    record_timings=True (bench_judge) — bosqich vaqtlari cache'ga yoziladi.
+    """
+    from coding.judge import judge
+    from coding.judge_cache import get_verdict, store_verdict
+    from coding.live import publish
     from coding.models import CodeSubmission
-    from coding.sandbox import DockerSandbox
+    from coding.sandbox import DockerSandbox, get_pool
 
     try:
         submission = CodeSubmission.objects.select_related('problem', 'language').get(id=submission_id)
     except CodeSubmission.DoesNotExist:
         return
 
-    # Status: running
-    submission.status = 'running'
-    submission.save(update_fields=['status'])
+    task_started = time.monotonic()
+    queue_wait = (timezone.now() - submission.created_at).total_seconds() * 1000
+    pool_before = dict(get_pool().stats) if record_timings else None
 
-    sandbox = DockerSandbox()
     problem = submission.problem
 
     # Test case'larni olish
@@ -43,79 +47,61 @@ def execute_code_submission(self, submission_id):
     else:
         test_cases = problem.test_cases.all().order_by('order')
 
-    results = []
-    passed = 0
-    max_time = 0
-    final_status = 'accepted'
-
-    # Test case'larni listga olish — break bo'lganda ham total_count to'g'ri bo'lishi uchun
+    # Test case'larni listga olish — to'xtatilganda ham total_count to'g'ri bo'lishi uchun
     test_cases_list = list(test_cases)
 
-    for tc in test_cases_list:
-        result = sandbox.execute(
-            language=submission.language,
-            code=submission.code,
-            input_data=tc.input_data,
-            time_limit=problem.time_limit,
+    # Status: running (total_count — polling progress ko'rsatishi uchun)
+    submission.status = 'running'
+    submission.total_count = len(test_cases_list)
+    submission.save(update_fields=['status', 'total_count'])
+    publish(submission)
+
+    def save_progress(judgement):
+        # Tugagan case'lar — WS orqali push, zaxira so'rov uchun DB ga ham
+        submission.results = judgement.results
+        submission.passed_count = judgement.passed
+        CodeSubmission.objects.filter(id=submission.id).update(
+            results=judgement.results,
+            passed_count=judgement.passed,
         )
-
-        # Natijani tekshirish
-        if result['error']:
-            tc_status = 'internal_error'
-            final_status = 'internal_error'
-        elif result['timed_out']:
-            tc_status = 'time_limit'
-            if final_status == 'accepted':
-                final_status = 'time_limit'
-        elif result['exit_code'] != 0:
-            # Compilation vs runtime error ajratish
-            if submission.language.compile_cmd and result['stderr']:
-                tc_status = 'compilation_error'
-            else:
-                tc_status = 'runtime_error'
-            if final_status == 'accepted':
-                final_status = tc_status
-        else:
-            expected = _normalize_output(tc.expected_output)
-            actual = _normalize_output(result['stdout'])
-            if actual == expected:
-                tc_status = 'accepted'
-                passed += 1
-            else:
-                tc_status = 'wrong_answer'
-                if final_status == 'accepted':
-                    final_status = 'wrong_answer'
-
-        max_time = max(max_time, result['execution_time'])
-
-        tc_result = {
-            'test_case_id': tc.id,
-            'order': tc.order,
-            'is_sample': tc.is_sample,
-            'status': tc_status,
-            'execution_time': result['execution_time'],
-            'stdout': result['stdout'][:1000] if tc.is_sample else '',
-            'stderr': result['stderr'][:500] if tc.is_sample else '',
-            'expected': tc.expected_output[:500] if tc.is_sample else '',
-            'input': tc.input_data[:500] if tc.is_sample else '',
-        }
-        results.append(tc_result)
-
-        # Compilation error — barchasida bir xil, to'xtatish
-        if tc_status in ('compilation_error', 'internal_error'):
-            submission.error_message = result['stderr'] or result['error'] or ''
-            break
+        publish(submission)
+
+    # Bir xil kod shu test to'plamida avval baholangan bo'lsa — sandbox'siz
+    judgement = get_verdict(submission)
+    cached = judgement is not None
+    if judgement is None:
+        # Issiq konteyner: kompilyatsiya bir marta, case'lar puldagi bo'sh konteynerlarda parallel
+        sandbox = DockerSandbox()
+        with sandbox.session(submission.language, submission.code, time_limit=problem.time_limit) as session:
+            judgement = judge(session, test_cases_list, on_progress=save_progress)
+        store_verdict(submission, judgement)
 
     # Saqlash
-    submission.results = results
-    submission.passed_count = passed
+    submission.results = judgement.results
+    submission.passed_count = judgement.passed
     submission.total_count = len(test_cases_list)
-    submission.execution_time = max_time
-    submission.status = final_status
+    submission.execution_time = judgement.max_time
+    submission.status = judgement.status
+    submission.error_message = judgement.error_message
     submission.save(update_fields=[
         'results', 'passed_count', 'total_count',
         'execution_time', 'status', 'error_message'
     ])
+    publish(submission)
+
+    if record_timings:
+        pool_after = get_pool().stats
+        cache.set(timings_key(submission.id), {
+            'language': submission.language.slug,
+            'queue_wait': queue_wait,
+            'compile': judgement.compile_time,
+            'run': judgement.run_time,
+            'total': (time.monotonic() - task_started) * 1000,
+            'cached': cached,
+            'containers_created': pool_after['created'] - pool_before['created'],
+            'containers_removed': pool_after['removed'] - pool_before['removed'],
+            'containers_reused': pool_after['reused'] - pool_before['reused'],
+        }, 60 * 60)
 
     # Stats yangilash (faqat to'liq submit uchun, sample run emas)
     if not submission.is_sample_run:
@@ -200,6 +186,33 @@ def _update_user_stats(submission):
         stats.save(update_fields=['language_stats'])
 
 
+@worker_process_init.connect
+def prewarm_sandbox_pool(**kwargs):
+    """Worker jarayoni ishga tushganda faol tillar uchun issiq konteynerlar"""
+    from django.conf import settings
+    if not getattr(settings, 'SANDBOX_PREWARM', True):
+        return
+
+    def warm():
+        try:
+            from coding.models import ProgrammingLanguage
+            from coding.sandbox import DockerSandbox
+            DockerSandbox().prewarm(ProgrammingLanguage.objects.filter(is_active=True))
+        except Exception as e:
+            logger.warning(f"Sandbox pul tayyorlanmadi: {e}")
+
+    # Worker ishga tushishini kutdirmaslik uchun fonda
+    threading.Thread(target=warm, daemon=True).start()
+
+
+@worker_process_shutdown.connect
+def drain_sandbox_pool(**kwargs):
+    """Worker to'xtaganda puldagi konteynerlarni o'chirish"""
+    from coding import sandbox
+    if sandbox._pool is not None:
+        sandbox._pool.drain()
+
+
 @shared_task
 def cleanup_old_containers():
     """Eski Docker konteynerlarni tozalash — har 30 daqiqada"""
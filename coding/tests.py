@@ -1,3 +1,285 @@
+import os
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from coding.models import (
+    ProgrammingLanguage, CodingProblem, CodeSubmission,
+    TestCase as JudgeTestCase,
+)
+from coding.sandbox import ContainerPool
+
+User = get_user_model()
+
+
+class FakeContainer:
+    """exec_run: kompilyatsiya — muvaffaqiyat, run — input faylni qaytaradi"""
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+        self.commands = []
+        self.removed = False
+
+    def exec_run(self, cmd, workdir=None, demux=False):
+        command = ' '.join(cmd) if isinstance(cmd, list) else cmd
+        self.commands.append(command)
+        if 'g++' in command:
+            return 0, (b'', b'')
+        if command.startswith('tar -C /tmp -cf'):
+            return 0, (b'ARTIFACT', b'')
+        if '< /sandbox/' in command:
+            name = command.rsplit('/sandbox/', 1)[1]
+            with open(os.path.join(self.workdir, name)) as f:
+                return 0, (f.read().encode(), b'')
+        return 0, (b'', b'')
+
+    def top(self):
+        return {'Processes': [['nobody', 'tail -f /dev/null']]}
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeClient:
+    def __init__(self):
+        self.started = []
+        self.run_kwargs = []
+        self.containers = self
+
+    def run(self, image, volumes=None, **kwargs):
+        container = FakeContainer(next(iter(volumes)))
+        self.started.append(container)
+        self.run_kwargs.append(kwargs)
+        return container
+
+
+def make_language(**kwargs):
+    data = dict(
+        name='C++', slug='cpp', docker_image='gcc:13-bookworm',
+        compile_cmd='g++ -O2 -o /tmp/solution {file}', run_cmd='/tmp/solution',
+        file_extension='.cpp', monaco_language='cpp',
+    )
+    data.update(kwargs)
+    return ProgrammingLanguage.objects.create(**data)
+
+
+class SandboxPoolTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_fake = FakeClient()
+        self.pool = ContainerPool(self.client_fake, size=2)
+        self.addCleanup(self.pool.drain)
+        patcher = patch('coding.sandbox.get_pool', return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.language = make_language()
+        self.user = User.objects.create_user(phone_number='+998901110001', password='pass12345')
+        self.problem = CodingProblem.objects.create(
+            title='Echo', slug='echo', description='-', input_format='-', output_format='-',
+        )
+        for i in range(3):
+            JudgeTestCase.objects.create(
+                problem=self.problem, input_data=f'{i}\n', expected_output=f'{i}', order=i,
+            )
+
+    def _submit(self, code='int main(){}'):
+        from coding.tasks import execute_code_submission
+        submission = CodeSubmission.objects.create(
+            user=self.user, problem=self.problem, language=self.language, code=code,
+        )
+        execute_code_submission(submission.id)
+        submission.refresh_from_db()
+        return submission
+
+    def test_compiles_once_and_runs_all_cases_in_one_container(self):
+        submission = self._submit()
+        self.assertEqual(submission.status, 'accepted')
+        self.assertEqual(submission.passed_count, 3)
+
+        self.assertEqual(len(self.client_fake.started), 1)
+        commands = self.client_fake.started[0].commands
+        self.assertEqual(sum('g++' in c for c in commands), 1)
+        self.assertEqual(sum('< /sandbox/input_' in c for c in commands), 3)
+
+    def test_container_limits_are_per_case(self):
+        self._submit()
+        limits = self.client_fake.run_kwargs[0]
+        self.assertEqual(limits['mem_limit'], '256m')
+        self.assertEqual(limits['memswap_limit'], '256m')
+        self.assertEqual(limits['cpu_quota'], 50000)
+        self.assertEqual(limits['pids_limit'], 64)
+        self.assertEqual(limits['tmpfs'], {'/tmp': 'size=50M,exec'})
+
+    def test_parallel_cases_run_in_idle_pool_containers(self):
+        self.pool.prewarm(self.language.docker_image, '256m')
+        submission = self._submit()
+        self.assertEqual(submission.status, 'accepted')
+
+        primary, extra = self.client_fake.started
+        commands = self._commands()
+        self.assertEqual(sum('g++' in c for c in commands), 1)
+        self.assertEqual(sum('< /sandbox/input_' in c for c in commands), 3)
+        # Ikkinchi konteynerga kompilyatsiya natijasi tiklanadi, yangi konteyner yaratilmaydi
+        self.assertEqual(sum('tar -C /tmp -xf' in c for c in extra.commands + primary.commands), 1)
+        self.assertEqual(self.pool.stats['created'], 2)
+
+    def test_case_input_removed_after_run(self):
+        from coding.sandbox import DockerSandbox
+        with DockerSandbox().session(self.language, 'int main(){}') as session:
+            session.compile()
+            self.assertEqual(session.run('secret\n')['stdout'], 'secret\n')
+            self.assertEqual(os.listdir(session.pooled.workdir), ['solution.cpp'])
+
+    def test_container_reused_between_submissions(self):
+        self._submit()
+        self._submit('int main(){return 0;}')
+        self.assertEqual(len(self.client_fake.started), 1)
+        self.assertEqual(self.pool.stats['reused'], 1)
+        # Sessiyadan keyin papka tozalanadi
+        self.assertEqual(os.listdir(self.client_fake.started[0].workdir), [])
+
+    def test_container_with_leftover_process_is_removed(self):
+        self._submit()
+        container = self.client_fake.started[0]
+        container.top = lambda: {'Processes': [['nobody', 'tail'], ['nobody', 'a.out']]}
+        self._submit('int main(){return 0;}')
+        self.assertTrue(container.removed)
+        # Keyingi yuborish yangi konteyner oladi
+        self._submit('int main(){return 1;}')
+        self.assertEqual(len(self.client_fake.started), 2)
+
+
+    def _commands(self):
+        return [c for container in self.client_fake.started for c in container.commands]
+
+    def test_identical_resubmission_reuses_verdict(self):
+        first = self._submit()
+        runs = len(self._commands())
+        second = self._submit()
+        self.assertEqual(len(self._commands()), runs)
+        self.assertEqual(second.status, 'accepted')
+        self.assertEqual(second.results, first.results)
+
+    def test_whitespace_variant_reuses_compiled_binary(self):
+        self._submit('int main(){}\n')
+        self._submit('int main(){}   \r\n\n')
+        commands = self._commands()
+        self.assertEqual(sum('g++' in c for c in commands), 1)
+        self.assertEqual(sum('tar -C /tmp -xf' in c for c in commands), 1)
+        self.assertEqual(sum('< /sandbox/input_' in c for c in commands), 6)
+
+    def test_testcase_change_invalidates_verdict(self):
+        self._submit()
+        JudgeTestCase.objects.create(problem=self.problem, input_data='9\n', expected_output='8', order=9)
+        submission = self._submit()
+        self.assertEqual(submission.status, 'wrong_answer')
+        self.assertEqual(submission.passed_count, 3)
+
+
+    def test_status_transitions_pushed_to_user_group(self):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'user_{self.user.id}', channel)
+        self.addCleanup(async_to_sync(layer.flush))
+
+        submission = self._submit()
+        events = []
+        while layer.channels.get(channel) and layer.channels[channel].qsize():
+            events.append(async_to_sync(layer.receive)(channel))
+
+        self.assertTrue(all(e['type'] == 'submission_status' for e in events))
+        statuses = [e['submission']['status'] for e in events]
+        self.assertEqual(statuses[0], 'running')
+        self.assertEqual(statuses[-1], 'accepted')
+        self.assertEqual(events[-1]['submission']['id'], submission.id)
+        self.assertEqual(events[-1]['submission']['passed_count'], 3)
+
+
+class FakeSession:
+    """input -> natija; 'slow' inputlar kechroq tugaydi"""
+
+    language = ProgrammingLanguage(slug='python', compile_cmd='')
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.ran = []
+
+    def compile(self):
+        return None
+
+    def expand(self, count):
+        return count
+
+    def run(self, input_data):
+        import time
+        self.ran.append(input_data)
+        outcome = dict(
+            stdout=input_data, stderr='', exit_code=0,
+            execution_time=1.0, timed_out=False, error=None,
+        )
+        outcome.update(self.outcomes.get(input_data, {}))
+        if outcome.pop('slow', False):
+            time.sleep(0.05)
+        return outcome
+
+
+class JudgeSchedulerTest(TestCase):
+    def setUp(self):
+        self.problem = CodingProblem.objects.create(
+            title='Sched', slug='sched', description='-', input_format='-', output_format='-',
+        )
+        self.cases = [
+            JudgeTestCase.objects.create(problem=self.problem, input_data=str(i), expected_output=str(i), order=i)
+            for i in range(4)
+        ]
+
+    def test_final_status_follows_case_order(self):
+        from coding.judge import judge
+        session = FakeSession({
+            '1': {'exit_code': 1, 'slow': True},
+            '3': {'stdout': 'x'},
+        })
+        progress = []
+        judgement = judge(session, self.cases, on_progress=lambda j: progress.append(len(j.results)), parallel=4)
+
+        self.assertEqual(judgement.status, 'runtime_error')
+        self.assertEqual([r['order'] for r in judgement.results], [0, 1, 2, 3])
+        self.assertEqual(judgement.passed, 2)
+        self.assertEqual(progress[-1], 4)
+
+    def test_time_limit_skips_remaining_cases(self):
+        from coding.judge import judge
+        session = FakeSession({'0': {'timed_out': True, 'exit_code': -1}})
+        judgement = judge(session, self.cases, parallel=1)
+
+        self.assertEqual(judgement.status, 'time_limit')
+        self.assertEqual(len(judgement.results), 1)
+        self.assertEqual(session.ran, ['0'])
+
+
+class BenchJudgeCommandTest(TestCase):
+    def test_fake_inline_benchmark_reports_percentiles(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        zero = {kind: (0, 0) for kind in ('create', 'compile', 'run', 'exec')}
+        out = StringIO()
+        with patch.dict('coding.fake_sandbox.LATENCY', zero):
+            call_command(
+                'bench_judge', '--fake', '--inline', '--submissions', '2',
+                '--concurrency', '1', '--languages', 'python,cpp', stdout=out,
+            )
+
+        report = out.getvalue()
+        self.assertIn('Yuborishlar: 4/4', report)
+        self.assertIn('p95', report)
+        self.assertIn('cpp', report)
+        # Bench yuborishlari va foydalanuvchisi tozalanadi
+        self.assertFalse(CodeSubmission.objects.exists())
+        self.assertFalse(CodingProblem.objects.filter(total_submissions__gt=0).exists())
@@ -16,6 +16,7 @@ from .models import (
     ProgrammingLanguage, CodingCategory, CodingProblem,
     CodeSubmission, UserCodingStats,
 )
+from .live import submission_payload
 from .tasks import execute_code_submission
 
 MAX_CODE_SIZE = 50 * 1024  # 50KB
@@ -223,23 +224,13 @@ def api_run_sample(request):
 
 @login_required
 def api_submission_status(request, pk):
-    """Submission holatini tekshirish — AJAX polling"""
+    """Submission holati — WS (coding.live) uzilganda zaxira so'rov"""
     try:
         submission = CodeSubmission.objects.get(id=pk, user=request.user)
     except CodeSubmission.DoesNotExist:
         return JsonResponse({'error': 'Topilmadi'}, status=404)
 
-    data = {
-        'id': submission.id,
-        'status': submission.status,
-        'status_display': submission.get_status_display(),
-        'passed_count': submission.passed_count,
-        'total_count': submission.total_count,
-        'execution_time': submission.execution_time,
-        'error_message': submission.error_message,
-        'results': submission.results if submission.status not in ('pending', 'running') else [],
-    }
-    return JsonResponse(data)
+    return JsonResponse(submission_payload(submission))
 
 
 @login_required
@@ -367,14 +367,21 @@ class CompetitionAdmin(admin.ModelAdmin):
 
     status_info.short_description = 'Holat ma\'lumoti'
 
+    def _reset_exam_clocks(self, queryset):
+        from .exam_clock import reset_clock
+        for slug in queryset.values_list('slug', flat=True):
+            reset_clock(slug)
+
     @admin.action(description='Faollashtirish')
     def make_active(self, request, queryset):
         queryset.update(status='active')
+        self._reset_exam_clocks(queryset)
         self.message_user(request, f'{queryset.count()} ta musobaqa faollashtirildi.')
 
     @admin.action(description='Yakunlash')
     def make_finished(self, request, queryset):
         queryset.update(status='finished')
+        self._reset_exam_clocks(queryset)
         self.message_user(request, f'{queryset.count()} ta musobaqa yakunlandi.')
 
     @admin.action(description='O\'rinlarni hisoblash')
@@ -5,12 +5,16 @@ Olympiad va Mock Imtihon real-time boshqaruv
 """
 
 import json
-import asyncio
 import datetime as dt
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.utils import timezone
 
+from .exam_clock import (
+    get_clock, join_ticker, leave_ticker, pause_clock, resume_end_time,
+    seconds_remaining, set_clock,
+)
+
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     """
@@ -139,12 +143,19 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'notification': event.get('notification', {}),
         }))
 
+    async def submission_status(self, event):
+        """Kod yuborish holati o'zgardi (coding.live dan)"""
+        await self.send(text_data=json.dumps({
+            'type': 'submission_status',
+            'submission': event.get('submission', {}),
+        }))
+
     # ──────────────────────────────────────
     # HELPER METHODLAR
     # ──────────────────────────────────────
 
     async def broadcast_online_status(self, is_online: bool):
-        """Do'stlarga online status yuborish"""
+        """Do'stlarga online status yuborish (faqat online do'stlarga — offline larning kanali yo'q)"""
         friend_ids = await self.get_friend_ids()
 
         for friend_id in friend_ids:
@@ -159,7 +170,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def get_friend_ids(self):
-        """Do'stlar ID lari (DB dan)"""
+        """Online do'stlar ID lari (do'stlar DB dan, holat presence'dan)"""
         try:
             from accounts.models import Friendship
             from django.db.models import Q
@@ -175,7 +186,11 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                     ids.append(f['to_user_id'])
                 else:
                     ids.append(f['from_user_id'])
-            return ids
+
+            # Presence: barcha do'stlar holati bitta batch so'rovda
+            from accounts.presence import online_ids
+            online = online_ids(ids)
+            return [uid for uid in ids if uid in online]
         except Exception:
             return []
 
@@ -207,6 +222,7 @@ class ExamConsumer(AsyncWebsocketConsumer):
       {"type": "exam_ended"}
       {"type": "timer_sync", "seconds_remaining": 3200}
       {"type": "leaderboard_update", "rankings": [...]}
+      {"type": "leaderboard_diff", "changed": [...], "removed": [user_id, ...]}
       {"type": "participant_update", "count": 45, "joined": {...}}
       {"type": "announcement", "message": "..."}
     """
@@ -222,7 +238,7 @@ class ExamConsumer(AsyncWebsocketConsumer):
         self.is_admin = user.is_staff or user.is_superuser
         self.exam_group = f'exam_{self.slug}'
         self.admin_group = f'exam_admin_{self.slug}'
-        self._timer_task = None
+        self._ticker_joined = False
 
         # Imtihon mavjudligini tekshirish
         comp = await self.get_competition(self.slug)
@@ -254,17 +270,17 @@ class ExamConsumer(AsyncWebsocketConsumer):
                 'user': {'id': user.id, 'name': user.full_name or user.phone_number},
             })
 
-        # Timer sync task (admin uchun to'xtatiladi, qatnashchi uchun ishlaydi)
-        if comp['status'] == 'active':
-            self._timer_task = asyncio.ensure_future(self._timer_sync_loop(comp))
+        # Timer sync — imtihon uchun umumiy ticker (har ulanishga alohida emas)
+        join_ticker(self.channel_layer, self.slug)
+        self._ticker_joined = True
 
     async def disconnect(self, close_code):
         if hasattr(self, 'exam_group'):
             await self.channel_layer.group_discard(self.exam_group, self.channel_name)
         if self.is_admin and hasattr(self, 'admin_group'):
             await self.channel_layer.group_discard(self.admin_group, self.channel_name)
-        if self._timer_task:
-            self._timer_task.cancel()
+        if getattr(self, '_ticker_joined', False):
+            leave_ticker(self.slug)
 
     async def receive(self, text_data):
         try:
@@ -338,6 +354,7 @@ class ExamConsumer(AsyncWebsocketConsumer):
                 comp.start_time = now
             comp.end_time = comp.start_time + dt.timedelta(minutes=comp.duration_minutes)
             comp.save(update_fields=['status', 'start_time', 'end_time'])
+            set_clock(self.slug, 'active', comp.end_time)
             return {'status': 'active', 'end_time': comp.end_time.isoformat()}
         return None
 
@@ -348,19 +365,18 @@ class ExamConsumer(AsyncWebsocketConsumer):
         if comp.status == 'active':
             comp.status = 'paused'
             comp.save(update_fields=['status'])
+            pause_clock(comp)
 
     @database_sync_to_async
     def do_resume_exam(self):
         from .models import Competition
-        import datetime
         comp = Competition.objects.get(slug=self.slug)
         if comp.status == 'paused':
             comp.status = 'active'
-            # Qolgan vaqtni saqlab davom ettirish
-            now = timezone.now()
-            remaining = max(0, (comp.end_time - now).total_seconds())
-            comp.end_time = now + datetime.timedelta(seconds=remaining)
+            # Pauzada muzlatilgan qolgan vaqt bilan davom ettirish
+            comp.end_time, remaining = resume_end_time(comp)
             comp.save(update_fields=['status', 'end_time'])
+            set_clock(self.slug, 'active', comp.end_time)
             return int(remaining)
         return 0
 
@@ -371,17 +387,22 @@ class ExamConsumer(AsyncWebsocketConsumer):
         comp.status = 'finished'
         comp.end_time = timezone.now()
         comp.save(update_fields=['status', 'end_time'])
+        set_clock(self.slug, 'finished', comp.end_time)
 
     @database_sync_to_async
     def do_extend_exam(self, minutes):
         from .models import Competition
-        import datetime
         comp = Competition.objects.get(slug=self.slug)
-        comp.end_time = comp.end_time + datetime.timedelta(minutes=minutes)
+        paused_remaining = get_clock(self.slug).get('paused_remaining') if comp.status == 'paused' else None
+        comp.end_time = comp.end_time + dt.timedelta(minutes=minutes)
         comp.duration_minutes += minutes
         comp.save(update_fields=['end_time', 'duration_minutes'])
-        now = timezone.now()
-        return int((comp.end_time - now).total_seconds())
+        if paused_remaining is not None:
+            # Pauzada — muzlatilgan qolgan vaqtga qo'shiladi
+            clock = set_clock(self.slug, 'paused', comp.end_time, paused_remaining=paused_remaining + minutes * 60)
+        else:
+            clock = set_clock(self.slug, comp.status, comp.end_time)
+        return seconds_remaining(clock)
 
     # Wrappers that broadcast after DB update
     async def handle_start(self):
@@ -392,11 +413,6 @@ class ExamConsumer(AsyncWebsocketConsumer):
                 'status': 'active',
                 'end_time': result['end_time'],
             })
-            # Admin uchun timer loop boshlash (connect vaqtida active emas edi)
-            if not self._timer_task or self._timer_task.done():
-                self._timer_task = asyncio.ensure_future(
-                    self._timer_sync_loop({'end_time': result['end_time']})
-                )
 
     async def handle_pause(self):
         await self.do_pause_exam()
@@ -425,35 +441,6 @@ class ExamConsumer(AsyncWebsocketConsumer):
             'seconds_remaining': remaining,
         })
 
-    # ─────────────────────────────────────────
-    # TIMER SYNC LOOP (har 30 soniyada)
-    # ─────────────────────────────────────────
-
-    async def _timer_sync_loop(self, comp):
-        """Har 30 soniyada barcha qatnashchilarga qolgan vaqtni yuborish"""
-        try:
-            import datetime
-            end_time_str = comp.get('end_time')
-            if not end_time_str:
-                return
-            from django.utils.dateparse import parse_datetime
-            end_time = parse_datetime(end_time_str) if isinstance(end_time_str, str) else end_time_str
-
-            while True:
-                await asyncio.sleep(30)
-                now = timezone.now()
-                remaining = max(0, int((end_time - now).total_seconds()))
-                if remaining <= 0:
-                    break
-                await self.channel_layer.group_send(self.exam_group, {
-                    'type': 'broadcast.timer',
-                    'seconds_remaining': remaining,
-                })
-        except asyncio.CancelledError:
-            pass
-        except Exception:
-            pass
-
     # ─────────────────────────────────────────
     # GROUP MESSAGE HANDLERS
     # ─────────────────────────────────────────
@@ -496,6 +483,13 @@ class ExamConsumer(AsyncWebsocketConsumer):
             'rankings': event.get('rankings', []),
         }))
 
+    async def broadcast_leaderboard_diff(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'leaderboard_diff',
+            'changed': event.get('changed', []),
+            'removed': event.get('removed', []),
+        }))
+
     async def broadcast_announcement(self, event):
         await self.send(text_data=json.dumps({
             'type': 'announcement',
@@ -535,18 +529,12 @@ class ExamConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def build_init_data(self, comp):
         from .models import CompetitionParticipant
-        now = timezone.now()
-        end_time_str = comp.get('end_time')
-        seconds_remaining = 0
-        if end_time_str and comp['status'] == 'active':
-            from django.utils.dateparse import parse_datetime
-            end_time = parse_datetime(end_time_str) if isinstance(end_time_str, str) else end_time_str
-            seconds_remaining = max(0, int((end_time - now).total_seconds()))
+        clock = get_clock(self.slug)
 
         count = CompetitionParticipant.objects.filter(competition_id=comp['id']).count()
         return {
             'status': comp['status'],
-            'seconds_remaining': seconds_remaining,
+            'seconds_remaining': seconds_remaining(clock) if clock else 0,
             'participant_count': count,
             'is_admin': self.is_admin,
             'title': comp['title'],
@@ -559,21 +547,6 @@ class ExamConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def get_live_leaderboard(self):
-        from .models import CompetitionParticipant
-        participants = (
-            CompetitionParticipant.objects
-            .filter(competition_id=self.competition_id)
-            .select_related('user')
-            .order_by('-score', 'time_spent')[:20]
-        )
-        result = []
-        for i, p in enumerate(participants, 1):
-            result.append({
-                'rank': i,
-                'name': p.user.full_name or p.user.phone_number,
-                'score': p.score,
-                'correct': p.correct_answers,
-                'time': p.time_spent,
-                'status': p.status,
-            })
-        return result
+        """Live reyting proyeksiyasidan top qatorlar (DB faqat birinchi marta seed uchun)"""
+        from .exam_standings import top_standings
+        return top_standings(self.competition_id)
@@ -0,0 +1,200 @@
+"""
+TestMakon.uz - Exam Clock & Shared Ticker
+Olimpiada / Mock imtihon vaqti — markaziy holat va bitta ticker.
+"""
+
+import asyncio
+import datetime as dt
+import logging
+import uuid
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.redis_client import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+EXAM_CLOCK_TTL = 60 * 60 * 24         # 1 kun
+RUNNING_STATUSES = ('active', 'paused')
+FINISHED_STATUSES = ('finished', 'cancelled')
+
+
+def timer_sync_seconds():
+    return getattr(settings, 'EXAM_TIMER_SYNC_SECONDS', 30)
+
+
+def _clock_key(slug):
+    return f'exam_clock:{slug}'
+
+
+# ============================================================
+# IMTIHON SOATI (markaziy holat)
+# ============================================================
+
+def set_clock(slug, status, end_time=None, paused_remaining=None):
+    """Imtihon holatini yozish (admin buyrug'idan keyin)"""
+    clock = {
+        'status': status,
+        'end_ts': end_time.timestamp() if end_time else None,
+        'paused_remaining': paused_remaining,
+    }
+    cache.set(_clock_key(slug), clock, EXAM_CLOCK_TTL)
+    return clock
+
+
+def reset_clock(slug):
+    """
+    Soatni tashlash — keyingi o'qishda DB dan olinadi (admin o'zgartirishlari).
+    Pauzada muzlatilgan qolgan vaqt faqat cache'da — imtihon hali pauzada bo'lsa saqlanadi.
+    """
+    clock = cache.get(_clock_key(slug))
+    cache.delete(_clock_key(slug))
+    if not clock or clock['status'] != 'paused' or clock.get('paused_remaining') is None:
+        return
+    from .models import Competition
+    comp = Competition.objects.filter(slug=slug).only('status', 'end_time').first()
+    if comp is not None and comp.status == 'paused':
+        set_clock(slug, 'paused', comp.end_time, paused_remaining=clock['paused_remaining'])
+
+
+def get_clock(slug):
+    """Imtihon soati: cache'dan, bo'lmasa DB dan (bir marta). Imtihon yo'q bo'lsa None"""
+    clock = cache.get(_clock_key(slug))
+    if clock is None:
+        from .models import Competition
+        comp = Competition.objects.filter(slug=slug).only('status', 'end_time').first()
+        if comp is None:
+            return None
+        clock = set_clock(slug, comp.status, comp.end_time)
+    return clock
+
+
+def seconds_remaining(clock, now=None):
+    """Qolgan soniyalar (pauzada — to'xtatilgan paytdagi qiymat)"""
+    if clock['status'] == 'paused' and clock.get('paused_remaining') is not None:
+        return clock['paused_remaining']
+    if clock['status'] not in RUNNING_STATUSES or not clock.get('end_ts'):
+        return 0
+    now = now or timezone.now()
+    return max(0, int(clock['end_ts'] - now.timestamp()))
+
+
+def pause_clock(comp):
+    """Pauza: qolgan vaqt muzlatiladi"""
+    remaining = max(0, int((comp.end_time - timezone.now()).total_seconds()))
+    set_clock(comp.slug, 'paused', comp.end_time, paused_remaining=remaining)
+    return remaining
+
+
+def resume_end_time(comp):
+    """Davom ettirish: pauzada muzlatilgan qolgan vaqtdan yangi end_time"""
+    clock = cache.get(_clock_key(comp.slug)) or {}
+    remaining = clock.get('paused_remaining')
+    now = timezone.now()
+    if remaining is None:
+        remaining = max(0, int((comp.end_time - now).total_seconds()))
+    return now + dt.timedelta(seconds=remaining), remaining
+
+
+# ============================================================
+# LEASE (jarayonlar orasida bitta ticker)
+# ============================================================
+
+_PROCESS_TOKEN = uuid.uuid4().hex
+
+
+def _lease_key(slug):
+    return redis_key(f'exam_ticker:{slug}')
+
+
+def _hold_lease(slug):
+    """Lease olish yoki uzaytirish. Returns: shu jarayon broadcast qilishi kerakmi"""
+    r = get_redis()
+    if r is None:
+        return True
+    ttl = timer_sync_seconds() * 3
+    key = _lease_key(slug)
+    if r.set(key, _PROCESS_TOKEN, nx=True, ex=ttl):
+        return True
+    if r.get(key) == _PROCESS_TOKEN.encode():
+        r.expire(key, ttl)
+        return True
+    return False
+
+
+def _release_lease(slug):
+    r = get_redis()
+    if r is not None and r.get(_lease_key(slug)) == _PROCESS_TOKEN.encode():
+        r.delete(_lease_key(slug))
+
+
+# ============================================================
+# TICKER (jarayon ichida imtihon uchun bitta)
+# ============================================================
+
+_tickers = {}  # slug -> {'task': asyncio.Task, 'sockets': int}
+
+
+def join_ticker(channel_layer, slug):
+    """Ulanish qo'shildi — kerak bo'lsa ticker ishga tushadi"""
+    entry = _tickers.setdefault(slug, {'task': None, 'sockets': 0})
+    if entry['task'] is None or entry['task'].done():
+        entry['task'] = asyncio.ensure_future(_ticker_loop(channel_layer, slug))
+    entry['sockets'] += 1
+
+
+def leave_ticker(slug):
+    """Ulanish uzildi — oxirgisi bo'lsa ticker to'xtatiladi"""
+    entry = _tickers.get(slug)
+    if entry is None:
+        return
+    entry['sockets'] -= 1
+    if entry['sockets'] <= 0:
+        if entry['task'] is not None:
+            entry['task'].cancel()
+        _tickers.pop(slug, None)
+
+
+async def tick(channel_layer, slug):
+    """
+    Bitta tick. Returns: False — imtihon yakunlangan, ticker to'xtashi kerak.
+    Boshlanmagan yoki pauzadagi imtihonda ticker kutib turadi (start/resume
+    uchun alohida task kerak emas).
+    """
+    if not await sync_to_async(_hold_lease, thread_sensitive=False)(slug):
+        return True
+    clock = await database_sync_to_async(get_clock)(slug)
+    if clock is None or clock['status'] in FINISHED_STATUSES:
+        await sync_to_async(_release_lease, thread_sensitive=False)(slug)
+        return False
+    if clock['status'] != 'active':
+        return True
+
+    remaining = seconds_remaining(clock)
+    if remaining > 0:
+        await channel_layer.group_send(f'exam_{slug}', {
+            'type': 'broadcast.timer',
+            'seconds_remaining': remaining,
+        })
+    return True
+
+
+async def _ticker_loop(channel_layer, slug):
+    try:
+        while True:
+            await asyncio.sleep(timer_sync_seconds())
+            try:
+                if not await tick(channel_layer, slug):
+                    break
+            except Exception as e:
+                # Vaqtinchalik Redis / channel layer xatosi — keyingi tick'da qayta urinadi
+                logger.warning(f'Exam ticker xatosi ({slug}): {e}')
+    finally:
+        try:
+            await sync_to_async(_release_lease, thread_sensitive=False)(slug)
+        except Exception as e:
+            logger.warning(f'Exam ticker lease bo\'shatilmadi ({slug}): {e}')
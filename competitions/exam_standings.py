@@ -0,0 +1,328 @@
+"""
+TestMakon.uz - Exam Standings Projection
+Olimpiada / Mock imtihon uchun live reyting proyeksiyasi.
+"""
+
+import json
+import time
+
+from django.core.cache import cache
+
+from core.redis_client import get_redis, redis_key
+
+STANDINGS_TOP = 20
+STANDINGS_TTL = 60 * 60 * 24          # 1 kun
+EXAM_LOOKUP_TTL = 60                  # test -> faol imtihon xaritasi
+TIME_WEIGHT = 10 ** 7                 # ball * 10^7 - vaqt (vaqt < ~115 kun)
+DIRTY_KEY = 'exam_lb:dirty'
+
+
+def _zkey(competition_id):
+    return redis_key(f'exam_lb:{competition_id}')
+
+
+def _info_key(competition_id):
+    return redis_key(f'exam_lb:{competition_id}:info')
+
+
+def _correct_key(competition_id, user_id):
+    return redis_key(f'exam_lb:{competition_id}:ok:{user_id}')
+
+
+def _members_key(competition_id):
+    return redis_key(f'exam_lb:{competition_id}:members')
+
+
+def _seeded_key(competition_id):
+    return redis_key(f'exam_lb:{competition_id}:seeded')
+
+
+def _local_key(competition_id):
+    return f'exam_lb_local:{competition_id}'
+
+
+def _published_key(competition_id):
+    return f'exam_lb:{competition_id}:published'
+
+
+def _order_score(score, time_spent):
+    return score * TIME_WEIGHT - min(time_spent, TIME_WEIGHT - 1)
+
+
+def _participant_row(p):
+    return {
+        'user_id': p.user_id,
+        'name': p.user.full_name or p.user.phone_number,
+        'score': p.score,
+        'correct': p.correct_answers,
+        'time': p.time_spent,
+        'status': p.status,
+    }
+
+
+# ============================================================
+# IMTIHON XARITASI
+# ============================================================
+
+def exam_for_test(test_id):
+    """
+    Testga bog'langan faol imtihon: {'id', 'xp_per_correct', 'start'} yoki None.
+    test_play_submit har safar DB ga bormasligi uchun cache'lanadi.
+    """
+    key = f'exam_for_test:{test_id}'
+    exam = cache.get(key)
+    if exam is None:
+        from .models import Competition
+        comp = (
+            Competition.objects.filter(test_id=test_id, status__in=('active', 'paused'))
+            .only('id', 'xp_per_correct', 'start_time').first()
+        )
+        exam = {
+            'id': comp.id,
+            'xp_per_correct': comp.xp_per_correct,
+            'start': comp.start_time.timestamp(),
+        } if comp else {}
+        cache.set(key, exam, EXAM_LOOKUP_TTL)
+    return exam or None
+
+
+# ============================================================
+# SEED (DB dan bir marta)
+# ============================================================
+
+def _load_rows(competition_id):
+    from .models import CompetitionParticipant
+    return [
+        _participant_row(p)
+        for p in CompetitionParticipant.objects.filter(competition_id=competition_id)
+        .select_related('user').only(
+            'user', 'score', 'correct_answers', 'time_spent', 'status',
+            'user__first_name', 'user__last_name', 'user__phone_number',
+        )
+    ]
+
+
+def _ensure_seeded(r, competition_id):
+    if r.exists(_seeded_key(competition_id)):
+        return
+    lock = r.lock(redis_key(f'exam_lb:{competition_id}:lock'), timeout=60)
+    if not lock.acquire(blocking=True, blocking_timeout=10):
+        return
+    try:
+        if r.exists(_seeded_key(competition_id)):
+            return
+        rows = _load_rows(competition_id)
+        pipe = r.pipeline()
+        pipe.delete(_zkey(competition_id), _info_key(competition_id), _members_key(competition_id))
+        if rows:
+            pipe.zadd(_zkey(competition_id), {
+                row['user_id']: _order_score(row['score'], row['time']) for row in rows
+            })
+            pipe.hset(_info_key(competition_id), mapping={
+                row['user_id']: json.dumps(row) for row in rows
+            })
+            pipe.sadd(_members_key(competition_id), *[row['user_id'] for row in rows])
+        for key in (_zkey(competition_id), _info_key(competition_id), _members_key(competition_id)):
+            pipe.expire(key, STANDINGS_TTL)
+        pipe.set(_seeded_key(competition_id), 1, ex=STANDINGS_TTL)
+        pipe.execute()
+    finally:
+        lock.release()
+
+
+def _local_rows(competition_id):
+    rows = cache.get(_local_key(competition_id))
+    if rows is None:
+        rows = {row['user_id']: row for row in _load_rows(competition_id)}
+    return rows
+
+
+# ============================================================
+# ISHTIROKCHILAR
+# ============================================================
+
+def is_participant(competition_id, user_id):
+    """Foydalanuvchi imtihon ishtirokchisimi (seed qilingan to'plamdan, DB ga bormasdan)"""
+    r = get_redis()
+    if r is None:
+        return user_id in _local_rows(competition_id)
+    _ensure_seeded(r, competition_id)
+    return bool(r.sismember(_members_key(competition_id), user_id))
+
+
+def add_participant(participant):
+    """Yangi ishtirokchi — proyeksiya allaqachon qurilgan bo'lsa unga qo'shiladi"""
+    r = get_redis()
+    competition_id = participant.competition_id
+    if r is None:
+        if cache.get(_local_key(competition_id)) is not None:
+            _store_row(None, competition_id, _participant_row(participant))
+        return
+    if not r.exists(_seeded_key(competition_id)):
+        return  # seed paytida DB dan olinadi
+    r.sadd(_members_key(competition_id), participant.user_id)
+    _store_row(r, competition_id, _participant_row(participant))
+
+
+# ============================================================
+# YOZISH
+# ============================================================
+
+def _store_row(r, competition_id, row):
+    """Qatorni proyeksiyaga yozish va imtihonni "o'zgargan" deb belgilash"""
+    if r is None:
+        rows = _local_rows(competition_id)
+        rows[row['user_id']] = row
+        cache.set(_local_key(competition_id), rows, STANDINGS_TTL)
+        dirty = cache.get(DIRTY_KEY) or set()
+        dirty.add(competition_id)
+        cache.set(DIRTY_KEY, dirty, STANDINGS_TTL)
+        return
+
+    pipe = r.pipeline()
+    pipe.zadd(_zkey(competition_id), {row['user_id']: _order_score(row['score'], row['time'])})
+    pipe.hset(_info_key(competition_id), row['user_id'], json.dumps(row))
+    pipe.sadd(redis_key(DIRTY_KEY), competition_id)
+    pipe.execute()
+
+
+def record_answer(exam, user, question_id, is_correct):
+    """Imtihon davomida bitta javob — to'g'ri javoblar to'plami va qator yangilanadi"""
+    r = get_redis()
+    competition_id = exam['id']
+    elapsed = max(0, int(time.time() - exam['start']))
+
+    if r is None:
+        rows = _local_rows(competition_id)
+        row = rows.get(user.id) or {'user_id': user.id, 'correct_ids': []}
+        correct_ids = set(row.get('correct_ids', []))
+        (correct_ids.add if is_correct else correct_ids.discard)(question_id)
+        correct = len(correct_ids)
+        row['correct_ids'] = sorted(correct_ids)
+    else:
+        _ensure_seeded(r, competition_id)
+        key = _correct_key(competition_id, user.id)
+        pipe = r.pipeline()
+        if is_correct:
+            pipe.sadd(key, question_id)
+        else:
+            pipe.srem(key, question_id)
+        pipe.scard(key)
+        pipe.expire(key, STANDINGS_TTL)
+        correct = pipe.execute()[1]
+        row = {'user_id': user.id}
+
+    row.update({
+        'name': user.full_name or user.phone_number,
+        'score': correct * exam['xp_per_correct'],
+        'correct': correct,
+        'time': elapsed,
+        'status': 'in_progress',
+    })
+    _store_row(r, competition_id, row)
+
+
+def record_result(participant):
+    """Yakuniy natija (competition_submit) — qator DB qiymatlari bilan almashtiriladi"""
+    r = get_redis()
+    competition_id = participant.competition_id
+    if r is not None:
+        _ensure_seeded(r, competition_id)
+    _store_row(r, competition_id, _participant_row(participant))
+
+
+def drop_standings(competition_id):
+    """Proyeksiyani o'chirish — keyingi o'qishda DB dan qayta quriladi"""
+    r = get_redis()
+    cache.delete_many([_local_key(competition_id), _published_key(competition_id)])
+    if r is not None:
+        r.delete(
+            _seeded_key(competition_id), _zkey(competition_id),
+            _info_key(competition_id), _members_key(competition_id),
+        )
+
+
+# ============================================================
+# O'QISH
+# ============================================================
+
+def top_standings(competition_id, limit=STANDINGS_TOP):
+    """Top qatorlar: [{'rank', 'user_id', 'name', 'score', 'correct', 'time', 'status'}, ...]"""
+    r = get_redis()
+    if r is None:
+        rows = sorted(
+            _local_rows(competition_id).values(),
+            key=lambda row: (-row['score'], row['time']),
+        )[:limit]
+    else:
+        _ensure_seeded(r, competition_id)
+        user_ids = r.zrevrange(_zkey(competition_id), 0, limit - 1)
+        raw = r.hmget(_info_key(competition_id), user_ids) if user_ids else []
+        rows = [json.loads(item) for item in raw if item]
+
+    return [
+        {'rank': i, **{k: v for k, v in row.items() if k != 'correct_ids'}}
+        for i, row in enumerate(rows, 1)
+    ]
+
+
+def standings_diff(previous, current):
+    """Oldingi va joriy top ro'yxat farqi: (o'zgargan qatorlar, chiqib ketgan user_id lar)"""
+    before = {row['user_id']: row for row in previous}
+    changed = [row for row in current if before.get(row['user_id']) != row]
+    current_ids = {row['user_id'] for row in current}
+    removed = [uid for uid in before if uid not in current_ids]
+    return changed, removed
+
+
+# ============================================================
+# TICK — birlashtirilgan farqlarni yuborish
+# ============================================================
+
+def _pop_dirty():
+    r = get_redis()
+    if r is None:
+        dirty = cache.get(DIRTY_KEY) or set()
+        cache.delete(DIRTY_KEY)
+        return dirty
+    key = redis_key(DIRTY_KEY)
+    pipe = r.pipeline()
+    pipe.smembers(key)
+    pipe.delete(key)
+    members, _ = pipe.execute()
+    return {int(m) for m in members}
+
+
+def publish_dirty_standings():
+    """
+    O'zgargan imtihonlar uchun leaderboard_diff yuborish.
+    Returns: xabar yuborilgan imtihonlar soni.
+    """
+    dirty = _pop_dirty()
+    if not dirty:
+        return 0
+
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+    from .models import Competition
+
+    channel_layer = get_channel_layer()
+    slugs = dict(
+        Competition.objects.filter(id__in=dirty, show_live_leaderboard=True).values_list('id', 'slug')
+    )
+    sent = 0
+    for competition_id, slug in slugs.items():
+        current = top_standings(competition_id)
+        previous = cache.get(_published_key(competition_id)) or []
+        changed, removed = standings_diff(previous, current)
+        if not changed and not removed:
+            continue
+        cache.set(_published_key(competition_id), current, STANDINGS_TTL)
+        if channel_layer:
+            async_to_sync(channel_layer.group_send)(f'exam_{slug}', {
+                'type': 'broadcast.leaderboard_diff',
+                'changed': changed,
+                'removed': removed,
+            })
+        sent += 1
+    return sent
@@ -0,0 +1,345 @@
+"""
+TestMakon.uz - Matchmaking Engine
+Random raqib topish — Redis sorted set'lar va Lua bilan atomik juftlash.
+"""
+
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.redis_client import get_redis, redis_key
+
+logger = logging.getLogger(__name__)
+
+QUEUE_TTL = 60 * 5                  # 5 daqiqa
+BASE_WINDOW = 200
+WIDEN_STEP = 50                     # har WIDEN_EVERY soniyada oyna kengayadi
+WIDEN_EVERY = 5
+MAX_WINDOW = 1000
+CANDIDATE_LIMIT = 100
+QUESTION_COUNT = 10
+QUESTION_SET_TARGET = 3             # har fan uchun tayyor turadigan to'plamlar
+QUESTION_SET_TTL = 60 * 10
+
+# KEYS: entries, expires, o'z navbati, ("istalgan fan" navbati)
+PAIR_SCRIPT = """
+local entries, expires = KEYS[1], KEYS[2]
+local uid = ARGV[1]
+local rating = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local now = tonumber(ARGV[5])
+
+local function alive(id)
+  local exp = redis.call('ZSCORE', expires, id)
+  return exp and tonumber(exp) > now
+end
+
+for i = 3, #KEYS do redis.call('ZREM', KEYS[i], uid) end
+if not alive(uid) then return false end
+
+local best, best_key, best_diff
+for i = 3, #KEYS do
+  local cands = redis.call('ZRANGEBYSCORE', KEYS[i], rating - window, rating + window,
+                           'WITHSCORES', 'LIMIT', 0, tonumber(ARGV[4]))
+  for j = 1, #cands, 2 do
+    local cid = cands[j]
+    if alive(cid) then
+      local diff = math.abs(tonumber(cands[j + 1]) - rating)
+      if best == nil or diff < best_diff then
+        best, best_key, best_diff = cid, KEYS[i], diff
+      end
+    else
+      redis.call('ZREM', KEYS[i], cid)
+    end
+  end
+end
+
+if best then
+  local entry = redis.call('HGET', entries, best)
+  redis.call('ZREM', best_key, best)
+  redis.call('HDEL', entries, best, uid)
+  redis.call('ZREM', expires, best, uid)
+  return entry
+end
+redis.call('ZADD', KEYS[3], rating, uid)
+return false
+"""
+
+_pair_script = None
+
+
+def _queue_key(subject_id):
+    return redis_key(f'{{mm}}:q:{subject_id or "any"}')
+
+
+def _entries_key():
+    return redis_key('{mm}:entries')
+
+
+def _expires_key():
+    return redis_key('{mm}:expires')
+
+
+def _qset_key(subject_id, count):
+    return redis_key(f'mm:qs:{subject_id or "any"}:{count}')
+
+
+def _match_key(user_id):
+    return f'mm:match:{user_id}'
+
+
+def rating_window(waited_seconds):
+    """Kutish vaqti bo'yicha reyting oynasi"""
+    return min(MAX_WINDOW, BASE_WINDOW + int(waited_seconds // WIDEN_EVERY) * WIDEN_STEP)
+
+
+def _search_keys(subject_id):
+    # Fan tanlagan user o'z fani va "istalgan fan" navbatidan qidiradi
+    keys = [_queue_key(subject_id)]
+    if subject_id:
+        keys.append(_queue_key(None))
+    return keys
+
+
+def _get_entry(r, user_id):
+    """Navbat yozuvi yoki None (yo'q yoki muddati o'tgan)"""
+    raw = r.hget(_entries_key(), user_id)
+    expires = r.zscore(_expires_key(), user_id)
+    if not raw or expires is None or expires <= time.time():
+        return None
+    return json.loads(raw)
+
+
+def _enqueue(r, entries):
+    """Yozuvlarni navbatga qo'yish (muddat joined + QUEUE_TTL)"""
+    pipe = r.pipeline()
+    for entry in entries:
+        pipe.hset(_entries_key(), entry['user_id'], json.dumps(entry))
+        pipe.zadd(_expires_key(), {entry['user_id']: entry['joined'] + QUEUE_TTL})
+    pipe.execute()
+
+
+# ============================================================
+# NAVBAT
+# ============================================================
+
+def is_available():
+    """Redis matchmaking ishlatiladimi (aks holda MatchmakingQueue jadvali)"""
+    return get_redis() is not None
+
+
+def join_queue(user, subject_id=None, question_count=QUESTION_COUNT):
+    """
+    Navbatga qo'shilish va darhol juftlashga urinish.
+    Returns: Battle (raqib topildi) yoki None (kutmoqda).
+    """
+    r = get_redis()
+
+    cache.delete(_match_key(user.id))
+    entry = {
+        'user_id': user.id,
+        'rating': getattr(user, 'rating', 1000),
+        'subject_id': subject_id,
+        'question_count': question_count,
+        'joined': time.time(),
+    }
+    _enqueue(r, [entry])
+    return _try_pair(r, entry)
+
+
+def leave_queue(user_id):
+    r = get_redis()
+    cache.delete(_match_key(user_id))
+    if r is None:
+        return
+    raw = r.hget(_entries_key(), user_id)
+    r.hdel(_entries_key(), user_id)
+    r.zrem(_expires_key(), user_id)
+    if raw:
+        for key in _search_keys(json.loads(raw)['subject_id']):
+            r.zrem(key, user_id)
+
+
+def queue_status(user_id):
+    """
+    api_matchmaking_status uchun holat (DB so'rovsiz, juftlik topilgandagina Battle yaratiladi).
+    Returns: dict yoki Redis yo'q bo'lsa None.
+    """
+    r = get_redis()
+    if r is None:
+        return None
+
+    match = cache.get(_match_key(user_id))
+    if match:
+        return {'status': 'matched', **match}
+
+    entry = _get_entry(r, user_id)
+    if entry is None:
+        return {'status': 'not_in_queue'}
+
+    # Kutayotgan user — kengaygan oyna bilan qayta urinish
+    battle = _try_pair(r, entry)
+    if battle is not None:
+        return {'status': 'matched', **_match_payload(battle, battle.challenger)}
+
+    waited = time.time() - entry['joined']
+    return {'status': 'searching', 'seconds_remaining': max(0, int(QUEUE_TTL - waited))}
+
+
+# ============================================================
+# JUFTLASH
+# ============================================================
+
+def _try_pair(r, entry, notify_joiner=False):
+    global _pair_script
+    if _pair_script is None:
+        _pair_script = r.register_script(PAIR_SCRIPT)
+
+    now = time.time()
+    raw = _pair_script(
+        keys=[_entries_key(), _expires_key(), *_search_keys(entry['subject_id'])],
+        args=[entry['user_id'], entry['rating'], rating_window(now - entry['joined']), CANDIDATE_LIMIT, now],
+    )
+    if not raw:
+        return None
+    return _create_battle(r, json.loads(raw), entry, notify_joiner)
+
+
+def _requeue(r, entries):
+    """Skript olib tashlagan yozuvlarni asl reyting va muddati bilan qaytarish"""
+    _enqueue(r, entries)
+    for entry in entries:
+        r.zadd(_queue_key(entry['subject_id']), {entry['user_id']: entry['rating']})
+
+
+def _match_payload(battle, opponent):
+    return {
+        'battle_uuid': str(battle.uuid),
+        'opponent_name': opponent.first_name,
+        'redirect_url': f'/competitions/battle/{battle.uuid}/ready/',
+    }
+
+
+def _create_battle(r, waiting, joiner, notify_joiner):
+    """
+    Juftlik topildi — Battle yaratish, kutayotgan userga natijani qoldirish va WS xabar.
+    So'rov yuborgan joiner o'zi redirect qilinadi, sweep'da esa unga ham WS yuboriladi.
+    Yaratib bo'lmasa ikkala user navbatga qaytariladi va None qaytadi.
+    """
+    from accounts.models import User
+    from .models import Battle
+    from .tasks import _notify_match_found
+
+    subject_id = joiner['subject_id'] or waiting['subject_id']
+    count = waiting['question_count']
+
+    try:
+        users = User.objects.in_bulk([waiting['user_id'], joiner['user_id']])
+        challenger, opponent = users[waiting['user_id']], users[joiner['user_id']]
+
+        now = timezone.now()
+        battle = Battle.objects.create(
+            challenger=challenger,
+            opponent=opponent,
+            opponent_type='random',
+            subject_id=subject_id,
+            question_count=count,
+            questions_data=take_question_set(subject_id, count),
+            total_time=count * 30,
+            # status='pending' — ikkala "Tayyor" bo'lgach 'accepted' bo'ladi
+            status='pending',
+            ready_expires_at=now + timedelta(seconds=45),
+            expires_at=now + timedelta(hours=1),
+        )
+    except Exception as e:
+        logger.error(f'Matchmaking: jang yaratilmadi ({waiting["user_id"]} vs {joiner["user_id"]}): {e}')
+        _requeue(r, [waiting, joiner])
+        return None
+
+    # Ikkalasi ham status polling'da jangni ko'rsin (sweep'da ikkalasi kutayotgan bo'ladi)
+    cache.set_many({
+        _match_key(challenger.id): _match_payload(battle, opponent),
+        _match_key(opponent.id): _match_payload(battle, challenger),
+    }, QUEUE_TTL)
+    _notify_match_found(challenger, opponent, battle)
+    if notify_joiner:
+        _notify_match_found(opponent, challenger, battle)
+    return battle
+
+
+# ============================================================
+# SAVOL TO'PLAMLARI
+# ============================================================
+
+def _generate_question_set(subject_id, count):
+    from tests_app.models import Subject
+    from .views import generate_questions
+    subject = Subject.objects.filter(id=subject_id).first() if subject_id else None
+    return generate_questions(subject=subject, count=count)
+
+
+def take_question_set(subject_id, count):
+    """Tayyor to'plamdan olish, bo'lmasa joyida generatsiya"""
+    r = get_redis()
+    if r is not None:
+        raw = r.lpop(_qset_key(subject_id, count))
+        if raw:
+            return json.loads(raw)
+    return _generate_question_set(subject_id, count)
+
+
+def refill_question_sets(subject_ids, count=QUESTION_COUNT):
+    """Navbatda kutayotganlar bor fanlar uchun to'plamlarni QUESTION_SET_TARGET gacha to'ldirish"""
+    r = get_redis()
+    if r is None:
+        return 0
+    added = 0
+    for subject_id in subject_ids:
+        key = _qset_key(subject_id, count)
+        missing = QUESTION_SET_TARGET - r.llen(key)
+        for _ in range(max(0, missing)):
+            questions = _generate_question_set(subject_id, count)
+            if not questions:
+                break
+            r.rpush(key, json.dumps(questions))
+            added += 1
+        r.expire(key, QUESTION_SET_TTL)
+    return added
+
+
+def sweep():
+    """
+    Celery beat: kutayotgan userlarni kengaygan oyna bilan qayta juftlash
+    va savol to'plamlarini to'ldirish. Returns: topilgan juftliklar soni.
+    """
+    r = get_redis()
+    if r is None:
+        return None
+
+    # Muddati o'tgan yozuvlarni tozalash
+    expired = r.zrangebyscore(_expires_key(), '-inf', time.time())
+    if expired:
+        r.hdel(_entries_key(), *expired)
+        r.zrem(_expires_key(), *expired)
+
+    matched = 0
+    waiting_subjects = set()
+    for key in r.scan_iter(match=redis_key('{mm}:q:*')):
+        subject = key.decode().rsplit(':', 1)[1]
+        subject_id = None if subject == 'any' else int(subject)
+        for member in r.zrange(key, 0, -1):
+            entry = _get_entry(r, member.decode())
+            if entry is None:
+                r.zrem(key, member)
+                continue
+            if _try_pair(r, entry, notify_joiner=True) is not None:
+                matched += 1
+            else:
+                waiting_subjects.add(subject_id)
+
+    refill_question_sets(waiting_subjects)
+    return matched
@@ -0,0 +1,28 @@
+"""
+TestMakon.uz - Competitions Signals
+"""
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Competition, CompetitionParticipant
+
+CLOCK_FIELDS = {'status', 'start_time', 'end_time', 'duration_minutes'}
+
+
+@receiver(post_save, sender=Competition)
+def reset_exam_clock(sender, instance, update_fields=None, **kwargs):
+    """Imtihon vaqti/holati o'zgarsa — cache'dagi soat DB dan qayta olinadi"""
+    if update_fields is not None and not CLOCK_FIELDS.intersection(update_fields):
+        return
+    from .exam_clock import reset_clock
+    reset_clock(instance.slug)
+
+
+@receiver(post_save, sender=CompetitionParticipant)
+def add_exam_participant(sender, instance, created, **kwargs):
+    """Yangi ishtirokchi — live reyting a'zolari to'plamiga qo'shiladi"""
+    if not created:
+        return
+    from .exam_standings import add_participant
+    add_participant(instance)
@@ -1,6 +1,7 @@
 """
 Competitions — Celery Tasks
 Matchmaking queue processor (har 5 soniyada)
+Live imtihon reytingi farqlari (har 2 soniyada)
 """
 
 from celery import shared_task
@@ -16,12 +17,20 @@ def process_matchmaking_queue(self):
     """
     Matchmaking navbatini qayta ishlash.
     Celery Beat tomonidan har 5 soniyada chaqiriladi.
-    Rating ±300 oralig'ida juftlaydi va ikkala foydalanuvchiga
-    WebSocket orqali match_found xabar yuboradi.
+    Redis bo'lsa — matchmaking.sweep() (atomik juftlash, kengayuvchi oyna).
+    Aks holda MatchmakingQueue jadvalida rating ±300 oralig'ida juftlaydi.
+    Ikkala foydalanuvchiga WebSocket orqali match_found xabar yuboriladi.
     """
     try:
         from .models import MatchmakingQueue, Battle
-        from tests_app.models import Subject
+        from . import matchmaking
+
+        # Redis matchmaking — kengaygan oyna bilan qayta juftlash, savol to'plamlari
+        if matchmaking.is_available():
+            matched_count = matchmaking.sweep()
+            if matched_count:
+                logger.info(f'Matchmaking: {matched_count} juft topildi')
+            return
 
         now = timezone.now()
 
@@ -55,23 +64,9 @@ def process_matchmaking_queue(self):
                 continue
 
             # Match topildi — Battle yaratish
+            subj = entry.subject or opponent_entry.subject
             try:
-                # Circular import oldini olish — generate_questions ni bu yerda implement qilamiz
-                from tests_app.models import Question as Q2
-                subj = entry.subject or opponent_entry.subject
-                qs = Q2.objects.filter(is_active=True)
-                if subj:
-                    qs = qs.filter(subject=subj)
-                qs = list(qs.order_by('?')[:entry.question_count].prefetch_related('answers'))
-                questions_data = []
-                for q in qs:
-                    answers = list(q.answers.values('id', 'answer_text', 'is_correct'))
-                    questions_data.append({
-                        'id': q.id,
-                        'text': q.question_text,
-                        'subject': subj.name if subj else '',
-                        'answers': answers,
-                    })
+                questions_data = matchmaking.take_question_set(subj.id if subj else None, entry.question_count)
             except Exception:
                 questions_data = []
 
@@ -115,6 +110,20 @@ def process_matchmaking_queue(self):
         logger.error(f'Matchmaking task xatosi: {exc}')
 
 
+@shared_task(name='competitions.tasks.publish_exam_standings', ignore_result=True)
+def publish_exam_standings():
+    """
+    Live imtihon reytingi tick'i — Celery Beat tomonidan har 2 soniyada.
+    Oxirgi tick'dan beri o'zgargan imtihonlar uchun exam_{slug} guruhiga
+    bitta leaderboard_diff xabar yuboriladi.
+    """
+    from .exam_standings import publish_dirty_standings
+    try:
+        return publish_dirty_standings()
+    except Exception as exc:
+        logger.error(f'Exam standings tick xatosi: {exc}')
+
+
 def _notify_match_found(user, opponent, battle):
     """WebSocket orqali match_found xabar yuborish"""
     try:
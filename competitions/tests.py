@@ -6,6 +6,7 @@ Barcha modellar va viewlar uchun mukammal testlar
 import json
 import uuid
 from datetime import date, timedelta
+from unittest import skipUnless
 
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
@@ -14,6 +15,11 @@ from django.utils import timezone
 
 from tests_app.models import Answer, Question, Subject, Topic
 
+try:
+    import fakeredis  # matchmaking Lua skriptlari uchun (ixtiyoriy)
+except ImportError:
+    fakeredis = None
+
 from .models import (
     Battle,
     BattleInvitation,
@@ -2335,3 +2341,267 @@ class ApiOnlineFriendsViewTest(BaseTestCase):
         response = self.client.get(reverse('competitions:api_online_friends'))
         data = json.loads(response.content)
         self.assertIsInstance(data, (list, dict))
+
+
+# ==============================================================
+# QUESTION POOL TESTS
+# ==============================================================
+
+class QuestionPoolTest(BaseTestCase):
+    """generate_questions — question pool orqali savol tanlash"""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(10):
+            q = Question.objects.create(
+                subject=self.subject,
+                text=f'Pool savol {i}',
+                difficulty=['easy', 'medium', 'hard'][i % 3],
+            )
+            Answer.objects.create(question=q, text='A', is_correct=True, order=1)
+            Answer.objects.create(question=q, text='B', is_correct=False, order=2)
+
+    def test_generate_returns_unique_questions(self):
+        """Savollar soni to'g'ri va takrorlanmaydi"""
+        from .views import generate_questions
+        data = generate_questions(subject=self.subject, count=8)
+        ids = [q['id'] for q in data]
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(len(set(ids)), 8)
+        self.assertTrue(all(len(q['answers']) == 2 for q in data))
+
+    def test_constant_queries_with_warm_pool(self):
+        """Pool tayyor bo'lsa — savollar va javoblar uchun 2 ta so'rov"""
+        from .views import generate_questions
+        generate_questions(subject=self.subject, count=5)
+        with self.assertNumQueries(2):
+            generate_questions(subject=self.subject, count=10)
+
+    def test_pool_refreshed_on_question_save(self):
+        """Yangi savol qo'shilsa pool yangilanadi, nofaol savol chiqariladi"""
+        from tests_app.question_pool import get_question_pool
+        get_question_pool(self.subject.id, 'easy')  # pool cache'ga tushadi
+        new_q = Question.objects.create(subject=self.subject, text='Yangi', difficulty='easy')
+        self.assertIn(new_q.id, get_question_pool(self.subject.id, 'easy'))
+        new_q.is_active = False
+        new_q.save()
+        self.assertNotIn(new_q.id, get_question_pool(self.subject.id, 'easy'))
+
+
+# ==============================================================
+# EXAM STANDINGS TESTS
+# ==============================================================
+
+class ExamStandingsTest(BaseTestCase):
+    """Live imtihon reytingi proyeksiyasi va tick farqlari"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.comp = self.competition_active
+        self.exam = {'id': self.comp.id, 'xp_per_correct': 10, 'start': timezone.now().timestamp()}
+        CompetitionParticipant.objects.create(competition=self.comp, user=self.user2, score=5)
+
+    def test_answers_update_projection(self):
+        """To'g'ri javob qo'shiladi, javob o'zgarsa qaytariladi"""
+        from .exam_standings import record_answer, top_standings
+        record_answer(self.exam, self.user, self.question1.id, True)
+        record_answer(self.exam, self.user, self.question2.id, True)
+        record_answer(self.exam, self.user, self.question2.id, False)
+
+        rows = top_standings(self.comp.id)
+        self.assertEqual([row['user_id'] for row in rows], [self.user.id, self.user2.id])
+        self.assertEqual((rows[0]['score'], rows[0]['correct']), (10, 1))
+
+    def test_participant_check(self):
+        """Reytingga faqat ishtirokchilar; yangi ishtirokchi qurilgan proyeksiyaga qo'shiladi"""
+        from .exam_standings import is_participant, record_answer
+        self.assertTrue(is_participant(self.comp.id, self.user2.id))
+        self.assertFalse(is_participant(self.comp.id, self.user.id))
+
+        record_answer(self.exam, self.user2, self.question1.id, True)  # proyeksiya qurildi
+        CompetitionParticipant.objects.create(competition=self.comp, user=self.user)
+        self.assertTrue(is_participant(self.comp.id, self.user.id))
+
+    def test_read_without_db_after_seed(self):
+        """Proyeksiya tayyor bo'lsa — reyting o'qish SQL so'rovsiz"""
+        from .exam_standings import record_answer, top_standings
+        record_answer(self.exam, self.user, self.question1.id, True)
+        with self.assertNumQueries(0):
+            top_standings(self.comp.id)
+
+    def test_publish_sends_only_diff(self):
+        """Tick faqat o'zgargan qatorlarni yuboradi, o'zgarish bo'lmasa jim"""
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from .exam_standings import publish_dirty_standings, record_answer
+
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'exam_{self.comp.slug}', channel)
+
+        record_answer(self.exam, self.user, self.question1.id, True)
+        self.assertEqual(publish_dirty_standings(), 1)
+        first = async_to_sync(layer.receive)(channel)
+        self.assertEqual(first['type'], 'broadcast.leaderboard_diff')
+        self.assertEqual(len(first['changed']), 2)
+
+        record_answer(self.exam, self.user, self.question2.id, True)
+        record_answer(self.exam, self.user, self.question2.id, True)
+        self.assertEqual(publish_dirty_standings(), 1)
+        second = async_to_sync(layer.receive)(channel)
+        self.assertEqual([row['user_id'] for row in second['changed']], [self.user.id])
+        self.assertEqual(publish_dirty_standings(), 0)
+
+
+# ==============================================================
+# EXAM CLOCK TESTS
+# ==============================================================
+
+class ExamClockTest(BaseTestCase):
+    """Markaziy imtihon soati va umumiy ticker"""
+
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.comp = self.competition_active
+
+    def test_pause_freezes_remaining(self):
+        """Pauzada qolgan vaqt o'zgarmaydi, resume undan davom etadi"""
+        from .exam_clock import get_clock, pause_clock, resume_end_time, seconds_remaining
+        self.comp.end_time = timezone.now() + timedelta(minutes=10)
+        remaining = pause_clock(self.comp)
+        self.assertEqual(seconds_remaining(get_clock(self.comp.slug), timezone.now() + timedelta(hours=1)), remaining)
+
+        end_time, resumed = resume_end_time(self.comp)
+        self.assertEqual(resumed, remaining)
+        self.assertGreater(end_time, self.comp.end_time - timedelta(seconds=1))
+
+    def test_status_change_resets_clock(self):
+        """Competition holati saqlansa cache'dagi soat DB dan qayta olinadi"""
+        from .exam_clock import get_clock, set_clock
+        set_clock(self.comp.slug, 'paused', self.comp.end_time, paused_remaining=5)
+        self.comp.status = 'finished'
+        self.comp.save(update_fields=['status'])
+        self.assertEqual(get_clock(self.comp.slug)['status'], 'finished')
+
+    def test_full_save_keeps_pause(self):
+        """Pauzadagi imtihon to'liq saqlansa (admin tahriri) muzlatilgan vaqt yo'qolmaydi"""
+        from .exam_clock import get_clock, pause_clock, seconds_remaining
+        self.comp.status = 'paused'
+        self.comp.end_time = timezone.now() + timedelta(minutes=10)
+        self.comp.save()
+        remaining = pause_clock(self.comp)
+
+        self.comp.title = 'Tahrirlangan'
+        self.comp.save()
+        clock = get_clock(self.comp.slug)
+        self.assertEqual(clock['status'], 'paused')
+        self.assertEqual(seconds_remaining(clock, timezone.now() + timedelta(hours=1)), remaining)
+
+    def test_tick_broadcasts_to_group(self):
+        """Bitta tick exam guruhiga timer_sync yuboradi, yakunlangan imtihonda to'xtaydi"""
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from .exam_clock import tick
+
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'exam_{self.comp.slug}', channel)
+
+        self.assertTrue(async_to_sync(tick)(layer, self.comp.slug))
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(message['type'], 'broadcast.timer')
+        self.assertGreater(message['seconds_remaining'], 0)
+
+        self.comp.status = 'finished'
+        self.comp.save()
+        self.assertFalse(async_to_sync(tick)(layer, self.comp.slug))
+
+    def test_ticker_survives_transient_error(self):
+        """Tick xatosi ticker'ni to'xtatmaydi, yakunda lease bo'shatiladi"""
+        from unittest.mock import AsyncMock, patch
+        from asgiref.sync import async_to_sync
+        from . import exam_clock
+
+        results = [RuntimeError('redis'), True, False]
+        with patch.object(exam_clock, 'timer_sync_seconds', return_value=0), \
+                patch.object(exam_clock, 'tick', AsyncMock(side_effect=results)) as tick, \
+                patch.object(exam_clock, '_release_lease') as release:
+            async_to_sync(exam_clock._ticker_loop)(None, self.comp.slug)
+        self.assertEqual(tick.await_count, 3)
+        release.assert_called_once_with(self.comp.slug)
+
+
+# ==============================================================
+# MATCHMAKING ENGINE TESTS
+# ==============================================================
+
+class MatchmakingEngineTest(BaseTestCase):
+    """Matchmaking: reyting oynasi va DB rejimidagi juftlash"""
+
+    def test_rating_window_widens_and_caps(self):
+        """Oyna kutish bilan kengayadi va MAX_WINDOW dan oshmaydi"""
+        from .matchmaking import BASE_WINDOW, MAX_WINDOW, rating_window
+        self.assertEqual(rating_window(0), BASE_WINDOW)
+        self.assertGreater(rating_window(30), BASE_WINDOW)
+        self.assertEqual(rating_window(10 ** 6), MAX_WINDOW)
+
+    def test_queue_task_pairs_entries_with_questions(self):
+        """process_matchmaking_queue ikki userni savollari bor jangga juftlaydi"""
+        from .tasks import process_matchmaking_queue
+        for user in (self.user, self.user2):
+            MatchmakingQueue.objects.create(
+                user=user, subject=self.subject, user_rating=1000,
+                expires_at=timezone.now() + timedelta(minutes=5),
+            )
+
+        process_matchmaking_queue()
+
+        battle = Battle.objects.get(opponent_type='random')
+        self.assertEqual({battle.challenger_id, battle.opponent_id}, {self.user.id, self.user2.id})
+        self.assertEqual(len(battle.questions_data), 2)
+        self.assertFalse(MatchmakingQueue.objects.filter(is_matched=False).exists())
+
+    @skipUnless(fakeredis, 'fakeredis o\'rnatilmagan')
+    def test_sweep_match_visible_to_both_users(self):
+        """sweep juftlagan ikkala user ham status polling'da jangni oladi"""
+        from types import SimpleNamespace
+        from unittest.mock import patch
+        from . import matchmaking
+
+        r = fakeredis.FakeRedis()
+        with patch.object(matchmaking, 'get_redis', return_value=r), \
+                patch.object(matchmaking, '_pair_script', None), \
+                patch.object(matchmaking, 'take_question_set', return_value=[]):
+            # Reyting oynasidan tashqarida — ikkalasi ham kutadi
+            self.assertIsNone(matchmaking.join_queue(SimpleNamespace(id=self.user.id, rating=1000)))
+            self.assertIsNone(matchmaking.join_queue(SimpleNamespace(id=self.user2.id, rating=1500)))
+            with patch.object(matchmaking, 'BASE_WINDOW', 1000):
+                self.assertEqual(matchmaking.sweep(), 1)
+
+            statuses = []
+            for user in (self.user, self.user2):
+                self.client.force_login(user)
+                statuses.append(self.client.get(reverse('competitions:api_matchmaking_status')).json())
+
+        battle = Battle.objects.get(opponent_type='random')
+        self.assertEqual([s['status'] for s in statuses], ['matched', 'matched'])
+        self.assertEqual({s['battle_uuid'] for s in statuses}, {str(battle.uuid)})
+
+    def test_failed_battle_creation_requeues_both_users(self):
+        """Jang yaratilmasa skript olib tashlagan ikkala user navbatga qaytadi"""
+        from unittest.mock import patch
+        from . import matchmaking
+        waiting = {'user_id': self.user.id, 'rating': 1000, 'subject_id': None,
+                   'question_count': 10, 'joined': 0}
+        joiner = {**waiting, 'user_id': self.user2.id, 'rating': 1100}
+        r = object()
+        with patch.object(matchmaking, 'take_question_set', side_effect=RuntimeError), \
+                patch.object(matchmaking, '_requeue') as requeue:
+            self.assertIsNone(matchmaking._create_battle(r, waiting, joiner, notify_joiner=True))
+
+        requeue.assert_called_once_with(r, [waiting, joiner])
+        self.assertFalse(Battle.objects.filter(opponent_type='random').exists())
@@ -26,7 +26,11 @@ from .models import (
     DailyChallenge, DailyChallengeParticipant,
     WeeklyLeague, WeeklyLeagueParticipant
 )
-from tests_app.models import Subject, Topic, Question, Answer, Test, TestAttempt
+from tests_app.models import Subject, Topic, Answer, Test, TestAttempt
+from tests_app.question_pool import sample_question_ids, load_questions
+from tests_app.stats_rollup import record_stats_event, topic_breakdown
+from . import matchmaking
+from .exam_standings import record_result
 
 
 # ============================================================
@@ -176,55 +180,49 @@ def generate_questions(subject=None, subjects=None, count=30, difficulty_dist=No
         questions_data = get_questions_for_subject(subject, count, difficulty_dist)
     else:
         # Barcha fanlardan
-        all_questions = list(Question.objects.filter(is_active=True))
-        random.shuffle(all_questions)
-        selected = all_questions[:count]
+        selected = load_questions(sample_question_ids(k=count))
         questions_data = format_questions(selected)
 
     return questions_data
 
 
 def get_questions_for_subject(subject, count, difficulty_dist):
-    """Bir fan uchun savollar"""
-    questions = []
+    """
+    Bir fan uchun savollar.
+    ID lar question pool'dan O(k) tanlanadi — bank hajmidan qat'i nazar
+    savollar va javoblar uchun jami 2 ta so'rov.
+    """
+    selected_ids = []
 
     # Qiyinlik bo'yicha taqsimlash
     total_percent = sum(difficulty_dist.values())
 
     for difficulty, percent in difficulty_dist.items():
         diff_count = int(count * percent / total_percent)
-        diff_questions = list(
-            Question.objects.filter(
-                subject=subject,
-                difficulty=difficulty,
-                is_active=True
-            )
-        )
-        random.shuffle(diff_questions)
-        questions.extend(diff_questions[:diff_count])
+        selected_ids.extend(sample_question_ids(subject.id, difficulty, diff_count))
 
     # Yetishmasa, qo'shimcha qo'shish
-    if len(questions) < count:
-        remaining = count - len(questions)
-        existing_ids = [q.id for q in questions]
-        extra = list(
-            Question.objects.filter(
-                subject=subject,
-                is_active=True
-            ).exclude(id__in=existing_ids)
+    if len(selected_ids) < count:
+        remaining = count - len(selected_ids)
+        selected_ids.extend(
+            sample_question_ids(subject.id, None, remaining, exclude=selected_ids)
         )
-        random.shuffle(extra)
-        questions.extend(extra[:remaining])
 
-    random.shuffle(questions)
-    return format_questions(questions[:count])
+    random.shuffle(selected_ids)
+    return format_questions(load_questions(selected_ids[:count]))
 
 
 def format_questions(questions):
-    """Savollarni JSON formatga o'tkazish"""
+    """Savollarni JSON formatga o'tkazish (javoblar bitta so'rovda)"""
+    answers_map = {}
+    for a in Answer.objects.filter(
+        question_id__in=[q.id for q in questions]
+    ).values('id', 'text', 'is_correct', 'question_id'):
+        answers_map.setdefault(a.pop('question_id'), []).append(a)
+
     data = []
     for q in questions:
-        answers = list(q.answers.all().values('id', 'text', 'is_correct'))
+        answers = answers_map.get(q.id, [])
         random.shuffle(answers)
         data.append({
             'id': q.id,
@@ -715,6 +713,31 @@ def competition_submit(request, slug):
         competition.completed_count = F('completed_count') + 1
         competition.save(update_fields=['completed_count'])
 
+    # Live reyting proyeksiyasi (ExamConsumer keyingi tick'da farqni yuboradi)
+    record_result(participant)
+
+    # Kunlik, fan va mavzu statistikasi — hodisa orqali (tests_app.stats_rollup)
+    answered_ids = {a['question_id']: a['answer_id'] for a in answers_data}
+    record_stats_event(
+        request.user.id, 'competition', participant.id,
+        subject_id=competition.subject_id,
+        questions=result['total'],
+        correct=result['correct'],
+        wrong=result['wrong'],
+        time_spent=time_spent,
+        xp=result['xp'],
+        score=result['percentage'],
+        topics=topic_breakdown(
+            (
+                q.get('topic_id'), q.get('subject_id'),
+                any(a['is_correct'] and a['id'] == answered_ids.get(q['id']) for a in q['answers']),
+                0,
+            )
+            for q in questions_data
+        ),
+        occurred_at=participant.completed_at,
+    )
+
     # Session tozalash
     request.session.pop('competition_questions', None)
     request.session.pop('competition_id', None)
@@ -1012,23 +1035,40 @@ def battle_matchmaking(request, subject_id=None):
     except (ValueError, TypeError):
         user_level = 1
 
+    # Redis matchmaking — atomik juftlash (Lua), DB ga faqat Battle yoziladi
+    if matchmaking.is_available():
+        battle = matchmaking.join_queue(user, subject.id if subject else None)
+        if battle is not None:
+            return redirect('competitions:battle_ready', uuid=battle.uuid)
+        return render(request, 'competitions/battle_matchmaking.html', {
+            'queue_entry': None,
+            'subject': subject,
+        })
+
+    # Redis'siz (dev) — MatchmakingQueue jadvali
     # Avvalgi queue'ni o'chirish
     MatchmakingQueue.objects.filter(user=user).delete()
 
-    # Mos raqib qidirish
-    potential_match = MatchmakingQueue.objects.filter(
-        is_matched=False,
-        expires_at__gt=timezone.now(),
-        user_rating__gte=user_rating - 200,
-        user_rating__lte=user_rating + 200,
-    ).exclude(user=user)
-
-    if subject:
-        potential_match = potential_match.filter(
-            Q(subject=subject) | Q(subject__isnull=True)
-        )
+    with transaction.atomic():
+        # Mos raqib qidirish (qulflangan qatorlar o'tkazib yuboriladi —
+        # ikki parallel so'rov bitta raqibni olmaydi)
+        potential_match = MatchmakingQueue.objects.filter(
+            is_matched=False,
+            expires_at__gt=timezone.now(),
+            user_rating__gte=user_rating - 200,
+            user_rating__lte=user_rating + 200,
+        ).exclude(user=user)
+
+        if subject:
+            potential_match = potential_match.filter(
+                Q(subject=subject) | Q(subject__isnull=True)
+            )
 
-    match = potential_match.order_by('joined_at').first()
+        match = potential_match.select_for_update(skip_locked=True).order_by('joined_at').first()
+        if match:
+            match.is_matched = True
+            match.matched_with = user
+            match.save(update_fields=['is_matched', 'matched_with'])
 
     if match:
         # Match topildi! — "Tayyorgarlik" bosqichiga o'tish (battle_play emas)
@@ -1053,10 +1093,8 @@ def battle_matchmaking(request, subject_id=None):
         )
 
         # Queue yangilash
-        match.is_matched = True
-        match.matched_with = user
         match.battle = battle
-        match.save()
+        match.save(update_fields=['battle'])
 
         # WebSocket orqali chaqiruvchiga match_found yuborish
         _ws_notify_match_found(match.user, user, battle)
@@ -1599,6 +1637,10 @@ def api_battle_status(request, uuid):
 @require_GET
 def api_matchmaking_status(request):
     """Matchmaking holati API"""
+    status = matchmaking.queue_status(request.user.id)
+    if status is not None:
+        return JsonResponse(status)
+
     queue_entry = MatchmakingQueue.objects.filter(user=request.user).first()
 
     if not queue_entry:
@@ -1628,6 +1670,7 @@ def api_matchmaking_status(request):
 @require_POST
 def api_matchmaking_cancel(request):
     """Matchmaking bekor qilish"""
+    matchmaking.leave_queue(request.user.id)
     MatchmakingQueue.objects.filter(user=request.user).delete()
     return JsonResponse({'status': 'cancelled'})
 
@@ -1694,11 +1737,13 @@ def api_online_friends(request):
     """Online do'stlar API"""
     friends = get_user_friends(request.user)
 
-    from django.core.cache import cache
+    # Barcha do'stlar holati bitta presence so'rovida
+    from accounts.presence import online_ids
+    online = online_ids([friend.id for friend in friends])
+
     data = []
     for friend in friends:
-        # Redis orqali online status tekshirish
-        is_online = bool(cache.get(f'online:{friend.id}'))
+        is_online = friend.id in online
 
         data.append({
             'id': friend.id,
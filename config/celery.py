@@ -18,6 +18,42 @@ app.conf.beat_schedule = {
         'task': 'leaderboard.tasks.warm_leaderboard_cache',
         'schedule': crontab(minute='*/10'),
     },
+    'drain-question-stats': {
+        'task': 'tests_app.tasks.drain_question_stats',
+        'schedule': 15.0,  # har 15 soniyada — savol hisoblagichlari
+    },
+    'drain-cert-question-stats': {
+        'task': 'certificate.tasks.drain_cert_question_stats',
+        'schedule': 60.0,  # har daqiqada — sertifikat savol hisoblagichlari va qiyinlik jadvallari
+    },
+    'flush-answer-buffers': {
+        'task': 'tests_app.tasks.flush_answer_buffers',
+        'schedule': 60.0,  # har daqiqada — test javoblari buferi
+    },
+    'flush-cert-autosave': {
+        'task': 'certificate.tasks.flush_cert_autosave',
+        'schedule': 30.0,  # har 30 soniyada — sertifikat mock autosave buferi
+    },
+    'rollup-stats-events': {
+        'task': 'tests_app.tasks.rollup_stats_events',
+        'schedule': 60.0,  # har daqiqada — kunlik, fan va mavzu statistikasi
+    },
+    'calibrate-questions': {
+        'task': 'tests_app.tasks.calibrate_questions',
+        'schedule': crontab(hour=3, minute=0),  # har kecha — IRT kalibrlash
+    },
+    'calibrate-cert-questions': {
+        'task': 'certificate.tasks.calibrate_cert_questions',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'publish-exam-standings': {
+        'task': 'competitions.tasks.publish_exam_standings',
+        'schedule': 2.0,  # har 2 soniya — live imtihon reytingi farqlari
+    },
+    'persist-presence': {
+        'task': 'accounts.tasks.persist_presence',
+        'schedule': 60.0,  # har daqiqada — last_online bulk yozish
+    },
     'process-matchmaking': {
         'task': 'competitions.tasks.process_matchmaking_queue',
         'schedule': 5.0,  # har 5 soniya
@@ -234,8 +234,17 @@ CELERY_BEAT_SCHEDULE = {
 }
 
 # ─── Coding Sandbox (Docker) sozlamalari ─────────────────────────────────────
+SANDBOX_BACKEND = config('SANDBOX_BACKEND', default='docker')  # 'fake' — Docker'siz (CI, bench_judge)
 SANDBOX_TIME_LIMIT = 5       # sekundda (max)
 SANDBOX_MEMORY_LIMIT = '256m'
+SANDBOX_COMPILE_TIME_LIMIT = 15   # sekundda — bir yuborishga bir marta
+SANDBOX_POOL_SIZE = 4             # har worker jarayonida har bir image uchun issiq konteynerlar (parallel case'lar ham shulardan)
+SANDBOX_CONTAINER_MAX_USES = 100  # shundan keyin konteyner yangilanadi
+SANDBOX_PREWARM = True            # worker ishga tushganda pulni to'ldirish
+SANDBOX_PARALLEL_CASES = 4        # bir yuborishda bir vaqtda ishlaydigan test case'lar
+
+# ─── Live imtihon (ExamConsumer) ─────────────────────────────────────────────
+EXAM_TIMER_SYNC_SECONDS = 30  # timer_sync broadcast oralig'i (har imtihonga bitta ticker)
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -1,49 +1,26 @@
 # core/context_processors.py
 
-from django.utils import timezone
 from django.conf import settings
 
 
 def system_banners(request):
-    """Faol bannerlarni har sahifaga yuborish"""
-    from news.models import SystemBanner
-
-    now = timezone.now()
-
-    banners = SystemBanner.objects.filter(
-        is_active=True
-    ).filter(
-        start_date__isnull=True
-    ) | SystemBanner.objects.filter(
-        is_active=True,
-        start_date__lte=now
-    )
-
-    banners = banners.filter(
-        end_date__isnull=True
-    ) | banners.filter(
-        end_date__gte=now
-    )
-
-    banners = banners.distinct().order_by('order')
+    """Faol bannerlarni har sahifaga yuborish (jarayon xotirasidagi jadvaldan)"""
+    from news.banners import active_banners
 
     return {
-        'system_banners': banners
+        'system_banners': active_banners()
     }
 
 
 def notifications_count(request):
-    """O'qilmagan bildirishnomalar sonini har sahifaga yuborish"""
+    """O'qilmagan bildirishnomalar sonini har sahifaga yuborish (news.inbox cache'idan)"""
     if request.user.is_authenticated:
-        from news.models import Notification
-        from accounts.models import Friendship
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
-        recent = Notification.objects.filter(user=request.user).order_by('-created_at')[:5]
-        pending_friends = Friendship.objects.filter(to_user=request.user, status='pending').count()
+        from news.inbox import get_inbox
+        inbox = get_inbox(request.user.id)
         return {
-            'unread_notifications_count': count,
-            'recent_notifications': recent,
-            'pending_friend_requests_count': pending_friends,
+            'unread_notifications_count': inbox['unread'],
+            'recent_notifications': inbox['recent'][:5],
+            'pending_friend_requests_count': inbox['pending_friends'],
         }
     return {
         'unread_notifications_count': 0,
@@ -0,0 +1,20 @@
+"""
+TestMakon.uz - Redis client
+Django cache (django_redis) ulanishidan xom Redis client olish
+"""
+
+from django.core.cache import cache
+
+
+def get_redis():
+    """Xom Redis client yoki None (cache backend Redis emas)"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def redis_key(key):
+    """Cache KEY_PREFIX bilan to'liq kalit nomi (testmakon:1:...)"""
+    return cache.make_key(key)
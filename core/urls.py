@@ -41,6 +41,7 @@ urlpatterns = [
 
     # Admin tools
     path('panel/broadcast/', views.admin_broadcast, name='admin_broadcast'),
+    path('panel/broadcast/status/<str:job_id>/', views.admin_broadcast_status, name='admin_broadcast_status'),
     path('panel/system/', views.admin_system_health, name='admin_system_health'),
 
     # SEO Landing Pages
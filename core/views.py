@@ -6,6 +6,7 @@ Home, dashboard, and static pages
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
+from django.urls import reverse
 from django.contrib import messages
 from django.db import models
 from django.db.models import Count, Avg, Sum
@@ -603,7 +604,7 @@ def error_500(request):
 @staff_member_required
 def admin_broadcast(request):
     """Staff: barcha yoki tanlangan userlarga bildirishnoma yuborish."""
-    from news.models import Notification
+    from news.fanout import audience, get_status, start_broadcast
 
     if request.method == 'GET':
         try:
@@ -616,6 +617,7 @@ def admin_broadcast(request):
             'total_users': User.objects.filter(is_active=True).count(),
             'premium_count': premium_count,
             'free_count': free_count,
+            'job': get_status(request.GET['job']) if request.GET.get('job') else None,
         })
 
     # POST
@@ -629,46 +631,21 @@ def admin_broadcast(request):
         messages.error(request, "Sarlavha va xabar maydoni to'ldirilishi shart.")
         return redirect('core:admin_broadcast')
 
-    # Target users
-    qs = User.objects.filter(is_active=True)
-    if target == 'premium':
-        try:
-            from subscriptions.models import Subscription
-            premium_ids = Subscription.objects.filter(is_active=True).values_list('user_id', flat=True)
-            qs = qs.filter(id__in=premium_ids)
-        except Exception:
-            pass
-    elif target == 'free':
-        try:
-            from subscriptions.models import Subscription
-            premium_ids = Subscription.objects.filter(is_active=True).values_list('user_id', flat=True)
-            qs = qs.exclude(id__in=premium_ids)
-        except Exception:
-            pass
+    # Background fan-out (keyset pagination + live push)
+    job_id = start_broadcast(title, message, notif_type, link, target)
+    messages.success(request, f"Xabar {audience(target).count()} ta foydalanuvchiga yuborilmoqda.")
+    return redirect(f"{reverse('core:admin_broadcast')}?job={job_id}")
 
-    # Bulk create notifications
-    valid_types = ('system', 'news', 'competition', 'battle', 'achievement', 'friend', 'reminder')
-    if notif_type not in valid_types:
-        notif_type = 'system'
 
-    batch = []
-    for user in qs.only('id'):
-        batch.append(Notification(
-            user=user,
-            notification_type=notif_type,
-            title=title,
-            message=message,
-            link=link,
-        ))
-        if len(batch) >= 500:
-            Notification.objects.bulk_create(batch, ignore_conflicts=True)
-            batch = []
-    if batch:
-        Notification.objects.bulk_create(batch, ignore_conflicts=True)
-
-    count = qs.count()
-    messages.success(request, f"Xabar {count} ta foydalanuvchiga yuborildi.")
-    return redirect('core:admin_broadcast')
+@staff_member_required
+def admin_broadcast_status(request, job_id):
+    """Staff: ommaviy yuborish jarayoni (sahifa polling qiladi)."""
+    from news.fanout import get_status
+
+    status = get_status(job_id)
+    if status is None:
+        return JsonResponse({'success': False, 'error': 'Topilmadi'}, status=404)
+    return JsonResponse({'success': True, **status})
 
 
 # ─────────────────────────────────────────────────
@@ -0,0 +1,268 @@
+"""
+TestMakon.uz - Leaderboard Ranking Engine
+Redis sorted set (ZSET) asosidagi inkremental reyting.
+"""
+
+from datetime import date, timedelta
+
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core.redis_client import get_redis, redis_key
+
+GLOBAL_BOARD = 'global'
+BOARD_TTL = {
+    'week': 60 * 60 * 24 * 7 * 5,   # 5 hafta
+    'month': 60 * 60 * 24 * 62,     # 2 oy
+    # Fan doskasi faqat ZINCRBY bilan yuritiladi — o'tkazib yuborilgan yozuv yoki
+    # qayta qurish paytida kelgan natija tufayli siljimasligi uchun kunda bir marta
+    # marker eskiradi va doska lock ostida DB dan qayta quriladi
+    'subject': 60 * 60 * 24,        # 1 kun
+}
+REBUILD_CHUNK = 5000
+USER_FIELDS = (
+    'id', 'first_name', 'last_name', 'phone_number', 'xp_points', 'level',
+    'avatar', 'global_rank', 'region', 'total_tests_taken', 'current_streak',
+)
+
+
+# ============================================================
+# DOSKA NOMLARI
+# ============================================================
+
+def week_board(day=None):
+    year, week, _ = (day or timezone.localdate()).isocalendar()
+    return f'week:{year}-W{week:02d}'
+
+
+def month_board(day=None):
+    return f'month:{(day or timezone.localdate()):%Y-%m}'
+
+
+def subject_board(subject_id):
+    return f'subject:{subject_id}'
+
+
+def _zset_key(board):
+    return redis_key(f'lb:{board}')
+
+
+def _tests_key(board):
+    return redis_key(f'lb:{board}:tests')
+
+
+def _marker_key(board):
+    return redis_key(f'lb:{board}:built')
+
+
+def _board_ttl(board):
+    return BOARD_TTL.get(board.partition(':')[0])
+
+
+# ============================================================
+# YOZISH
+# ============================================================
+
+def record_test_result(user_id, xp_earned, xp_total, subject_id=None, day=None):
+    """
+    Yakunlangan test natijasini doskalarga qo'shish.
+    Hali qurilmagan doskalar o'tkazib yuboriladi — ular DB dan quriladi
+    va bu natija u yerda allaqachon hisobga olingan bo'ladi.
+    """
+    r = get_redis()
+    if r is None:
+        return
+
+    boards = [week_board(day), month_board(day)]
+    if subject_id:
+        boards.append(subject_board(subject_id))
+
+    pipe = r.pipeline(transaction=False)
+    for board in [GLOBAL_BOARD] + boards:
+        pipe.exists(_marker_key(board))
+    global_built, *built = pipe.execute()
+
+    pipe = r.pipeline(transaction=False)
+    if global_built:
+        pipe.zadd(_zset_key(GLOBAL_BOARD), {user_id: xp_total})
+    for board, is_built in zip(boards, built):
+        if not is_built:
+            continue
+        pipe.zincrby(_zset_key(board), xp_earned, user_id)
+        pipe.hincrby(_tests_key(board), user_id, 1)
+        ttl = _board_ttl(board)
+        if ttl:
+            pipe.expire(_zset_key(board), ttl, nx=True)
+            pipe.expire(_tests_key(board), ttl, nx=True)
+    pipe.execute()
+
+
+def sync_user_xp(pairs):
+    """Global doskada XP ni yangilash: [(user_id, xp_points), ...] (battle, musobaqa XP lari uchun)"""
+    r = get_redis()
+    if r is None or not pairs or not r.exists(_marker_key(GLOBAL_BOARD)):
+        return
+    r.zadd(_zset_key(GLOBAL_BOARD), {user_id: xp for user_id, xp in pairs})
+
+
+def drop_board(board):
+    """Doskani o'chirish — keyingi o'qishda DB dan qayta quriladi"""
+    r = get_redis()
+    if r is not None:
+        r.delete(_marker_key(board), _zset_key(board), _tests_key(board))
+
+
+# ============================================================
+# DB DAN QURISH
+# ============================================================
+
+def _board_rows(board):
+    """DB dan doska qatorlari: [(user_id, xp, tests), ...] XP bo'yicha kamayish tartibida"""
+    from accounts.models import User
+    from tests_app.models import TestAttempt
+
+    if board == GLOBAL_BOARD:
+        return [
+            (uid, xp, None)
+            for uid, xp in User.objects.filter(is_active=True, xp_points__gt=0)
+            .order_by('-xp_points').values_list('id', 'xp_points')
+        ]
+
+    kind, _, arg = board.partition(':')
+    attempts = TestAttempt.objects.filter(status='completed')
+    if kind == 'week':
+        year, week = arg.split('-W')
+        start = date.fromisocalendar(int(year), int(week), 1)
+        attempts = attempts.filter(started_at__date__gte=start, started_at__date__lt=start + timedelta(days=7))
+    elif kind == 'month':
+        year, month = arg.split('-')
+        start = date(int(year), int(month), 1)
+        end = (start + timedelta(days=32)).replace(day=1)
+        attempts = attempts.filter(started_at__date__gte=start, started_at__date__lt=end)
+    elif kind == 'subject':
+        attempts = attempts.filter(test__subject_id=int(arg))
+
+    return [
+        (row['user'], row['total_xp'] or 0, row['tests_count'])
+        for row in attempts.values('user').annotate(
+            total_xp=Sum('xp_earned'), tests_count=Count('id')
+        ).order_by('-total_xp')
+    ]
+
+
+def _rebuild(r, board):
+    rows = _board_rows(board)
+    tmp_zset, tmp_tests = _zset_key(board) + ':tmp', _tests_key(board) + ':tmp'
+    r.delete(tmp_zset, tmp_tests)
+    for start in range(0, len(rows), REBUILD_CHUNK):
+        chunk = rows[start:start + REBUILD_CHUNK]
+        pipe = r.pipeline(transaction=False)
+        pipe.zadd(tmp_zset, {uid: xp for uid, xp, _ in chunk})
+        tests = {uid: n for uid, _, n in chunk if n is not None}
+        if tests:
+            pipe.hset(tmp_tests, mapping=tests)
+        pipe.execute()
+
+    ttl = _board_ttl(board)
+    pipe = r.pipeline()
+    if rows:
+        pipe.rename(tmp_zset, _zset_key(board))
+    else:
+        pipe.delete(_zset_key(board))
+    if r.exists(tmp_tests):
+        pipe.rename(tmp_tests, _tests_key(board))
+    else:
+        pipe.delete(_tests_key(board))
+    pipe.set(_marker_key(board), 1, ex=ttl)
+    if ttl:
+        pipe.expire(_zset_key(board), ttl)
+        pipe.expire(_tests_key(board), ttl)
+    pipe.execute()
+
+
+def ensure_board(board):
+    """Doska Redis'da bo'lmasa — lock ostida DB dan qurish. Returns: Redis client yoki None"""
+    r = get_redis()
+    if r is None or r.exists(_marker_key(board)):
+        return r
+    lock = r.lock(redis_key(f'lb:{board}:lock'), timeout=120)
+    if lock.acquire(blocking=True, blocking_timeout=30):
+        try:
+            if not r.exists(_marker_key(board)):
+                _rebuild(r, board)
+        finally:
+            lock.release()
+    return r
+
+
+# ============================================================
+# O'QISH
+# ============================================================
+
+def top_entries(board, limit=100, offset=0):
+    """[(rank, user_id, xp, tests), ...]"""
+    r = ensure_board(board)
+    if r is None:
+        rows = _board_rows(board)[offset:offset + limit]
+        return [(offset + i, uid, xp, tests) for i, (uid, xp, tests) in enumerate(rows, 1)]
+
+    members = r.zrevrange(_zset_key(board), offset, offset + limit - 1, withscores=True)
+    user_ids = [int(m) for m, _ in members]
+    tests = r.hmget(_tests_key(board), user_ids) if user_ids and board != GLOBAL_BOARD else [None] * len(user_ids)
+    return [
+        (offset + i, uid, int(score), int(n) if n is not None else None)
+        for i, (uid, (_, score), n) in enumerate(zip(user_ids, members, tests), 1)
+    ]
+
+
+def user_rank(board, user_id):
+    """(rank, xp) yoki doskada bo'lmasa (None, 0)"""
+    r = ensure_board(board)
+    if r is None:
+        for i, (uid, xp, _) in enumerate(_board_rows(board), 1):
+            if uid == user_id:
+                return i, xp
+        return None, 0
+
+    pipe = r.pipeline(transaction=False)
+    pipe.zrevrank(_zset_key(board), user_id)
+    pipe.zscore(_zset_key(board), user_id)
+    rank, score = pipe.execute()
+    if rank is None:
+        return None, 0
+    return rank + 1, int(score)
+
+
+def neighbours(board, user_id, radius=5):
+    """Foydalanuvchi atrofidagi qatorlar (yuqorida va pastda radius tadan)"""
+    rank, _ = user_rank(board, user_id)
+    if rank is None:
+        return []
+    offset = max(0, rank - 1 - radius)
+    return top_entries(board, limit=2 * radius + 1, offset=offset)
+
+
+def ranks_for(board, user_ids):
+    """{user_id: rank} — do'stlar kabi kichik ro'yxat uchun, har biri O(log n)"""
+    user_ids = list(user_ids)
+    r = ensure_board(board)
+    if r is None:
+        positions = {uid: i for i, (uid, _, _) in enumerate(_board_rows(board), 1)}
+        return {uid: positions.get(uid) for uid in user_ids}
+
+    pipe = r.pipeline(transaction=False)
+    for uid in user_ids:
+        pipe.zrevrank(_zset_key(board), uid)
+    return {uid: (rank + 1 if rank is not None else None) for uid, rank in zip(user_ids, pipe.execute())}
+
+
+def leaderboard_entries(board, limit=100, offset=0):
+    """Shablonlar uchun: [{'rank', 'user', 'xp', 'tests'}, ...] (User lar bitta so'rovda)"""
+    from accounts.models import User
+
+    entries = top_entries(board, limit=limit, offset=offset)
+    users = User.objects.filter(id__in=[uid for _, uid, _, _ in entries]).only(*USER_FIELDS).in_bulk()
+    return [
+        {'rank': rank, 'user': users[uid], 'xp': xp, 'tests': tests}
+        for rank, uid, xp, tests in entries if uid in users
+    ]
@@ -1,79 +1,47 @@
 from celery import shared_task
-from django.core.cache import cache
 import logging
 
 logger = logging.getLogger(__name__)
 
-LEADERBOARD_CACHE_TTL = 60 * 10  # 10 daqiqa
+XP_SYNC_WINDOW = 60 * 15  # oxirgi 15 daqiqada faol bo'lganlar
 
 
 @shared_task
 def invalidate_leaderboard_cache():
     """
-    Test tugagach yoki XP o'zgargach leaderboard cache tozalanadi.
-    tests_app/tasks.py da chaqiriladi.
+    Reyting doskalarini to'liq qayta qurishga majburlash (admin, ma'lumot tuzatish).
+    Oddiy test natijalari uchun kerak emas — ular ranking.record_test_result
+    orqali inkremental qo'shiladi.
     """
-    cache.delete('leaderboard:global')
-    cache.delete('leaderboard:weekly')
-    cache.delete('leaderboard:monthly')
-    logger.info("Leaderboard cache tozalandi")
+    from .ranking import GLOBAL_BOARD, drop_board, month_board, week_board
+
+    for board in (GLOBAL_BOARD, week_board(), month_board()):
+        drop_board(board)
+    logger.info("Leaderboard doskalari tozalandi")
 
 
 @shared_task
 def warm_leaderboard_cache():
     """
-    Celery beat bilan har 10 daqiqada leaderboard ni qayta hisoblash.
-    Foydalanuvchi kirganida tayyor natija topadi — kutmaydi.
+    Celery beat bilan har 10 daqiqada:
+    - joriy global/hafta/oy doskalari Redis'da borligini ta'minlash
+      (yangi hafta/oy boshlanganda foydalanuvchi kutib qolmaydi)
+    - testdan tashqari manbalardan (battle, musobaqa, kunlik bonus) olingan
+      XP ni global doskaga sinxronlash — faqat yaqinda faol bo'lganlar
     """
     from accounts.models import User
-    from tests_app.models import TestAttempt
-    from django.db.models import Sum, Count
     from django.utils import timezone
     from datetime import timedelta
+    from .ranking import GLOBAL_BOARD, ensure_board, month_board, sync_user_xp, week_board
 
-    # Global
-    users = list(
-        User.objects.filter(is_active=True)
-        .only('id', 'first_name', 'last_name', 'phone_number', 'xp_points', 'level', 'avatar', 'global_rank', 'region', 'total_tests_taken')
-        .order_by('-xp_points')[:100]
-    )
-    cache.set('leaderboard:global', users, LEADERBOARD_CACHE_TTL)
-
-    # Weekly
-    today = timezone.now().date()
-    week_start = today - timedelta(days=today.weekday())
-    weekly_raw = list(
-        TestAttempt.objects.filter(started_at__date__gte=week_start, status='completed')
-        .values('user').annotate(total_xp=Sum('xp_earned'), tests_count=Count('id'))
-        .order_by('-total_xp')[:100]
-    )
-    user_ids = [u['user'] for u in weekly_raw]
-    users_map = {
-        u.id: u for u in User.objects.filter(id__in=user_ids)
-        .only('id', 'first_name', 'last_name', 'phone_number', 'xp_points', 'level', 'avatar')
-    }
-    weekly = [
-        {'rank': i + 1, 'user': users_map[e['user']], 'xp': e['total_xp'], 'tests': e['tests_count']}
-        for i, e in enumerate(weekly_raw) if e['user'] in users_map
-    ]
-    cache.set('leaderboard:weekly', weekly, LEADERBOARD_CACHE_TTL)
+    for board in (GLOBAL_BOARD, week_board(), month_board()):
+        ensure_board(board)
 
-    # Monthly
-    month_start = today.replace(day=1)
-    monthly_raw = list(
-        TestAttempt.objects.filter(started_at__date__gte=month_start, status='completed')
-        .values('user').annotate(total_xp=Sum('xp_earned'), tests_count=Count('id'))
-        .order_by('-total_xp')[:100]
+    since = timezone.now() - timedelta(seconds=XP_SYNC_WINDOW)
+    pairs = list(
+        User.objects.filter(is_active=True, last_online__gte=since)
+        .values_list('id', 'xp_points')
     )
-    user_ids = [u['user'] for u in monthly_raw]
-    users_map = {
-        u.id: u for u in User.objects.filter(id__in=user_ids)
-        .only('id', 'first_name', 'last_name', 'phone_number', 'xp_points', 'level', 'avatar')
-    }
-    monthly = [
-        {'rank': i + 1, 'user': users_map[e['user']], 'xp': e['total_xp'], 'tests': e['tests_count']}
-        for i, e in enumerate(monthly_raw) if e['user'] in users_map
-    ]
-    cache.set('leaderboard:monthly', monthly, LEADERBOARD_CACHE_TTL)
+    sync_user_xp(pairs)
 
-    logger.info("Leaderboard cache yangilandi")
+    logger.info(f"Leaderboard doskalari yangilandi: {len(pairs)} ta XP sinxronlandi")
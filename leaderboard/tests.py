@@ -1,3 +1,67 @@
-from django.test import TestCase
+"""
+TestMakon.uz - Leaderboard Tests
+Reyting engine (ranking.py) — Redis'siz (DB) yo'l uchun testlar
+"""
 
-# Create your tests here.
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from tests_app.models import Subject, Test, TestAttempt
+
+from . import ranking
+
+User = get_user_model()
+
+
+class RankingEngineTest(TestCase):
+    """Doska qatorlari, rank va atrofdagilar"""
+
+    def setUp(self):
+        self.subject = Subject.objects.create(name='Fizika', slug='fizika')
+        self.test = Test.objects.create(title='Fizika test', slug='fizika-test', subject=self.subject)
+        self.users = []
+        for i, xp in enumerate([300, 100, 500, 200]):
+            user = User.objects.create_user(
+                phone_number=f'+99890000000{i}', password='testpass123', first_name=f'User{i}',
+            )
+            User.objects.filter(id=user.id).update(xp_points=xp)
+            TestAttempt.objects.create(user=user, test=self.test, status='completed', xp_earned=xp)
+            self.users.append(user)
+
+    def test_board_names(self):
+        self.assertEqual(ranking.week_board(date(2026, 1, 1)), 'week:2026-W01')
+        self.assertEqual(ranking.month_board(date(2026, 3, 15)), 'month:2026-03')
+        self.assertEqual(ranking.subject_board(7), 'subject:7')
+
+    def test_global_order_and_rank(self):
+        """Global doska XP bo'yicha kamayish tartibida"""
+        ids = [uid for _, uid, _, _ in ranking.top_entries(ranking.GLOBAL_BOARD)]
+        self.assertEqual(ids, [self.users[2].id, self.users[0].id, self.users[3].id, self.users[1].id])
+        self.assertEqual(ranking.user_rank(ranking.GLOBAL_BOARD, self.users[3].id), (3, 200))
+
+    def test_subject_board_counts_tests(self):
+        entries = ranking.leaderboard_entries(ranking.subject_board(self.subject.id))
+        self.assertEqual(entries[0]['user'], self.users[2])
+        self.assertEqual((entries[0]['xp'], entries[0]['tests']), (500, 1))
+
+    def test_every_incremental_board_expires(self):
+        """ZINCRBY doskalari TTL bilan — eskirgach DB dan qayta quriladi"""
+        for board in (ranking.week_board(), ranking.month_board(), ranking.subject_board(self.subject.id)):
+            self.assertTrue(ranking._board_ttl(board))
+
+    def test_neighbours_and_ranks_for(self):
+        around = ranking.neighbours(ranking.GLOBAL_BOARD, self.users[1].id, radius=1)
+        self.assertEqual([rank for rank, _, _, _ in around], [3, 4])
+        ranks = ranking.ranks_for(ranking.GLOBAL_BOARD, [self.users[0].id, self.users[1].id])
+        self.assertEqual(ranks, {self.users[0].id: 2, self.users[1].id: 4})
+
+    def test_api_my_rank(self):
+        """api_my_rank istalgan foydalanuvchi uchun rank va atrofdagilarni qaytaradi"""
+        client = Client()
+        client.login(username=self.users[1].phone_number, password='testpass123')
+        data = client.get(reverse('leaderboard:api_my_rank')).json()
+        self.assertEqual(data['global_rank'], 4)
+        self.assertTrue(data['neighbours'][-1]['is_me'])
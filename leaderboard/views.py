@@ -7,7 +7,6 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.utils import timezone
 from django.db.models import Sum, Count, Avg
-from django.core.cache import cache
 from datetime import timedelta
 
 from .models import (
@@ -16,6 +15,15 @@ from .models import (
 )
 from accounts.models import User
 from tests_app.models import Subject, TestAttempt
+from . import ranking
+
+
+def _my_global_rank(request):
+    """Sidebar uchun joriy foydalanuvchining global o'rni (ZREVRANK, O(log n))"""
+    if not request.user.is_authenticated:
+        return None
+    rank, _ = ranking.user_rank(ranking.GLOBAL_BOARD, request.user.id)
+    return rank
 
 
 def leaderboard_main(request):
@@ -32,9 +40,7 @@ def leaderboard_main(request):
     subjects = Subject.objects.filter(is_active=True)[:6]
 
     # Foydalanuvchi reytingi
-    user_rank = None
-    if request.user.is_authenticated:
-        user_rank = request.user.global_rank
+    user_rank = _my_global_rank(request)
 
     context = {
         'weekly_top': weekly_top,
@@ -46,18 +52,11 @@ def leaderboard_main(request):
 
 
 def global_leaderboard(request):
-    """Umumiy reyting — Redis cache (10 daqiqa)"""
-    users = cache.get('leaderboard:global')
-    if users is None:
-        users = list(
-            User.objects.filter(is_active=True)
-            .only('id', 'first_name', 'last_name', 'phone_number', 'xp_points', 'level', 'avatar', 'global_rank', 'region', 'total_tests_taken')
-            .order_by('-xp_points')[:100]
-        )
-        cache.set('leaderboard:global', users, 60 * 10)
+    """Umumiy reyting — Redis ZSET (ranking engine)"""
+    users = [entry['user'] for entry in ranking.leaderboard_entries(ranking.GLOBAL_BOARD, limit=100)]
 
     subjects = Subject.objects.filter(is_active=True)
-    user_rank = request.user.global_rank if request.user.is_authenticated else None
+    user_rank = _my_global_rank(request)
 
     context = {
         'users': users,
@@ -70,33 +69,14 @@ def global_leaderboard(request):
 
 
 def weekly_leaderboard(request):
-    """Haftalik reyting — Redis cache (10 daqiqa)"""
-    today = timezone.now().date()
+    """Haftalik reyting — Redis ZSET (joriy ISO hafta)"""
+    today = timezone.localdate()
     week_start = today - timedelta(days=today.weekday())
 
-    leaderboard = cache.get('leaderboard:weekly')
-    if leaderboard is None:
-        top_users = TestAttempt.objects.filter(
-            started_at__date__gte=week_start,
-            status='completed'
-        ).values('user').annotate(
-            total_xp=Sum('xp_earned'),
-            tests_count=Count('id')
-        ).order_by('-total_xp')[:100]
-
-        user_ids = [u['user'] for u in top_users]
-        users_map = {
-            u.id: u for u in User.objects.filter(id__in=user_ids)
-            .only('id', 'first_name', 'last_name', 'phone_number', 'xp_points', 'level', 'avatar')
-        }
-        leaderboard = [
-            {'rank': i, 'user': users_map[e['user']], 'xp': e['total_xp'], 'tests': e['tests_count']}
-            for i, e in enumerate(top_users, 1) if e['user'] in users_map
-        ]
-        cache.set('leaderboard:weekly', leaderboard, 60 * 10)
+    leaderboard = ranking.leaderboard_entries(ranking.week_board(today), limit=100)
 
     subjects = Subject.objects.filter(is_active=True)
-    user_rank = request.user.global_rank if request.user.is_authenticated else None
+    user_rank = _my_global_rank(request)
 
     context = {
         'leaderboard': leaderboard,
@@ -110,33 +90,14 @@ def weekly_leaderboard(request):
 
 
 def monthly_leaderboard(request):
-    """Oylik reyting — Redis cache (10 daqiqa)"""
-    today = timezone.now().date()
+    """Oylik reyting — Redis ZSET (joriy oy)"""
+    today = timezone.localdate()
     month_start = today.replace(day=1)
 
-    leaderboard = cache.get('leaderboard:monthly')
-    if leaderboard is None:
-        top_users = TestAttempt.objects.filter(
-            started_at__date__gte=month_start,
-            status='completed'
-        ).values('user').annotate(
-            total_xp=Sum('xp_earned'),
-            tests_count=Count('id')
-        ).order_by('-total_xp')[:100]
-
-        user_ids = [u['user'] for u in top_users]
-        users_map = {
-            u.id: u for u in User.objects.filter(id__in=user_ids)
-            .only('id', 'first_name', 'last_name', 'phone_number', 'xp_points', 'level', 'avatar')
-        }
-        leaderboard = [
-            {'rank': i, 'user': users_map[e['user']], 'xp': e['total_xp'], 'tests': e['tests_count']}
-            for i, e in enumerate(top_users, 1) if e['user'] in users_map
-        ]
-        cache.set('leaderboard:monthly', leaderboard, 60 * 10)
+    leaderboard = ranking.leaderboard_entries(ranking.month_board(today), limit=100)
 
     subjects = Subject.objects.filter(is_active=True)
-    user_rank = request.user.global_rank if request.user.is_authenticated else None
+    user_rank = _my_global_rank(request)
 
     context = {
         'leaderboard': leaderboard,
@@ -153,27 +114,7 @@ def subject_leaderboard(request, slug):
     """Fan bo'yicha reyting"""
     subject = get_object_or_404(Subject, slug=slug, is_active=True)
 
-    top_users = TestAttempt.objects.filter(
-        test__subject=subject,
-        status='completed'
-    ).values('user').annotate(
-        total_xp=Sum('xp_earned'),
-        tests_count=Count('id')
-    ).order_by('-total_xp')[:100]
-
-    user_ids = [u['user'] for u in top_users]
-    users = {u.id: u for u in User.objects.filter(id__in=user_ids)}
-
-    leaderboard = []
-    for i, entry in enumerate(top_users, 1):
-        user = users.get(entry['user'])
-        if user:
-            leaderboard.append({
-                'rank': i,
-                'user': user,
-                'xp': entry['total_xp'],
-                'tests': entry['tests_count'],
-            })
+    leaderboard = ranking.leaderboard_entries(ranking.subject_board(subject.id), limit=100)
 
     # Barcha fanlar
     subjects = Subject.objects.filter(is_active=True)
@@ -207,7 +148,7 @@ def achievements_list(request):
         ).values_list('achievement_id', flat=True))
 
     subjects = Subject.objects.filter(is_active=True)
-    user_rank = request.user.global_rank if request.user.is_authenticated else None
+    user_rank = _my_global_rank(request)
 
     context = {
         'by_category': by_category,
@@ -289,7 +230,7 @@ def my_stats(request):
     ]
 
     all_subjects = Subject.objects.filter(is_active=True)
-    user_rank = user.global_rank
+    user_rank = _my_global_rank(request)
 
     context = {
         'stats': stats,
@@ -356,19 +297,24 @@ def api_my_rank(request):
     """Mening reytingim API"""
     user = request.user
 
-    # Umumiy reyting
-    higher_count = User.objects.filter(
-        xp_points__gt=user.xp_points,
-        is_active=True
-    ).count()
+    global_rank, _ = ranking.user_rank(ranking.GLOBAL_BOARD, user.id)
+    weekly_rank, weekly_xp = ranking.user_rank(ranking.week_board(), user.id)
 
-    global_rank = higher_count + 1
+    # Atrofdagilar: yuqorida va pastda 2 tadan
+    around = ranking.neighbours(ranking.GLOBAL_BOARD, user.id, radius=2)
+    names = dict(User.objects.filter(id__in=[uid for _, uid, _, _ in around]).values_list('id', 'first_name'))
 
     data = {
         'global_rank': global_rank,
+        'weekly_rank': weekly_rank,
+        'weekly_xp': weekly_xp,
         'xp': user.xp_points,
         'level': user.level,
         'streak': user.current_streak,
+        'neighbours': [
+            {'rank': rank, 'id': uid, 'name': names.get(uid, ''), 'xp': xp, 'is_me': uid == user.id}
+            for rank, uid, xp, _ in around
+        ],
     }
 
     return JsonResponse(data)
@@ -398,8 +344,12 @@ def friends_leaderboard(request):
         .only('id', 'first_name', 'last_name', 'phone_number', 'xp_points', 'level', 'avatar', 'current_streak', 'total_tests_taken')
         .order_by('-xp_points')
     )
-    # Rank berish
-    ranked = [{'rank': i, 'user': u, 'is_me': u.id == request.user.id} for i, u in enumerate(friends, 1)]
+    # Rank berish (do'stlar ichida + umumiy reytingdagi o'rni)
+    global_ranks = ranking.ranks_for(ranking.GLOBAL_BOARD, [u.id for u in friends])
+    ranked = [
+        {'rank': i, 'user': u, 'is_me': u.id == request.user.id, 'global_rank': global_ranks.get(u.id)}
+        for i, u in enumerate(friends, 1)
+    ]
     my_rank = next((r['rank'] for r in ranked if r['is_me']), None)
 
     context = {
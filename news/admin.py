@@ -68,27 +68,21 @@ class NotificationAdmin(admin.ModelAdmin):
         return custom_urls + super().get_urls()
 
     def send_bulk_view(self, request):
-        from accounts.models import User
-
         if request.method == 'POST':
             form = BulkNotificationForm(request.POST)
             if form.is_valid():
-                qs = User.objects.all()
-                if form.cleaned_data.get('only_active'):
-                    qs = qs.filter(is_active=True)
-
-                from news.tasks import send_bulk_notifications
-                user_ids = list(qs.values_list('id', flat=True))
-                send_bulk_notifications.delay(
-                    user_ids=user_ids,
+                from news.fanout import audience, start_broadcast
+                target = 'all' if form.cleaned_data.get('only_active') else 'everyone'
+                start_broadcast(
                     title=form.cleaned_data['title'],
                     message=form.cleaned_data['message'],
                     notification_type=form.cleaned_data['notification_type'],
                     link=form.cleaned_data.get('link', ''),
+                    target=target,
                 )
                 self.message_user(
                     request,
-                    f'✅ {len(user_ids)} ta foydalanuvchiga bildirishnoma navbatga qo\'yildi (background)!',
+                    f'✅ {audience(target).count()} ta foydalanuvchiga bildirishnoma navbatga qo\'yildi (background)!',
                     messages.SUCCESS
                 )
                 return redirect('../')
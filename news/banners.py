@@ -0,0 +1,65 @@
+"""
+TestMakon.uz - System Banner Schedule
+Faol bannerlar — jarayon xotirasida vaqt bo'yicha jadval.
+"""
+
+import threading
+from datetime import timedelta
+
+from django.utils import timezone
+
+BANNER_SCHEDULE_TTL = 30            # soniya
+
+_lock = threading.Lock()
+_schedule = {
+    'banners': None,                # barcha faol bannerlar (order bo'yicha)
+    'expires_at': None,             # jadvalni DB dan qayta yuklash vaqti
+    'active': [],                   # hozir ko'rinadigan bannerlar
+    'valid_until': None,            # active ro'yxat shu paytgacha to'g'ri
+}
+
+
+def _is_live(banner, now):
+    return (banner.start_date is None or banner.start_date <= now) and \
+           (banner.end_date is None or banner.end_date >= now)
+
+
+def next_boundary(banners, now):
+    """Ko'rinadigan bannerlar to'plami keyingi o'zgaradigan vaqt (yoki None)"""
+    points = []
+    for banner in banners:
+        if banner.start_date and banner.start_date > now:
+            points.append(banner.start_date)
+        if banner.end_date and banner.end_date >= now:
+            # end_date__gte — tugash paytida hali ko'rinadi
+            points.append(banner.end_date + timedelta(microseconds=1))
+    return min(points) if points else None
+
+
+def _load(now):
+    from .models import SystemBanner
+    banners = list(SystemBanner.objects.filter(is_active=True).order_by('order', '-created_at'))
+    _schedule['banners'] = banners
+    _schedule['expires_at'] = now + timedelta(seconds=BANNER_SCHEDULE_TTL)
+    _schedule['valid_until'] = None
+
+
+def active_banners(now=None):
+    """Hozir ko'rinadigan bannerlar ro'yxati (odatda DB so'rovsiz)"""
+    now = now or timezone.now()
+    with _lock:
+        if _schedule['banners'] is None or now >= _schedule['expires_at']:
+            _load(now)
+        valid_until = _schedule['valid_until']
+        if valid_until is None or now >= valid_until:
+            banners = _schedule['banners']
+            _schedule['active'] = [b for b in banners if _is_live(b, now)]
+            boundary = next_boundary(banners, now)
+            _schedule['valid_until'] = min(boundary, _schedule['expires_at']) if boundary else _schedule['expires_at']
+        return _schedule['active']
+
+
+def reset_schedule():
+    """Jadvalni tashlash — keyingi renderda DB dan yuklanadi"""
+    with _lock:
+        _schedule['banners'] = None
@@ -0,0 +1,163 @@
+"""
+TestMakon.uz - Notification Fan-out
+Ommaviy bildirishnoma (admin_broadcast, admin "send bulk") — background pipeline.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+FANOUT_BATCH = 5000
+FANOUT_STATUS_TTL = 60 * 60 * 6     # 6 soat
+TARGETS = ('all', 'premium', 'free', 'everyone')
+NOTIFICATION_TYPES = ('system', 'news', 'competition', 'battle', 'achievement', 'friend', 'reminder')
+
+
+def _status_key(job_id):
+    return f'broadcast:{job_id}'
+
+
+def get_status(job_id):
+    return cache.get(_status_key(job_id))
+
+
+def _save_status(status):
+    cache.set(_status_key(status['job_id']), status, FANOUT_STATUS_TTL)
+
+
+def audience(target='all'):
+    """
+    Qabul qiluvchilar: all — faol userlar, premium / free — faol obunasi bor/yo'q
+    faol userlar, everyone — barcha userlar (faol bo'lmaganlar ham).
+    """
+    from accounts.models import User
+
+    if target == 'everyone':
+        return User.objects.all()
+    qs = User.objects.filter(is_active=True)
+    if target in ('premium', 'free'):
+        try:
+            from subscriptions.models import Subscription
+            premium_ids = Subscription.objects.filter(is_active=True).values('user_id')
+            qs = qs.filter(id__in=premium_ids) if target == 'premium' else qs.exclude(id__in=premium_ids)
+        except Exception:
+            pass
+    return qs
+
+
+# ============================================================
+# YETKAZISH
+# ============================================================
+
+def deliver(user_ids, title, message, notification_type='system', link=''):
+    """
+    Bir sahifa userlarga bildirishnoma yozish, inbox'larni tashlash va
+    online bo'lganlarga push. Returns: (yaratilgan, push qilingan).
+    """
+    from accounts.presence import online_ids
+    from .inbox import invalidate
+    from .models import Notification
+
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            user_id=uid,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            link=link or '',
+        )
+        for uid in user_ids
+    ])
+    invalidate(*user_ids)  # bulk_create signal bermaydi
+
+    online = online_ids(user_ids)
+    pushed = push_many([n for n in notifications if n.user_id in online])
+    return len(notifications), pushed
+
+
+def push_many(notifications):
+    """user_<id> guruhlariga push.notification — bitta event loop kirishida"""
+    if not notifications:
+        return 0
+    try:
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from .signals import push_event
+
+        channel_layer = get_channel_layer()
+        if not channel_layer:
+            return 0
+
+        async def send_all():
+            await asyncio.gather(*[
+                channel_layer.group_send(f'user_{n.user_id}', push_event(n))
+                for n in notifications
+            ])
+
+        async_to_sync(send_all)()
+        return len(notifications)
+    except Exception as e:
+        # WS ishlamasa ham bildirishnomalar DB da qoladi
+        logger.warning(f'Fan-out push xatosi: {e}')
+        return 0
+
+
+# ============================================================
+# JOB
+# ============================================================
+
+def start_broadcast(title, message, notification_type='system', link='', target='all'):
+    """Job yaratish va task'ni navbatga qo'yish. Returns: job_id"""
+    from .tasks import fanout_notifications
+
+    if notification_type not in NOTIFICATION_TYPES:
+        notification_type = 'system'
+    if target not in TARGETS:
+        target = 'all'
+
+    job_id = uuid.uuid4().hex
+    _save_status({
+        'job_id': job_id,
+        'status': 'queued',
+        'target': target,
+        'total': None,
+        'sent': 0,
+        'pushed': 0,
+    })
+    fanout_notifications.delay(job_id, title, message, notification_type, link, target)
+    return job_id
+
+
+def run_fanout(job_id, title, message, notification_type='system', link='', target='all'):
+    """Keyset pagination bilan barcha qabul qiluvchilarga yetkazish"""
+    status = get_status(job_id) or {'job_id': job_id, 'sent': 0, 'pushed': 0}
+    qs = audience(target)
+    status.update(status='running', total=qs.count(), started_at=time.time())
+    _save_status(status)
+
+    last_id = 0
+    try:
+        while True:
+            user_ids = list(
+                qs.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:FANOUT_BATCH]
+            )
+            if not user_ids:
+                break
+            sent, pushed = deliver(user_ids, title, message, notification_type, link)
+            status['sent'] += sent
+            status['pushed'] += pushed
+            last_id = user_ids[-1]
+            _save_status(status)
+        status['status'] = 'done'
+    except Exception as e:
+        logger.exception(f'Fan-out xato ({job_id})')
+        status.update(status='failed', error=str(e))
+
+    status['finished_at'] = time.time()
+    _save_status(status)
+    return status
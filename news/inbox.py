@@ -0,0 +1,139 @@
+"""
+TestMakon.uz - Notification Inbox Cache
+Har bir user uchun bildirishnoma hisoblagichlari va oxirgilar ro'yxati.
+"""
+
+import json
+
+from django.core.cache import cache
+from django.utils.dateparse import parse_datetime
+
+from core.redis_client import get_redis, redis_key
+
+INBOX_TTL = 60 * 60                 # 1 soat
+RECENT_LIMIT = 8                    # api_notifications_recent uchun; sahifa 5 tasini ko'rsatadi
+
+
+def _hash_key(user_id):
+    return redis_key(f'inbox:{user_id}')
+
+
+def _recent_key(user_id):
+    return redis_key(f'inbox:{user_id}:recent')
+
+
+def _local_key(user_id):
+    return f'inbox:{user_id}'
+
+
+def _serialize(notification):
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'link': notification.link or '',
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def _deserialize(item):
+    item = dict(item)
+    item['created_at'] = parse_datetime(item['created_at'])
+    return item
+
+
+def _load(user_id):
+    """DB dan inbox: (unread, pending_friends, recent)"""
+    from accounts.models import Friendship
+    from .models import Notification
+
+    unread = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    recent = [
+        _serialize(n)
+        for n in Notification.objects.filter(user_id=user_id).order_by('-created_at')[:RECENT_LIMIT]
+    ]
+    friends = Friendship.objects.filter(to_user_id=user_id, status='pending').count()
+    return unread, friends, recent
+
+
+# ============================================================
+# O'QISH
+# ============================================================
+
+def get_inbox(user_id):
+    """{'unread', 'pending_friends', 'recent': [dict, ...]} — odatda DB so'rovsiz"""
+    r = get_redis()
+    if r is None:
+        inbox = cache.get(_local_key(user_id))
+        if inbox is None:
+            unread, friends, recent = _load(user_id)
+            inbox = {'unread': unread, 'pending_friends': friends, 'recent': recent}
+            cache.set(_local_key(user_id), inbox, INBOX_TTL)
+    else:
+        pipe = r.pipeline(transaction=False)
+        pipe.hgetall(_hash_key(user_id))
+        pipe.lrange(_recent_key(user_id), 0, RECENT_LIMIT - 1)
+        fields, items = pipe.execute()
+        if b'built' in fields and b'friends' in fields:
+            inbox = {
+                'unread': max(0, int(fields.get(b'unread', 0))),
+                'pending_friends': int(fields[b'friends']),
+                'recent': [json.loads(item) for item in items],
+            }
+        else:
+            inbox = _rebuild(r, user_id)
+
+    return {**inbox, 'recent': [_deserialize(item) for item in inbox['recent']]}
+
+
+def _rebuild(r, user_id):
+    unread, friends, recent = _load(user_id)
+    pipe = r.pipeline()
+    pipe.delete(_hash_key(user_id), _recent_key(user_id))
+    pipe.hset(_hash_key(user_id), mapping={'unread': unread, 'friends': friends, 'built': 1})
+    if recent:
+        pipe.rpush(_recent_key(user_id), *[json.dumps(item) for item in recent])
+    pipe.expire(_hash_key(user_id), INBOX_TTL)
+    pipe.expire(_recent_key(user_id), INBOX_TTL)
+    pipe.execute()
+    return {'unread': unread, 'pending_friends': friends, 'recent': recent}
+
+
+# ============================================================
+# YOZISH
+# ============================================================
+
+def notification_created(notification):
+    """Yangi bildirishnoma — qurilgan inbox'ga darhol qo'shiladi"""
+    user_id = notification.user_id
+    r = get_redis()
+    if r is None:
+        cache.delete(_local_key(user_id))
+        return
+    if not r.exists(_hash_key(user_id)):
+        return
+    pipe = r.pipeline()
+    if not notification.is_read:
+        pipe.hincrby(_hash_key(user_id), 'unread', 1)
+    pipe.lpush(_recent_key(user_id), json.dumps(_serialize(notification)))
+    pipe.ltrim(_recent_key(user_id), 0, RECENT_LIMIT - 1)
+    # Kalit shu orada o'chgan bo'lsa ham TTL siz qolmasin (to'liq bo'lmagan hash o'qishda qayta quriladi)
+    pipe.expire(_hash_key(user_id), INBOX_TTL, nx=True)
+    pipe.expire(_recent_key(user_id), INBOX_TTL, nx=True)
+    pipe.execute()
+
+
+def invalidate(*user_ids):
+    """Inbox'ni tashlash (o'qildi, o'chirildi, do'stlik so'rovi o'zgardi, bulk_create)"""
+    user_ids = [uid for uid in user_ids if uid]
+    if not user_ids:
+        return
+    r = get_redis()
+    if r is None:
+        cache.delete_many([_local_key(uid) for uid in user_ids])
+        return
+    keys = [key for uid in user_ids for key in (_hash_key(uid), _recent_key(uid))]
+    for start in range(0, len(keys), 1000):
+        r.delete(*keys[start:start + 1000])
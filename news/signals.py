@@ -3,32 +3,82 @@ News Signals
 Notification modeliga yangi yozuv qo'shilganda WebSocket orqali
 foydalanuvchining brauzeriga real-time xabar yuboradi.
 Celery task, view, yoki istalgan joydan ishlaydi.
+Shuningdek bildirishnoma inbox cache'ini (news.inbox) va banner jadvalini
+(news.banners) yangilab turadi.
 """
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from . import inbox
+from .banners import reset_schedule
+
+
+@receiver(post_save, sender='news.SystemBanner')
+@receiver(post_delete, sender='news.SystemBanner')
+def refresh_banner_schedule(sender, **kwargs):
+    """Banner o'zgarsa — shu jarayondagi jadval darhol qayta yuklanadi"""
+    reset_schedule()
+
+
+@receiver(post_save, sender='news.Notification')
+def sync_notification_inbox(sender, instance, created, **kwargs):
+    """Yangi bildirishnoma inbox'ga yoziladi, o'zgargani (o'qildi) inbox'ni tashlaydi"""
+    if created:
+        inbox.notification_created(instance)
+    else:
+        inbox.invalidate(instance.user_id)
+
+
+@receiver(post_delete, sender='news.Notification')
+def drop_notification_inbox(sender, instance, **kwargs):
+    inbox.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender='accounts.Friendship')
+@receiver(post_delete, sender='accounts.Friendship')
+def drop_friend_requests_inbox(sender, instance, **kwargs):
+    """Do'stlik so'rovi yuborildi/qabul qilindi/o'chirildi — kutilayotganlar soni o'zgaradi"""
+    inbox.invalidate(instance.to_user_id)
+
+
+NOTIFICATION_ICONS = {
+    'system':      'gear-fill',
+    'news':        'newspaper',
+    'competition': 'trophy-fill',
+    'battle':      'lightning-charge-fill',
+    'achievement': 'award-fill',
+    'friend':      'person-plus-fill',
+    'reminder':    'bell-fill',
+}
+
+
+def push_event(instance):
+    """user_<id> guruhiga yuboriladigan push.notification xabari"""
+    return {
+        'type': 'push.notification',
+        'notification': {
+            'id':    instance.id,
+            'title': instance.title,
+            'message': instance.message,
+            'notification_type': instance.notification_type,
+            'icon':  NOTIFICATION_ICONS.get(instance.notification_type, 'bell-fill'),
+            'link':  instance.link or '',
+            'created_at': instance.created_at.isoformat(),
+        },
+    }
+
 
 @receiver(post_save, sender='news.Notification')
 def push_notification_via_websocket(sender, instance, created, **kwargs):
     """
     Yangi Notification yaratilganda WS orqali yuborish.
     Faqat yangi yaratilganlar — update qilinganlarda ishlamaydi.
+    bulk_create signal bermaydi — ommaviy yuborish news.fanout orqali push qiladi.
     """
     if not created:
         return
 
-    # icon mapping
-    icon_map = {
-        'system':      'gear-fill',
-        'news':        'newspaper',
-        'competition': 'trophy-fill',
-        'battle':      'lightning-charge-fill',
-        'achievement': 'award-fill',
-        'friend':      'person-plus-fill',
-        'reminder':    'bell-fill',
-    }
-
     try:
         from asgiref.sync import async_to_sync
         from channels.layers import get_channel_layer
@@ -37,21 +87,7 @@ def push_notification_via_websocket(sender, instance, created, **kwargs):
         if not channel_layer:
             return
 
-        async_to_sync(channel_layer.group_send)(
-            f'user_{instance.user_id}',
-            {
-                'type': 'push.notification',
-                'notification': {
-                    'id':    instance.id,
-                    'title': instance.title,
-                    'message': instance.message,
-                    'notification_type': instance.notification_type,
-                    'icon':  icon_map.get(instance.notification_type, 'bell-fill'),
-                    'link':  instance.link or '',
-                    'created_at': instance.created_at.isoformat(),
-                },
-            }
-        )
+        async_to_sync(channel_layer.group_send)(f'user_{instance.user_id}', push_event(instance))
     except Exception:
         # WS ishlamasa ham notification DB da qoladi — xato chiqarmaymiz
         pass
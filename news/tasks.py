@@ -7,25 +7,29 @@ logger = logging.getLogger(__name__)
 @shared_task(bind=True)
 def send_bulk_notifications(self, user_ids, title, message, notification_type, link=''):
     """
-    Barcha foydalanuvchilarga bildirishnoma yuborish.
-    Admin paneldan chaqirilganda request ni bloklamas — background'da ishlaydi.
+    Berilgan userlarga bildirishnoma yuborish (eski navbatdagi xabarlar uchun qoldirilgan).
+    Yangi kod news.fanout.start_broadcast() dan foydalanadi.
     """
-    from news.models import Notification
+    from news.fanout import FANOUT_BATCH, deliver
 
     try:
-        users_chunk = user_ids  # list of IDs
-        notifs = [
-            Notification(
-                user_id=uid,
-                title=title,
-                message=message,
-                notification_type=notification_type,
-                link=link or '',
-            )
-            for uid in users_chunk
-        ]
-        Notification.objects.bulk_create(notifs, batch_size=500, ignore_conflicts=True)
-        logger.info(f"Bulk notification yuborildi: {len(notifs)} ta")
+        sent = 0
+        for start in range(0, len(user_ids), FANOUT_BATCH):
+            created, _ = deliver(user_ids[start:start + FANOUT_BATCH], title, message, notification_type, link)
+            sent += created
+        logger.info(f"Bulk notification yuborildi: {sent} ta")
     except Exception as exc:
         logger.error(f"send_bulk_notifications xato: {exc}")
         raise self.retry(exc=exc, countdown=30)
+
+
+@shared_task(time_limit=60 * 30)
+def fanout_notifications(job_id, title, message, notification_type='system', link='', target='all'):
+    """
+    Ommaviy bildirishnoma (admin_broadcast) — keyset pagination bilan yozish
+    va online userlarga push. Jarayon: news.fanout.get_status(job_id).
+    """
+    from news.fanout import run_fanout
+    status = run_fanout(job_id, title, message, notification_type, link, target)
+    logger.info(f"fanout_notifications {job_id}: {status['status']}, {status['sent']} yozildi, {status['pushed']} push")
+    return status
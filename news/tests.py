@@ -578,3 +578,133 @@ class ApiUnreadCountViewTest(TestCase):
             )
         self.client.login(username='testuser', password='pass1234')
         self.assertEqual(self.client.get(self.url).json()['count'], 0)
+
+
+# ============================================================
+# INBOX CACHE
+# ============================================================
+
+class NotificationInboxTest(TestCase):
+    """news.inbox — sahifa renderida bildirishnoma so'rovlari takrorlanmaydi"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(phone_number='+998901110000', password='pass1234')
+        self.other = User.objects.create_user(phone_number='+998901110001', password='pass1234')
+        self.client.login(username='+998901110000', password='pass1234')
+
+    def notify(self, title='x', **kwargs):
+        return Notification.objects.create(
+            user=self.user, notification_type='system', title=title, message='x', **kwargs
+        )
+
+    def test_cached_inbox_skips_queries(self):
+        """Ikkinchi o'qish DB ga bormaydi"""
+        from .inbox import get_inbox
+        self.notify()
+        get_inbox(self.user.id)
+        with self.assertNumQueries(0):
+            inbox = get_inbox(self.user.id)
+        self.assertEqual(inbox['unread'], 1)
+        self.assertEqual(inbox['recent'][0]['title'], 'x')
+
+    def test_new_notification_and_mark_all_read_update_counts(self):
+        """Yangi bildirishnoma va "hammasini o'qish" hisoblagichga darhol ta'sir qiladi"""
+        url = reverse('news:api_notifications_recent')
+        self.assertEqual(self.client.get(url).json()['unread_count'], 0)
+        self.notify('yangi')
+        data = self.client.get(url).json()
+        self.assertEqual(data['unread_count'], 1)
+        self.assertEqual(data['notifications'][0]['title'], 'yangi')
+
+        self.client.get(reverse('news:notifications_mark_all_read'))
+        self.assertEqual(self.client.get(url).json()['unread_count'], 0)
+
+    def test_friend_request_updates_pending_count(self):
+        """Do'stlik so'rovi kutilayotganlar soniga qo'shiladi"""
+        from accounts.models import Friendship
+        from .inbox import get_inbox
+        self.assertEqual(get_inbox(self.user.id)['pending_friends'], 0)
+        friendship = Friendship.objects.create(from_user=self.other, to_user=self.user, status='pending')
+        self.assertEqual(get_inbox(self.user.id)['pending_friends'], 1)
+        friendship.status = 'accepted'
+        friendship.save()
+        self.assertEqual(get_inbox(self.user.id)['pending_friends'], 0)
+
+
+class BannerScheduleTest(TestCase):
+    """news.banners — faol bannerlar jadvali"""
+
+    def setUp(self):
+        from .banners import reset_schedule
+        reset_schedule()
+        self.addCleanup(reset_schedule)
+        self.now = timezone.now()
+        self.always = SystemBanner.objects.create(message='Doimiy', order=2)
+        self.later = SystemBanner.objects.create(
+            message='Keyinroq', order=1, start_date=self.now + timezone.timedelta(hours=1),
+        )
+        self.ending = SystemBanner.objects.create(
+            message='Tugaydi', order=3, end_date=self.now + timezone.timedelta(minutes=10),
+        )
+        SystemBanner.objects.create(message="O'chiq", is_active=False)
+
+    def test_active_list_is_cached_until_boundary(self):
+        """Ro'yxat keyingi chegaragacha DB so'rovsiz qaytadi"""
+        from .banners import active_banners, next_boundary
+        self.assertEqual(active_banners(self.now), [self.always, self.ending])
+        with self.assertNumQueries(0):
+            self.assertEqual(active_banners(self.now + timezone.timedelta(seconds=5)), [self.always, self.ending])
+        self.assertEqual(
+            next_boundary([self.always, self.later, self.ending], self.now),
+            self.ending.end_date + timezone.timedelta(microseconds=1),
+        )
+
+    def test_save_refreshes_schedule(self):
+        """Banner saqlansa jadval darhol yangilanadi"""
+        from .banners import active_banners
+        active_banners(self.now)
+        self.later.start_date = None
+        self.later.save()
+        self.assertEqual(active_banners(self.now), [self.later, self.always, self.ending])
+
+
+class NotificationFanoutTest(TestCase):
+    """news.fanout — ommaviy bildirishnoma: keyset sahifalar va online userlarga push"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from accounts import presence
+        cache.clear()
+        presence._last_marked.clear()
+        self.users = [
+            User.objects.create_user(phone_number=f'+99890222000{i}', password='pass1234')
+            for i in range(3)
+        ]
+        User.objects.create_user(phone_number='+998902220009', password='pass1234', is_active=False)
+
+    def test_broadcast_creates_rows_and_pushes_to_online_users(self):
+        """Har bir faol userga bitta yozuv, online userga WS push"""
+        from unittest import mock
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from accounts.presence import mark_online
+        from . import fanout
+
+        online = self.users[1]
+        mark_online(online.id)
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'user_{online.id}', channel)
+
+        with mock.patch.object(fanout, 'FANOUT_BATCH', 2):
+            job_id = fanout.start_broadcast('Salom', 'Xabar', 'news', target='all')
+
+        status = fanout.get_status(job_id)
+        self.assertEqual((status['status'], status['total'], status['sent'], status['pushed']), ('done', 3, 3, 1))
+        self.assertEqual(Notification.objects.filter(title='Salom').count(), 3)
+        event = async_to_sync(layer.receive)(channel)
+        self.assertEqual(event['type'], 'push.notification')
+        self.assertEqual(event['notification']['title'], 'Salom')
@@ -8,6 +8,7 @@ from django.http import JsonResponse
 from django.utils import timezone
 
 from .models import Category, Article, ArticleLike, Notification
+from . import inbox
 
 
 def news_list(request):
@@ -136,6 +137,7 @@ def notifications_mark_all_read(request):
     Notification.objects.filter(user=request.user, is_read=False).update(
         is_read=True, read_at=timezone.now()
     )
+    inbox.invalidate(request.user.id)
 
     return redirect('news:notifications_list')
 
@@ -144,7 +146,7 @@ def api_unread_count(request):
     """O'qilmagan bildirishnomalar soni"""
     count = 0
     if request.user.is_authenticated:
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
+        count = inbox.get_inbox(request.user.id)['unread']
     return JsonResponse({'count': count})
 
 
@@ -163,9 +165,7 @@ def api_notification_read(request, id):
 @login_required
 def api_notifications_recent(request):
     """AJAX — oxirgi 8 ta notification (dropdown uchun)"""
-    notifications = Notification.objects.filter(
-        user=request.user
-    ).order_by('-created_at')[:8]
+    user_inbox = inbox.get_inbox(request.user.id)
 
     icon_map = {
         'system': 'gear-fill', 'news': 'newspaper',
@@ -175,32 +175,23 @@ def api_notifications_recent(request):
     }
 
     data = []
-    for n in notifications:
+    for n in user_inbox['recent']:
         data.append({
-            'id': n.id,
-            'title': n.title,
-            'message': n.message,
-            'notification_type': n.notification_type,
-            'icon': icon_map.get(n.notification_type, 'bell-fill'),
-            'link': n.link or '',
-            'is_read': n.is_read,
-            'created_at': n.created_at.isoformat(),
-            'time_ago': _time_ago(n.created_at),
+            'id': n['id'],
+            'title': n['title'],
+            'message': n['message'],
+            'notification_type': n['notification_type'],
+            'icon': icon_map.get(n['notification_type'], 'bell-fill'),
+            'link': n['link'],
+            'is_read': n['is_read'],
+            'created_at': n['created_at'].isoformat(),
+            'time_ago': _time_ago(n['created_at']),
         })
 
-    from accounts.models import Friendship
-    pending_friends = Friendship.objects.filter(
-        to_user=request.user, status='pending'
-    ).count()
-
-    unread_count = Notification.objects.filter(
-        user=request.user, is_read=False
-    ).count()
-
     return JsonResponse({
         'notifications': data,
-        'unread_count': unread_count,
-        'pending_friends': pending_friends,
+        'unread_count': user_inbox['unread'],
+        'pending_friends': user_inbox['pending_friends'],
     })
 
 
@@ -0,0 +1,211 @@
+"""
+TestMakon.uz - Answer Buffer
+test_play_submit uchun write-behind javob jurnali.
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Question, Answer, TestAttempt, AttemptAnswer, UserActivityLog
+from .attempt_snapshot import get_attempt_order
+from .buffer_meta import get_buffer_meta, mark_flushed, meta_keys, needs_flush, touch_buffer
+from .question_stats import record_question_answers
+
+ANSWER_BUFFER_TTL = 60 * 60 * 24          # 1 kun — tugallanmagan urinishlar ham flush bo'ladi
+ANSWER_BUFFER_IDLE_SECONDS = 120          # 2 daqiqa javob bo'lmasa — flush
+ANSWER_BUFFER_MAX_AGE_SECONDS = 300       # 5 daqiqadan eski bufer — flush
+
+
+def _key_map_key(uuid):
+    return f'attempt_key:{uuid}'
+
+
+def _answer_key(uuid, question_id):
+    return f'answer_buf:{uuid}:{question_id}'
+
+
+META_PREFIX = 'answer_buf_meta'
+
+
+# ============================================================
+# JAVOB KALITI (answer key)
+# ============================================================
+
+def load_answer_key(attempt):
+    """
+    Urinish uchun javob kaliti:
+    {'attempt_id', 'user_id', 'test_id', 'questions': {question_id: {'answers': [...], 'correct': [...]}}}
+    """
+    order = get_attempt_order(attempt)
+    correct = {}
+    for question_id, answer_id in Answer.objects.filter(
+        question_id__in=[qid for qid, _ in order], is_correct=True
+    ).order_by('order').values_list('question_id', 'id'):
+        correct.setdefault(question_id, []).append(answer_id)
+
+    answer_key = {
+        'attempt_id': attempt.id,
+        'user_id': attempt.user_id,
+        'test_id': attempt.test_id,
+        'questions': {
+            qid: {'answers': answer_ids, 'correct': correct.get(qid, [])}
+            for qid, answer_ids in order
+        },
+    }
+    cache.set(_key_map_key(attempt.uuid), answer_key, ANSWER_BUFFER_TTL)
+    return answer_key
+
+
+def get_answer_key(uuid, user_id):
+    """Cache'dagi javob kaliti (faqat urinish egasi uchun), bo'lmasa None"""
+    answer_key = cache.get(_key_map_key(uuid))
+    if answer_key is None or answer_key['user_id'] != user_id:
+        return None
+    return answer_key
+
+
+# ============================================================
+# BUFER
+# ============================================================
+
+def buffer_answer(uuid, answer_key, question_id, answer_id, time_spent):
+    """
+    Javobni buferga yozish.
+    Returns: (is_correct, correct_answer_id) yoki savol/javob urinishga tegishli bo'lmasa None.
+    """
+    question = answer_key['questions'].get(question_id)
+    if question is None:
+        return None
+    if answer_id and answer_id not in question['answers']:
+        return None
+
+    is_correct = bool(answer_id) and answer_id in question['correct']
+    now = time.time()
+    cache.set(
+        _answer_key(uuid, question_id),
+        (answer_id or None, is_correct, time_spent, now),
+        ANSWER_BUFFER_TTL,
+    )
+
+    touch_buffer(META_PREFIX, uuid, now, ANSWER_BUFFER_TTL)
+
+    correct_answer_id = question['correct'][0] if question['correct'] else None
+    return is_correct, correct_answer_id
+
+
+def get_buffered_answers(uuid, question_ids):
+    """Buferdagi javoblar: {question_id: (answer_id, is_correct, time_spent, ts)}"""
+    keys = {_answer_key(uuid, qid): qid for qid in question_ids}
+    return {keys[k]: v for k, v in cache.get_many(list(keys)).items()}
+
+
+def flush_attempt_answers(attempt):
+    """
+    Buferdagi javoblarni AttemptAnswer ga bulk yozish (idempotent upsert).
+    Returns: yangi yaratilgan javoblar soni.
+    """
+    if not get_buffer_meta(META_PREFIX, [attempt.uuid]):
+        return 0
+
+    question_ids = [qid for qid, _ in get_attempt_order(attempt)]
+    buffered = get_buffered_answers(attempt.uuid, question_ids)
+    if not buffered:
+        return 0
+
+    existing = {
+        a.question_id: a
+        for a in AttemptAnswer.objects.filter(attempt=attempt, question_id__in=list(buffered))
+    }
+    to_create, to_update = [], []
+    for qid, (answer_id, is_correct, time_spent, _) in buffered.items():
+        ans = existing.get(qid)
+        if ans is None:
+            to_create.append(AttemptAnswer(
+                attempt=attempt,
+                question_id=qid,
+                selected_answer_id=answer_id,
+                is_correct=is_correct,
+                time_spent=time_spent,
+            ))
+        elif (ans.selected_answer_id, ans.is_correct, ans.time_spent) != (answer_id, is_correct, time_spent):
+            ans.selected_answer_id = answer_id
+            ans.is_correct = is_correct
+            ans.time_spent = time_spent
+            to_update.append(ans)
+
+    with transaction.atomic():
+        # ignore_conflicts — finish va davriy flush bir vaqtda ishlasa ham xato yo'q
+        AttemptAnswer.objects.bulk_create(to_create, ignore_conflicts=True)
+        if to_update:
+            AttemptAnswer.objects.bulk_update(to_update, ['selected_answer', 'is_correct', 'time_spent'])
+        if to_create:
+            _log_created_answers(attempt, to_create)
+
+    if to_create:
+        record_question_answers([(ans.question_id, ans.is_correct) for ans in to_create])
+
+    mark_flushed(META_PREFIX, attempt.uuid, buffered.values(), ANSWER_BUFFER_TTL)
+    return len(to_create)
+
+
+def _log_created_answers(attempt, created):
+    """bulk_create signal bermaydi — question_answer loglarini bir so'rovda yozish"""
+    question_meta = {
+        qid: (subject_id, topic_id)
+        for qid, subject_id, topic_id in Question.objects.filter(
+            id__in=[a.question_id for a in created]
+        ).values_list('id', 'subject_id', 'topic_id')
+    }
+    UserActivityLog.objects.bulk_create([
+        UserActivityLog(
+            user_id=attempt.user_id,
+            action='question_answer',
+            details={
+                'question_id': a.question_id,
+                'is_correct': a.is_correct,
+                'time_spent': a.time_spent,
+            },
+            subject_id=question_meta.get(a.question_id, (None, None))[0],
+            topic_id=question_meta.get(a.question_id, (None, None))[1],
+        )
+        for a in created
+    ])
+
+
+def finalize_attempt_answers(attempt):
+    """Urinish yakunlanganda: hamma javoblarni yozish va buferni tozalash"""
+    flush_attempt_answers(attempt)
+    question_ids = [qid for qid, _ in get_attempt_order(attempt)]
+    clear_answer_buffer(attempt.uuid, question_ids)
+
+
+def clear_answer_buffer(uuid, question_ids=()):
+    cache.delete_many(
+        [_answer_key(uuid, qid) for qid in question_ids]
+        + meta_keys(META_PREFIX, uuid) + [_key_map_key(uuid)]
+    )
+
+
+def flush_idle_attempts():
+    """
+    Davriy flush: jim qolgan yoki bufer eskirgan faol urinishlarni yozish.
+    Returns: flush qilingan urinishlar soni.
+    """
+    since = timezone.now() - timedelta(seconds=ANSWER_BUFFER_TTL)
+    attempts = list(
+        TestAttempt.objects.filter(status='in_progress', started_at__gte=since)
+        .only('id', 'uuid', 'user', 'test')
+    )
+    metas = get_buffer_meta(META_PREFIX, [a.uuid for a in attempts])
+
+    now = time.time()
+    flushed = 0
+    for attempt in attempts:
+        if needs_flush(metas.get(attempt.uuid), now, ANSWER_BUFFER_IDLE_SECONDS, ANSWER_BUFFER_MAX_AGE_SECONDS):
+            flush_attempt_answers(attempt)
+            flushed += 1
+    return flushed
@@ -0,0 +1,100 @@
+"""
+TestMakon.uz - Attempt Snapshot
+test_play sahifasi uchun urinish "snapshot"i — savollar va javoblar bulk so'rovlarda.
+"""
+
+import random
+
+from django.core.cache import cache
+
+from .models import Question, Answer, TestQuestion, AttemptAnswer, SavedQuestion
+
+ATTEMPT_ORDER_TTL = 60 * 60 * 24  # 1 kun
+
+
+def _order_key(attempt):
+    return f'attempt_order:{attempt.uuid}'
+
+
+def get_attempt_order(attempt):
+    """
+    Muzlatilgan tartib: [(question_id, [answer_id, ...]), ...]
+    Cache bo'sh bo'lsa 2 ta so'rov bilan quriladi.
+    """
+    key = _order_key(attempt)
+    order = cache.get(key)
+    if order is not None:
+        return order
+
+    test = attempt.test
+    question_ids = list(
+        TestQuestion.objects.filter(test=test)
+        .order_by('order')
+        .values_list('question_id', flat=True)
+    )
+
+    answer_ids = {qid: [] for qid in question_ids}
+    for answer_id, question_id in Answer.objects.filter(
+        question_id__in=question_ids
+    ).order_by('order').values_list('id', 'question_id'):
+        answer_ids[question_id].append(answer_id)
+
+    if test.shuffle_answers:
+        for ids in answer_ids.values():
+            random.shuffle(ids)
+
+    order = [(qid, answer_ids[qid]) for qid in question_ids]
+    cache.set(key, order, ATTEMPT_ORDER_TTL)
+    return order
+
+
+def clear_attempt_order(attempt):
+    """Urinish yakunlanganda muzlatilgan tartibni o'chirish"""
+    cache.delete(_order_key(attempt))
+
+
+def load_attempt_snapshot(attempt, user):
+    """
+    test_play uchun questions_data ro'yxati.
+    Savollar soni qancha bo'lmasin — 4 ta so'rov (tartib cache'da bo'lsa).
+    """
+    order = get_attempt_order(attempt)
+    question_ids = [qid for qid, _ in order]
+
+    questions = Question.objects.in_bulk(question_ids)
+    answers = Answer.objects.in_bulk([aid for _, ids in order for aid in ids])
+    user_answers = {
+        ua.question_id: ua
+        for ua in AttemptAnswer.objects.filter(attempt=attempt)
+    }
+    # Hali DB ga yozilmagan (buferdagi) javoblar ustidan yoziladi
+    from .answer_buffer import get_buffered_answers
+    for qid, (answer_id, is_correct, time_spent, _) in get_buffered_answers(attempt.uuid, question_ids).items():
+        user_answers[qid] = AttemptAnswer(
+            attempt=attempt,
+            question_id=qid,
+            selected_answer_id=answer_id,
+            is_correct=is_correct,
+            time_spent=time_spent,
+        )
+    bookmarked = set(
+        SavedQuestion.objects.filter(
+            user=user, question_id__in=question_ids
+        ).values_list('question_id', flat=True)
+    )
+
+    questions_data = []
+    for qid, answer_ids in order:
+        q = questions.get(qid)
+        if q is None:
+            continue
+        user_answer = user_answers.get(qid)
+        questions_data.append({
+            'index': len(questions_data),
+            'question': q,
+            'answers': [answers[aid] for aid in answer_ids if aid in answers],
+            'user_answer': user_answer,
+            'is_bookmarked': qid in bookmarked,
+            'status': 'answered' if user_answer else 'unanswered',
+        })
+    return questions_data
@@ -0,0 +1,55 @@
+"""
+TestMakon.uz - Buffer Meta
+Write-behind javob buferlari uchun first / last / flushed vaqt belgilari.
+"""
+
+from django.core.cache import cache
+
+# Har bir belgi alohida kalitda: buferga yozish faqat first (add) va last (set) ni,
+# flush esa faqat flushed ni o'zgartiradi — bir-birining qiymatini yo'qotmaydi.
+MARKS = ('first', 'last', 'flushed')
+
+
+def _mark_key(prefix, uuid, mark):
+    return f'{prefix}:{uuid}:{mark}'
+
+
+def meta_keys(prefix, uuid):
+    return [_mark_key(prefix, uuid, mark) for mark in MARKS]
+
+
+def touch_buffer(prefix, uuid, now, ttl):
+    """Buferga yangi yozuv tushdi (first — faqat birinchi marta)"""
+    cache.add(_mark_key(prefix, uuid, 'first'), now, ttl)
+    cache.set(_mark_key(prefix, uuid, 'last'), now, ttl)
+
+
+def mark_flushed(prefix, uuid, entries, ttl):
+    """
+    Flush yozgan eng yangi yozuv vaqti (entries — buferdan o'qilgan, oxirgi element ts).
+    Flush paytida kelgan yozuv undan yangi bo'ladi va keyingi flush'da ko'rinadi.
+    """
+    if entries:
+        cache.set(_mark_key(prefix, uuid, 'flushed'), max(entry[-1] for entry in entries), ttl)
+
+
+def get_buffer_meta(prefix, uuids):
+    """{uuid: {'first', 'last', 'flushed'}} — faqat buferga yozilganlari"""
+    keys = {}
+    for uuid in uuids:
+        for mark in MARKS:
+            keys[_mark_key(prefix, uuid, mark)] = (uuid, mark)
+    metas = {}
+    for key, value in cache.get_many(list(keys)).items():
+        uuid, mark = keys[key]
+        metas.setdefault(uuid, {'first': 0, 'last': 0, 'flushed': 0})[mark] = value
+    return {uuid: meta for uuid, meta in metas.items() if meta['last']}
+
+
+def needs_flush(meta, now, idle_seconds, max_age_seconds):
+    """Yozilmagan yozuv bor va foydalanuvchi jim qolgan yoki bufer eskirgan"""
+    if not meta or meta['last'] <= meta['flushed']:
+        return False
+    is_idle = now - meta['last'] >= idle_seconds
+    is_stale = now - max(meta['first'], meta['flushed']) >= max_age_seconds
+    return is_idle or is_stale
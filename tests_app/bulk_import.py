@@ -0,0 +1,323 @@
+"""
+TestMakon.uz - Bulk Question Import
+CSV / Excel fayldan savollarni oqim (streaming) rejimida import qilish.
+"""
+
+import csv
+import hashlib
+import io
+import logging
+import re
+import uuid
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import Answer, Question, Subject, Topic
+from .question_pool import invalidate_question_pool
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 500
+IMPORT_STATUS_TTL = 60 * 60 * 6         # 6 soat
+PROGRESS_EVERY = 200                    # har N qatorda jarayon yoziladi
+MAX_REPORTED_ERRORS = 50
+UPLOAD_DIR = 'imports'
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# Maydon -> qabul qilinadigan ustun nomlari (birinchi topilgani ishlatiladi)
+HEADER_ALIASES = {
+    'text': ('question_text', 'savol', 'text'),
+    'option_a': ('option_a', 'a'),
+    'option_b': ('option_b', 'b'),
+    'option_c': ('option_c', 'c'),
+    'option_d': ('option_d', 'd'),
+    'correct': ('correct_answer', 'correct', 'javob'),
+    'difficulty': ('difficulty', 'qiyinlik'),
+    'topic': ('topic_name', 'topic', 'mavzu'),
+    'explanation': ('explanation', 'tushuntirish'),
+}
+OPTION_FIELDS = ('option_a', 'option_b', 'option_c', 'option_d')
+CORRECT_MAP = {'a': 0, 'b': 1, 'c': 2, 'd': 3}
+DIFFICULTIES = ('easy', 'medium', 'hard', 'expert')
+
+
+class ImportFileError(Exception):
+    """Faylni o'qib bo'lmadi (format, kodirovka, kutubxona)"""
+
+
+def _status_key(job_id):
+    return f'bulk_import:{job_id}'
+
+
+def text_hash(text):
+    """Savol matni hash'i — bo'shliq va registrdan qat'i nazar"""
+    normalized = re.sub(r'\s+', ' ', text).strip().lower()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+# ============================================================
+# FAYL
+# ============================================================
+
+def save_upload(uploaded):
+    """Yuklangan faylni storage'ga saqlash (worker o'qishi uchun). Returns: (job_id, path)"""
+    job_id = uuid.uuid4().hex
+    path = default_storage.save(f'{UPLOAD_DIR}/{job_id}_{uploaded.name}', uploaded)
+    return job_id, path
+
+
+def _iter_csv(handle):
+    text = io.TextIOWrapper(handle, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except UnicodeDecodeError as e:
+        raise ImportFileError(f"CSV o'qishda xato: {e}")
+    finally:
+        text.detach()
+
+
+def _iter_excel(handle):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportFileError("Excel uchun openpyxl kutubxonasi o'rnatilmagan. CSV formatidan foydalaning.")
+    try:
+        wb = openpyxl.load_workbook(handle, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFileError(f"Excel o'qishda xato: {e}")
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def iter_rows(handle, name):
+    """Fayl qatorlari (birinchisi — sarlavha) generator ko'rinishida"""
+    name = name.lower()
+    if name.endswith('.csv'):
+        return _iter_csv(handle)
+    if name.endswith(('.xlsx', '.xls')):
+        return _iter_excel(handle)
+    raise ImportFileError("Faqat .csv, .xlsx yoki .xls formatlar qo'llab-quvvatlanadi.")
+
+
+def resolve_headers(header_row):
+    """Sarlavha qatoridan {maydon: ustun indeksi} xaritasi"""
+    positions = {}
+    for i, cell in enumerate(header_row):
+        name = str(cell).strip().lower() if cell is not None else ''
+        positions.setdefault(name, i)
+    columns = {}
+    for field, aliases in HEADER_ALIASES.items():
+        for alias in aliases:
+            if alias in positions:
+                columns[field] = positions[alias]
+                break
+    return columns
+
+
+def _cell(row, columns, field):
+    i = columns.get(field)
+    if i is None or i >= len(row) or row[i] is None:
+        return ''
+    return str(row[i]).strip()
+
+
+# ============================================================
+# JARAYON HOLATI
+# ============================================================
+
+def _new_report(job_id, subject_id, total=None):
+    return {
+        'job_id': job_id,
+        'subject_id': subject_id,
+        'status': 'queued',
+        'total': total,
+        'processed': 0,
+        'created': 0,
+        'skipped': 0,
+        'duplicates': 0,
+        'errors': [],
+    }
+
+
+def start_job(job_id, subject_id):
+    cache.set(_status_key(job_id), _new_report(job_id, subject_id), IMPORT_STATUS_TTL)
+
+
+def get_status(job_id):
+    return cache.get(_status_key(job_id))
+
+
+def _save_report(report):
+    cache.set(_status_key(report['job_id']), report, IMPORT_STATUS_TTL)
+
+
+# ============================================================
+# IMPORT
+# ============================================================
+
+class _TopicCache:
+    """Fan mavzulari nom bo'yicha (registrsiz) — yo'g'i bir marta yaratiladi"""
+
+    def __init__(self, subject):
+        self.subject = subject
+        self.by_name = {t.name.lower(): t for t in Topic.objects.filter(subject=subject)}
+
+    def get(self, name):
+        if not name:
+            return None
+        topic = self.by_name.get(name.lower())
+        if topic is None:
+            topic = Topic.objects.create(
+                subject=self.subject, name=name, slug=name.lower().replace(' ', '-'),
+            )
+            self.by_name[name.lower()] = topic
+        return topic
+
+
+def _flush(chunk):
+    """[(Question, [Answer, ...]), ...] — bitta tranzaksiyada bulk_create"""
+    if not chunk:
+        return
+    with transaction.atomic():
+        questions = Question.objects.bulk_create([q for q, _ in chunk])
+        if any(q.pk is None for q in questions):
+            # Backend yaratilgan ID larni qaytarmasa — uuid bo'yicha olinadi
+            ids = dict(Question.objects.filter(uuid__in=[q.uuid for q in questions]).values_list('uuid', 'id'))
+            for q in questions:
+                q.pk = ids[q.uuid]
+        answers = []
+        for q, options in chunk:
+            for answer in options:
+                answer.question_id = q.pk
+                answers.append(answer)
+        Answer.objects.bulk_create(answers, batch_size=IMPORT_CHUNK_SIZE * 4)
+
+
+def import_rows(rows, subject, default_difficulty='medium', created_by=None, report=None, on_progress=None):
+    """
+    Qatorlarni import qilish. rows — iter_rows() generatori (sarlavha bilan).
+    Returns: hisobot dict (created, skipped, duplicates, errors, ...).
+    """
+    report = report or _new_report(None, subject.id)
+    if default_difficulty not in DIFFICULTIES:
+        default_difficulty = 'medium'
+
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return report
+    columns = resolve_headers(header)
+
+    seen = {text_hash(t) for t in Question.objects.filter(subject=subject).values_list('text', flat=True).iterator()}
+    topics = _TopicCache(subject)
+    chunk = []
+
+    def error(line, msg):
+        report['skipped'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append(f"Qator {line}: {msg}")
+
+    for line, row in enumerate(rows, start=2):
+        if not any(cell not in (None, '') for cell in row):
+            continue
+        report['processed'] += 1
+        if on_progress and report['processed'] % PROGRESS_EVERY == 0:
+            on_progress(report)
+
+        text = _cell(row, columns, 'text')
+        options = [_cell(row, columns, f) for f in OPTION_FIELDS]
+        if not text or not options[0] or not options[1]:
+            error(line, "savol matni yoki javoblar to'liq emas")
+            continue
+
+        correct_raw = _cell(row, columns, 'correct').lower()
+        correct_idx = CORRECT_MAP.get(correct_raw)
+        if correct_idx is None:
+            error(line, f"to'g'ri javob noto'g'ri ({correct_raw!r}). A/B/C/D bo'lishi kerak")
+            continue
+
+        digest = text_hash(text)
+        if digest in seen:
+            report['duplicates'] += 1
+            continue
+        seen.add(digest)
+
+        difficulty = _cell(row, columns, 'difficulty')
+        if difficulty not in DIFFICULTIES:
+            difficulty = default_difficulty
+
+        question = Question(
+            subject=subject,
+            topic=topics.get(_cell(row, columns, 'topic')),
+            text=text,
+            difficulty=difficulty,
+            explanation=_cell(row, columns, 'explanation'),
+            created_by=created_by,
+        )
+        answers = [
+            Answer(text=opt, is_correct=(idx == correct_idx))
+            for idx, opt in enumerate(options) if opt
+        ]
+        chunk.append((question, answers))
+
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _flush(chunk)
+            report['created'] += len(chunk)
+            chunk = []
+
+    _flush(chunk)
+    report['created'] += len(chunk)
+    return report
+
+
+def _count_rows(path):
+    """Jarayon foizi uchun qatorlar soni (oqim bilan, xotiraga yuklamasdan)"""
+    try:
+        with default_storage.open(path, 'rb') as handle:
+            if path.lower().endswith('.csv'):
+                return max(0, sum(1 for _ in iter_rows(handle, path)) - 1)
+            import openpyxl
+            wb = openpyxl.load_workbook(handle, read_only=True)
+            total = max(0, (wb.active.max_row or 1) - 1)
+            wb.close()
+            return total
+    except Exception:
+        return None
+
+
+def run_import(job_id, path, subject_id, default_difficulty='medium', user_id=None):
+    """
+    Celery job: saqlangan faylni import qilish va jarayonni cache'ga yozib borish.
+    Yakunda fayl o'chiriladi va fan savol pooli yangilanadi.
+    """
+    from accounts.models import User
+
+    report = get_status(job_id) or _new_report(job_id, subject_id)
+    report.update(status='running', total=_count_rows(path))
+    _save_report(report)
+
+    try:
+        subject = Subject.objects.get(id=subject_id)
+        created_by = User.objects.filter(id=user_id).first() if user_id else None
+        with default_storage.open(path, 'rb') as handle:
+            import_rows(
+                iter_rows(handle, path), subject, default_difficulty,
+                created_by=created_by, report=report, on_progress=_save_report,
+            )
+        report['status'] = 'done'
+    except ImportFileError as e:
+        report.update(status='failed', error=str(e))
+    except Exception as e:
+        logger.exception(f'bulk import xato ({job_id})')
+        report.update(status='failed', error=str(e))
+    finally:
+        default_storage.delete(path)
+
+    if report['created']:
+        invalidate_question_pool(subject_id)
+    _save_report(report)
+    return report
@@ -0,0 +1,156 @@
+"""
+TestMakon.uz - IRT Calibration
+Savol bankini har kecha javoblar matritsasidan kalibrlash.
+"""
+
+import math
+from statistics import NormalDist
+
+from django.db.models import Q
+
+CHUNK_SIZE = 5000
+WRITE_BATCH_SIZE = 1000
+MIN_RESPONSES = 30          # bundan kam javobli savol kalibrlanmaydi
+DEFAULT_BISERIAL = 0.5      # javoblar bir xil (hammasi to'g'ri/xato) — r aniqlanmaydi
+BISERIAL_RANGE = (0.05, 0.95)
+DIFFICULTY_RANGE = (-4.0, 4.0)
+
+# b chegaralari -> Question.difficulty (get_questions_for_subject bucket'lari)
+DIFFICULTY_BUCKETS = [
+    (-0.75, 'easy'),
+    (0.5, 'medium'),
+    (1.5, 'hard'),
+    (math.inf, 'expert'),
+]
+
+_normal = NormalDist()
+
+
+def iter_responses(queryset, chunk_size=CHUNK_SIZE):
+    """
+    (attempt_id, question_id, is_correct) — urinish bo'yicha ketma-ket.
+    queryset: attempt_id, question_id, is_correct maydonli javoblar modeli.
+    """
+    last_attempt, last_id = 0, 0
+    while True:
+        rows = list(
+            queryset.filter(Q(attempt_id__gt=last_attempt) | Q(attempt_id=last_attempt, id__gt=last_id))
+            .order_by('attempt_id', 'id')
+            .values_list('id', 'attempt_id', 'question_id', 'is_correct')[:chunk_size]
+        )
+        if not rows:
+            return
+        for _, attempt_id, question_id, is_correct in rows:
+            yield attempt_id, question_id, is_correct
+        last_id, last_attempt = rows[-1][0], rows[-1][1]
+
+
+def accumulate(responses):
+    """
+    Har savol uchun yig'indilar: {question_id: [n, Σx, Σr, Σr², Σxr]}
+    x — to'g'ri (0/1), r — urinishdagi qolgan savollar bo'yicha ball.
+    """
+    stats = {}
+    current, items = None, []
+
+    def flush():
+        total = sum(x for _, x in items)
+        for question_id, x in items:
+            rest = total - x
+            s = stats.setdefault(question_id, [0, 0, 0, 0, 0])
+            s[0] += 1
+            s[1] += x
+            s[2] += rest
+            s[3] += rest * rest
+            s[4] += x * rest
+
+    for attempt_id, question_id, is_correct in responses:
+        if attempt_id != current:
+            if items:
+                flush()
+            current, items = attempt_id, []
+        items.append((question_id, 1 if is_correct else 0))
+    if items:
+        flush()
+    return stats
+
+
+def estimate(n, sum_x, sum_r, sum_rr, sum_xr):
+    """(b, a) yoki javoblar yetarli bo'lmasa None"""
+    if n < MIN_RESPONSES:
+        return None
+
+    p = (sum_x + 0.5) / (n + 1)  # 0 va 1 dan qochish
+    mean_x, mean_r = sum_x / n, sum_r / n
+    var_x = mean_x - mean_x ** 2
+    var_r = sum_rr / n - mean_r ** 2
+    z = _normal.inv_cdf(p)
+
+    if var_x > 0 and var_r > 0:
+        point_biserial = (sum_xr / n - mean_x * mean_r) / math.sqrt(var_x * var_r)
+        biserial = point_biserial * math.sqrt(p * (1 - p)) / _normal.pdf(z)
+    else:
+        biserial = DEFAULT_BISERIAL
+    biserial = min(max(biserial, BISERIAL_RANGE[0]), BISERIAL_RANGE[1])
+
+    a = biserial / math.sqrt(1 - biserial ** 2)
+    b = min(max(-z / biserial, DIFFICULTY_RANGE[0]), DIFFICULTY_RANGE[1])
+    return round(b, 3), round(a, 3)
+
+
+def calibrate_responses(queryset, chunk_size=CHUNK_SIZE):
+    """{question_id: (b, a)} — faqat MIN_RESPONSES dan ko'p javobli savollar"""
+    estimates = {}
+    for question_id, sums in accumulate(iter_responses(queryset, chunk_size)).items():
+        params = estimate(*sums)
+        if params:
+            estimates[question_id] = params
+    return estimates
+
+
+def expected_difficulty(b, a):
+    """O'rtacha o'quvchi (θ=0) xato qilish ehtimoli: 0 — oson, 1 — qiyin"""
+    return round(_normal.cdf(a * b), 4)
+
+
+def difficulty_bucket(b):
+    for upper, bucket in DIFFICULTY_BUCKETS:
+        if b < upper:
+            return bucket
+    return DIFFICULTY_BUCKETS[-1][1]
+
+
+def save_estimates(model, estimates, bucket_field=None):
+    """
+    irt_difficulty / irt_discrimination ni bulk_update bilan yozish.
+    bucket_field — b bo'yicha qayta taqsimlanadigan qiyinlik maydoni (ixtiyoriy).
+    """
+    fields = ['irt_difficulty', 'irt_discrimination'] + ([bucket_field] if bucket_field else [])
+    objs = []
+    for question_id, (b, a) in estimates.items():
+        obj = model(id=question_id, irt_difficulty=b, irt_discrimination=a)
+        if bucket_field:
+            setattr(obj, bucket_field, difficulty_bucket(b))
+        objs.append(obj)
+    model.objects.bulk_update(objs, fields, batch_size=WRITE_BATCH_SIZE)
+    return len(objs)
+
+
+def calibrate_question_bank(chunk_size=CHUNK_SIZE):
+    """
+    tests_app savollarini AttemptAnswer dan kalibrlash.
+    Question.difficulty b bo'yicha qayta taqsimlanadi, savol poollari tozalanadi.
+    Returns: kalibrlangan savollar soni.
+    """
+    from .models import Subject, Question, AttemptAnswer
+    from .question_pool import invalidate_question_pool
+
+    estimates = calibrate_responses(
+        AttemptAnswer.objects.filter(attempt__status__in=['completed', 'timeout']), chunk_size,
+    )
+    count = save_estimates(Question, estimates, bucket_field='difficulty')
+
+    # bulk_update signal bermaydi — qiyinlik poollari qayta quriladi
+    for subject_id in Subject.objects.values_list('id', flat=True):
+        invalidate_question_pool(subject_id)
+    return count
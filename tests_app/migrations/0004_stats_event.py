@@ -0,0 +1,42 @@
+# Generated by Django 5.2.10 on 2026-10-17 23:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests_app', '0003_irt_calibration'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('test', 'Test'), ('cert', 'Milliy sertifikat'), ('competition', 'Musobaqa')], max_length=20, verbose_name='Manba')),
+                ('source_id', models.PositiveIntegerField(verbose_name='Manba ID')),
+                ('questions', models.PositiveIntegerField(default=0, verbose_name='Savollar')),
+                ('correct', models.PositiveIntegerField(default=0, verbose_name="To'g'ri")),
+                ('wrong', models.PositiveIntegerField(default=0, verbose_name="Noto'g'ri")),
+                ('time_spent', models.PositiveIntegerField(default=0, verbose_name='Vaqt (soniya)')),
+                ('xp', models.PositiveIntegerField(default=0, verbose_name='XP')),
+                ('score', models.FloatField(default=0, verbose_name='Ball (%)')),
+                ('topics', models.JSONField(blank=True, default=list, verbose_name='Mavzular')),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Vaqt')),
+                ('rolled_up_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name="Yig'ilgan")),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tests_app.subject')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Statistika hodisasi',
+                'verbose_name_plural': 'Statistika hodisalari',
+                'ordering': ['id'],
+                'unique_together': {('source', 'source_id')},
+            },
+        ),
+    ]
@@ -151,6 +151,10 @@ class Question(models.Model):
     times_answered = models.PositiveIntegerField('Javob berilgan', default=0)
     times_correct = models.PositiveIntegerField('To\'g\'ri javoblar', default=0)
 
+    # IRT kalibrlash (tests_app.calibration, har kecha)
+    irt_difficulty = models.FloatField('IRT qiyinlik (b)', null=True, blank=True)
+    irt_discrimination = models.FloatField('IRT farqlash (a)', null=True, blank=True)
+
     # Source
     source = models.CharField('Manba', max_length=200, blank=True)
     year = models.PositiveIntegerField('Yil', null=True, blank=True)
@@ -535,8 +539,8 @@ class UserTopicPerformance(models.Model):
     def __str__(self):
         return f"{self.user} - {self.topic} ({self.current_score}%)"
 
-    def update_stats(self):
-        """Statistikani yangilash"""
+    def update_stats(self, save=True):
+        """Statistikani yangilash (save=False — bulk_update uchun, faqat hisoblash)"""
         if self.total_questions > 0:
             self.current_score = round((self.correct_answers / self.total_questions) * 100, 1)
             self.avg_time_per_question = round(self.total_time_spent / self.total_questions, 1)
@@ -551,7 +555,8 @@ class UserTopicPerformance(models.Model):
             self.is_strong = self.current_score >= 80
             self.is_mastered = self.current_score >= 90 and self.total_questions >= 30
 
-        self.save()
+        if save:
+            self.save()
 
 
 class UserSubjectPerformance(models.Model):
@@ -649,6 +654,56 @@ class DailyUserStats(models.Model):
         self.save()
 
 
+class StatsEvent(models.Model):
+    """
+    Urinish natijasi hodisasi (append-only).
+    DailyUserStats, UserSubjectPerformance va UserTopicPerformance ga
+    tests_app.stats_rollup agregatori yig'ib yozadi.
+    """
+
+    SOURCE_CHOICES = [
+        ('test', 'Test'),
+        ('cert', 'Milliy sertifikat'),
+        ('competition', 'Musobaqa'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='stats_events'
+    )
+    source = models.CharField('Manba', max_length=20, choices=SOURCE_CHOICES)
+    source_id = models.PositiveIntegerField('Manba ID')
+    subject = models.ForeignKey(
+        Subject,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+'
+    )
+
+    # Natija
+    questions = models.PositiveIntegerField('Savollar', default=0)
+    correct = models.PositiveIntegerField('To\'g\'ri', default=0)
+    wrong = models.PositiveIntegerField('Noto\'g\'ri', default=0)
+    time_spent = models.PositiveIntegerField('Vaqt (soniya)', default=0)
+    xp = models.PositiveIntegerField('XP', default=0)
+    score = models.FloatField('Ball (%)', default=0)
+    topics = models.JSONField('Mavzular', default=list, blank=True)
+    # [[topic_id, subject_id, total, correct, time_spent], ...]
+
+    occurred_at = models.DateTimeField('Vaqt', default=timezone.now)
+    rolled_up_at = models.DateTimeField('Yig\'ilgan', null=True, blank=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Statistika hodisasi'
+        verbose_name_plural = 'Statistika hodisalari'
+        unique_together = ['source', 'source_id']
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.user} - {self.source}#{self.source_id}"
+
+
 class UserStudySession(models.Model):
     """O'qish sessiyasi (platformaga kirish-chiqish)"""
 
@@ -0,0 +1,67 @@
+"""
+TestMakon.uz - Question Pool
+Fan/qiyinlik bo'yicha faol savol ID lari pooli.
+"""
+
+import random
+from array import array
+
+from django.core.cache import cache
+
+from .models import Question
+
+POOL_CACHE_TTL = 60 * 60  # 1 soat — bulk update/import signal bermaydi
+POOL_DIFFICULTIES = [d for d, _ in Question.DIFFICULTY_CHOICES]
+
+
+def _pool_key(subject_id=None, difficulty=None):
+    return f'qpool:{subject_id or "any"}:{difficulty or "all"}'
+
+
+def get_question_pool(subject_id=None, difficulty=None):
+    """
+    Faol savollar ID massivi.
+    subject_id=None — barcha fanlar, difficulty=None — barcha qiyinliklar.
+    """
+    key = _pool_key(subject_id, difficulty)
+    pool = cache.get(key)
+    if pool is None:
+        qs = Question.objects.filter(is_active=True)
+        if subject_id:
+            qs = qs.filter(subject_id=subject_id)
+        if difficulty:
+            qs = qs.filter(difficulty=difficulty)
+        pool = array('q', qs.order_by().values_list('id', flat=True))
+        cache.set(key, pool, POOL_CACHE_TTL)
+    return pool
+
+
+def invalidate_question_pool(subject_id=None):
+    """Fan poollarini (va umumiy poolni) tozalash — keyingi so'rovda qayta quriladi."""
+    keys = [_pool_key(None, None)]
+    if subject_id:
+        keys.append(_pool_key(subject_id, None))
+        keys.extend(_pool_key(subject_id, d) for d in POOL_DIFFICULTIES)
+    cache.delete_many(keys)
+
+
+def sample_question_ids(subject_id=None, difficulty=None, k=0, exclude=None):
+    """
+    Pooldan k ta tasodifiy ID (takrorlanmasdan).
+    exclude — allaqachon tanlangan ID lar (odatda k dan kichik ro'yxat).
+    """
+    if k <= 0:
+        return []
+    pool = get_question_pool(subject_id, difficulty)
+    exclude = set(exclude or ())
+    take = min(len(pool), k + len(exclude))
+    sampled = [qid for qid in random.sample(pool, take) if qid not in exclude]
+    return sampled[:k]
+
+
+def load_questions(question_ids):
+    """ID lar bo'yicha savollarni bitta so'rovda olish (berilgan tartibda)."""
+    if not question_ids:
+        return []
+    questions = Question.objects.filter(id__in=question_ids, is_active=True).in_bulk()
+    return [questions[qid] for qid in question_ids if qid in questions]
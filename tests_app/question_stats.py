@@ -0,0 +1,166 @@
+"""
+TestMakon.uz - Question Stats Pipeline
+Question.times_answered / times_correct uchun agregatsiyalangan hisoblagichlar.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from core.redis_client import get_redis, redis_key
+
+from .models import Question
+
+QSTATS_PREFIX = 'qstats'
+QSTATS_BATCH_SIZE = 1000
+
+
+def _keys(prefix):
+    """(pending, draining, report, lock) kalitlari"""
+    return f'{prefix}:pending', f'{prefix}:draining', f'{prefix}:last_drain', f'{prefix}:drain_lock'
+
+
+def _aggregate(results):
+    """[(question_id, is_correct), ...] -> {question_id: [answered, correct]}"""
+    counts = {}
+    for question_id, is_correct in results:
+        entry = counts.setdefault(int(question_id), [0, 0])
+        entry[0] += 1
+        if is_correct:
+            entry[1] += 1
+    return counts
+
+
+def record_question_answers(results, model=Question, prefix=QSTATS_PREFIX):
+    """
+    Javob natijalarini hisoblagichlarga qo'shish.
+    results: [(question_id, is_correct), ...]
+    """
+    counts = _aggregate(results)
+    if not counts:
+        return
+
+    r = get_redis()
+    if r is None:
+        apply_question_counts(counts, model)
+        return
+
+    key = redis_key(_keys(prefix)[0])
+    pipe = r.pipeline(transaction=False)
+    pipe.hsetnx(key, '_since', time.time())
+    for question_id, (answered, correct) in counts.items():
+        pipe.hincrby(key, f'{question_id}:a', answered)
+        if correct:
+            pipe.hincrby(key, f'{question_id}:c', correct)
+    pipe.execute()
+
+
+def apply_question_counts(counts, model=Question):
+    """
+    {question_id: [answered, correct]} ni DB ga yozish.
+    PostgreSQL: UPDATE ... FROM (VALUES ...) — har QSTATS_BATCH_SIZE savolga bitta so'rov.
+    Boshqa DB lar: CASE WHEN bilan bitta UPDATE.
+    """
+    items = sorted(counts.items())
+    table = model._meta.db_table
+    with transaction.atomic():
+        for start in range(0, len(items), QSTATS_BATCH_SIZE):
+            chunk = items[start:start + QSTATS_BATCH_SIZE]
+            if connection.vendor == 'postgresql':
+                values = ', '.join(['(%s, %s, %s)'] * len(chunk))
+                params = [x for qid, (answered, correct) in chunk for x in (qid, answered, correct)]
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'UPDATE {table} AS q '
+                        f'SET times_answered = q.times_answered + v.answered, '
+                        f'times_correct = q.times_correct + v.correct '
+                        f'FROM (VALUES {values}) AS v(id, answered, correct) '
+                        f'WHERE q.id = v.id',
+                        params,
+                    )
+            else:
+                model.objects.filter(id__in=[qid for qid, _ in chunk]).update(
+                    times_answered=F('times_answered') + Case(
+                        *[When(id=qid, then=Value(answered)) for qid, (answered, _) in chunk],
+                        default=Value(0), output_field=IntegerField(),
+                    ),
+                    times_correct=F('times_correct') + Case(
+                        *[When(id=qid, then=Value(correct)) for qid, (_, correct) in chunk],
+                        default=Value(0), output_field=IntegerField(),
+                    ),
+                )
+
+
+def drain_question_stats(model=Question, prefix=QSTATS_PREFIX, on_drained=None):
+    """
+    Yig'ilgan hisoblagichlarni DB ga yozish.
+    Oldingi drain xato bilan tugagan bo'lsa (draining kaliti qolgan) — avval u yoziladi.
+    on_drained(counts) — yozilgandan keyin (masalan, qiyinlik jadvallarini yangilash).
+    Returns: hisobot dict yoki Redis bo'lmasa None.
+    """
+    r = get_redis()
+    if r is None:
+        return None
+
+    # Bir vaqtda faqat bitta drain (task kechiksa ham ikki marta yozilmasin)
+    pending_key, draining_key, report_key, lock_key = _keys(prefix)
+    lock = r.lock(redis_key(lock_key), timeout=300)
+    if not lock.acquire(blocking=False):
+        return None
+    try:
+        return _drain(r, model, redis_key(pending_key), redis_key(draining_key), report_key, on_drained)
+    finally:
+        lock.release()
+
+
+def _drain(r, model, pending, draining, report_key, on_drained):
+    if not r.exists(draining):
+        if not r.exists(pending):
+            return {'questions': 0, 'answers': 0}
+        r.rename(pending, draining)
+
+    raw = r.hgetall(draining)
+    now = time.time()
+    since = float(raw.pop(b'_since', now))
+
+    counts = {}
+    for field, value in raw.items():
+        question_id, kind = field.decode().split(':')
+        entry = counts.setdefault(int(question_id), [0, 0])
+        entry[0 if kind == 'a' else 1] += int(value)
+
+    started = time.monotonic()
+    apply_question_counts(counts, model)
+    r.delete(draining)
+    if on_drained and counts:
+        on_drained(counts)
+    duration = time.monotonic() - started
+
+    answers = sum(answered for answered, _ in counts.values())
+    report = {
+        'drained_at': now,
+        'lag_seconds': round(now - since, 2),
+        'questions': len(counts),
+        'answers': answers,
+        'duration_ms': round(duration * 1000, 1),
+        'answers_per_sec': round(answers / duration) if duration > 0 else answers,
+    }
+    cache.set(report_key, report, None)
+    return report
+
+
+def question_stats_status(prefix=QSTATS_PREFIX):
+    """Monitoring: navbatdagi hisoblagichlar soni, eng eski inkrement yoshi va oxirgi drain"""
+    pending_key, _, report_key, _ = _keys(prefix)
+    status = {'pending_fields': 0, 'pending_lag_seconds': 0, 'last_drain': cache.get(report_key)}
+    r = get_redis()
+    if r is None:
+        return status
+    pending = redis_key(pending_key)
+    since = r.hget(pending, '_since')
+    if since:
+        status['pending_fields'] = r.hlen(pending) - 1
+        status['pending_lag_seconds'] = round(time.time() - float(since), 2)
+    return status
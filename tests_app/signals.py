@@ -3,135 +3,45 @@ TestMakon.uz - Test App Signals
 Avtomatik data yig'ish va analytics yangilash
 """
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.utils import timezone
-from django.db.models import Avg
 
-from .models import (
-    AttemptAnswer, TestAttempt,
-    UserTopicPerformance, UserSubjectPerformance,
-    DailyUserStats, UserActivityLog, UserAnalyticsSummary
-)
+from .models import Question, AttemptAnswer, TestAttempt, UserActivityLog
+from .question_pool import invalidate_question_pool
+from .stats_rollup import record_stats_event, topic_breakdown
 
 
-@receiver(post_save, sender=AttemptAnswer)
-def update_topic_performance(sender, instance, created, **kwargs):
-    """Har bir javobda topic performance yangilanadi"""
-    if not created:
-        return
-
-    question = instance.question
-    user = instance.attempt.user
-
-    # Topic bo'lmasa, skip
-    if not question.topic:
-        return
-
-    # Topic performance olish yoki yaratish
-    perf, _ = UserTopicPerformance.objects.get_or_create(
-        user=user,
-        topic=question.topic,
-        defaults={'subject': question.subject}
-    )
-
-    # Statistikani yangilash
-    perf.total_questions += 1
-    perf.total_time_spent += instance.time_spent
-
-    if instance.is_correct:
-        perf.correct_answers += 1
-    else:
-        perf.wrong_answers += 1
-
-    perf.last_practiced = timezone.now()
-    perf.update_stats()
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def refresh_question_pool(sender, instance, **kwargs):
+    """Savol qo'shilsa/o'zgarsa/o'chirilsa — fan savol pooli qayta quriladi"""
+    invalidate_question_pool(instance.subject_id)
 
 
 @receiver(post_save, sender=TestAttempt)
-def update_subject_performance(sender, instance, **kwargs):
-    """Test yakunlanganda subject performance yangilanadi"""
+def record_test_result(sender, instance, **kwargs):
+    """
+    Test yakunlanganda natija hodisasi yoziladi — kunlik, fan va mavzu
+    statistikasini stats_rollup agregatori yig'adi (qayta save — e'tiborsiz)
+    """
     if instance.status != 'completed':
         return
 
-    user = instance.user
-    subject = instance.test.subject
-
-    if not subject:
-        return
-
-    # Subject performance olish yoki yaratish
-    perf, _ = UserSubjectPerformance.objects.get_or_create(
-        user=user,
-        subject=subject
+    rows = AttemptAnswer.objects.filter(attempt=instance).values_list(
+        'question__topic_id', 'question__subject_id', 'is_correct', 'time_spent'
     )
-
-    # Statistikani yangilash
-    perf.total_tests += 1
-    perf.total_questions += instance.total_questions
-    perf.correct_answers += instance.correct_answers
-    perf.total_time_spent += instance.time_spent
-
-    perf.last_score = instance.percentage
-    if instance.percentage > perf.best_score:
-        perf.best_score = instance.percentage
-
-    # O'rtacha hisoblash
-    all_attempts = TestAttempt.objects.filter(
-        user=user,
-        test__subject=subject,
-        status='completed'
+    record_stats_event(
+        instance.user_id, 'test', instance.id,
+        subject_id=instance.test.subject_id if instance.test else None,
+        questions=instance.total_questions,
+        correct=instance.correct_answers,
+        wrong=instance.wrong_answers,
+        time_spent=instance.time_spent,
+        xp=instance.xp_earned,
+        score=instance.percentage,
+        topics=topic_breakdown(rows),
+        occurred_at=instance.completed_at,
     )
-    perf.average_score = all_attempts.aggregate(avg=Avg('percentage'))['avg'] or 0
-
-    perf.last_practiced = timezone.now()
-    perf.save()
-
-
-@receiver(post_save, sender=TestAttempt)
-def update_daily_stats(sender, instance, **kwargs):
-    """Test yakunlanganda kunlik statistika yangilanadi"""
-    if instance.status != 'completed':
-        return
-
-    user = instance.user
-    today = timezone.now().date()
-
-    # Kunlik stats olish yoki yaratish
-    stats, _ = DailyUserStats.objects.get_or_create(
-        user=user,
-        date=today
-    )
-
-    # Yangilash
-    stats.tests_taken += 1
-    stats.questions_answered += instance.total_questions
-    stats.correct_answers += instance.correct_answers
-    stats.wrong_answers += instance.wrong_answers
-    stats.total_time_spent += instance.time_spent
-    stats.xp_earned += instance.xp_earned
-
-    # Faollik soati
-    current_hour = timezone.now().hour
-    activity_hours = stats.activity_hours or {}
-    activity_hours[str(current_hour)] = activity_hours.get(str(current_hour), 0) + 1
-    stats.activity_hours = activity_hours
-
-    # Eng faol soatni aniqlash
-    if activity_hours:
-        stats.most_active_hour = int(max(activity_hours, key=activity_hours.get))
-
-    # Fan bo'yicha
-    if instance.test.subject:
-        subjects_practiced = stats.subjects_practiced or {}
-        subj_name = instance.test.subject.slug
-        if subj_name not in subjects_practiced:
-            subjects_practiced[subj_name] = {'correct': 0, 'total': 0}
-        subjects_practiced[subj_name]['correct'] += instance.correct_answers
-        subjects_practiced[subj_name]['total'] += instance.total_questions
-        stats.subjects_practiced = subjects_practiced
-
-    stats.calculate_accuracy()
 
 
 @receiver(post_save, sender=TestAttempt)
@@ -0,0 +1,315 @@
+"""
+TestMakon.uz - Stats Rollup
+Urinish natijalari hodisalaridan foydalanuvchi statistikasini yig'ish.
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Subject, StatsEvent, DailyUserStats,
+    UserSubjectPerformance, UserTopicPerformance,
+)
+
+ROLLUP_BATCH_SIZE = 1000
+ROLLUP_MAX_BATCHES = 50        # bitta ishga tushishda ko'pi bilan 50 000 hodisa
+ROLLUP_LOCK_KEY = 'stats_rollup_lock'
+ROLLUP_LOCK_TIMEOUT = 60 * 5
+ANALYTICS_CHUNK_SIZE = 200     # refresh_user_analytics task'iga bittada shuncha user
+
+DAILY_FIELDS = [
+    'tests_taken', 'questions_answered', 'correct_answers', 'wrong_answers',
+    'total_time_spent', 'xp_earned', 'activity_hours', 'most_active_hour',
+    'subjects_practiced', 'accuracy_rate',
+]
+SUBJECT_FIELDS = [
+    'total_tests', 'total_questions', 'correct_answers', 'total_time_spent',
+    'average_score', 'best_score', 'last_score', 'predicted_dtm_score', 'last_practiced',
+]
+TOPIC_FIELDS = [
+    'total_questions', 'correct_answers', 'wrong_answers', 'total_time_spent',
+    'avg_time_per_question', 'current_score', 'best_score',
+    'is_weak', 'is_strong', 'is_mastered', 'last_practiced',
+]
+
+
+# ============================================================
+# HODISALAR
+# ============================================================
+
+def topic_breakdown(rows):
+    """
+    Javoblarni mavzu bo'yicha guruhlash.
+    rows: [(topic_id, subject_id, is_correct, time_spent), ...] — topic_id None bo'lsa o'tkaziladi
+    Returns: [[topic_id, subject_id, total, correct, time_spent], ...]
+    """
+    topics = {}
+    for topic_id, subject_id, is_correct, time_spent in rows:
+        if not topic_id:
+            continue
+        t = topics.setdefault(topic_id, [topic_id, subject_id, 0, 0, 0])
+        t[2] += 1
+        t[3] += 1 if is_correct else 0
+        t[4] += time_spent or 0
+    return list(topics.values())
+
+
+def record_stats_event(user_id, source, source_id, subject_id=None, questions=0, correct=0,
+                       wrong=0, time_spent=0, xp=0, score=0, topics=(), occurred_at=None):
+    """
+    Urinish natijasini hodisalar jurnaliga qo'shish (bitta INSERT).
+    Bir urinish uchun ikkinchi marta chaqirilsa (qayta save, task retry) — e'tiborsiz.
+    """
+    StatsEvent.objects.bulk_create([StatsEvent(
+        user_id=user_id,
+        source=source,
+        source_id=source_id,
+        subject_id=subject_id,
+        questions=questions,
+        correct=correct,
+        wrong=wrong,
+        time_spent=time_spent,
+        xp=xp,
+        score=score,
+        topics=list(topics),
+        occurred_at=occurred_at or timezone.now(),
+    )], ignore_conflicts=True)
+
+
+# ============================================================
+# YIG'ISH
+# ============================================================
+
+def aggregate_events(events, subject_slugs):
+    """
+    Hodisalarni xotirada yig'ish (id tartibida — oxirgi ball oxirgi hodisadan).
+    Returns: (daily, subjects, topics) — kalitlari (user_id, date / subject_id / topic_id)
+    """
+    daily, subjects, topics = {}, {}, {}
+    for e in events:
+        local = timezone.localtime(e.occurred_at)
+
+        d = daily.setdefault((e.user_id, local.date()), {
+            'tests': 0, 'questions': 0, 'correct': 0, 'wrong': 0,
+            'time': 0, 'xp': 0, 'hours': {}, 'subjects': {},
+        })
+        d['tests'] += 1
+        d['questions'] += e.questions
+        d['correct'] += e.correct
+        d['wrong'] += e.wrong
+        d['time'] += e.time_spent
+        d['xp'] += e.xp
+        hour = str(local.hour)
+        d['hours'][hour] = d['hours'].get(hour, 0) + 1
+
+        if e.subject_id:
+            slug = subject_slugs.get(e.subject_id)
+            if slug:
+                sp = d['subjects'].setdefault(slug, {'correct': 0, 'total': 0})
+                sp['correct'] += e.correct
+                sp['total'] += e.questions
+
+            s = subjects.setdefault((e.user_id, e.subject_id), {
+                'tests': 0, 'questions': 0, 'correct': 0, 'time': 0, 'best': 0,
+            })
+            s['tests'] += 1
+            s['questions'] += e.questions
+            s['correct'] += e.correct
+            s['time'] += e.time_spent
+            s['best'] = max(s['best'], e.score)
+            s['last'] = e.score
+            s['last_at'] = e.occurred_at
+
+        for topic_id, subject_id, total, correct, time_spent in e.topics:
+            t = topics.setdefault((e.user_id, topic_id), {
+                'subject_id': subject_id, 'total': 0, 'correct': 0, 'time': 0,
+            })
+            t['total'] += total
+            t['correct'] += correct
+            t['time'] += time_spent
+            t['last_at'] = e.occurred_at
+
+    return daily, subjects, topics
+
+
+def _apply_daily(daily):
+    keys = list(daily)
+    DailyUserStats.objects.bulk_create(
+        [DailyUserStats(user_id=user_id, date=date) for user_id, date in keys],
+        ignore_conflicts=True,
+    )
+    rows = DailyUserStats.objects.select_for_update().filter(
+        user_id__in={k[0] for k in keys}, date__in={k[1] for k in keys},
+    ).order_by('id')
+    to_update = []
+    for row in rows:
+        d = daily.get((row.user_id, row.date))
+        if d is None:
+            continue
+        row.tests_taken += d['tests']
+        row.questions_answered += d['questions']
+        row.correct_answers += d['correct']
+        row.wrong_answers += d['wrong']
+        row.total_time_spent += d['time']
+        row.xp_earned += d['xp']
+
+        hours = row.activity_hours or {}
+        for hour, count in d['hours'].items():
+            hours[hour] = hours.get(hour, 0) + count
+        row.activity_hours = hours
+        row.most_active_hour = int(max(hours, key=hours.get))
+
+        practiced = row.subjects_practiced or {}
+        for slug, sp in d['subjects'].items():
+            current = practiced.setdefault(slug, {'correct': 0, 'total': 0})
+            current['correct'] += sp['correct']
+            current['total'] += sp['total']
+        row.subjects_practiced = practiced
+
+        if row.questions_answered > 0:
+            row.accuracy_rate = round((row.correct_answers / row.questions_answered) * 100, 1)
+        to_update.append(row)
+
+    DailyUserStats.objects.bulk_update(to_update, DAILY_FIELDS)
+    return len(to_update)
+
+
+def _apply_subjects(subjects):
+    keys = list(subjects)
+    UserSubjectPerformance.objects.bulk_create(
+        [UserSubjectPerformance(user_id=user_id, subject_id=subject_id) for user_id, subject_id in keys],
+        ignore_conflicts=True,
+    )
+    rows = UserSubjectPerformance.objects.select_for_update().filter(
+        user_id__in={k[0] for k in keys}, subject_id__in={k[1] for k in keys},
+    ).order_by('id')
+    to_update = []
+    for row in rows:
+        s = subjects.get((row.user_id, row.subject_id))
+        if s is None:
+            continue
+        row.total_tests += s['tests']
+        row.total_questions += s['questions']
+        row.correct_answers += s['correct']
+        row.total_time_spent += s['time']
+        row.best_score = max(row.best_score, s['best'])
+        row.last_score = s['last']
+        row.last_practiced = s['last_at']
+        if row.total_questions > 0:
+            row.average_score = round((row.correct_answers / row.total_questions) * 100, 1)
+            # DTM bali: fan uchun o'rtacha ball × 0.3 (balllar tizimi: 30 ball = 100%)
+            row.predicted_dtm_score = round(row.average_score * 0.3, 1)
+        to_update.append(row)
+
+    UserSubjectPerformance.objects.bulk_update(to_update, SUBJECT_FIELDS)
+    return len(to_update)
+
+
+def _apply_topics(topics):
+    keys = list(topics)
+    UserTopicPerformance.objects.bulk_create(
+        [
+            UserTopicPerformance(user_id=user_id, topic_id=topic_id, subject_id=topics[(user_id, topic_id)]['subject_id'])
+            for user_id, topic_id in keys
+        ],
+        ignore_conflicts=True,
+    )
+    rows = UserTopicPerformance.objects.select_for_update().filter(
+        user_id__in={k[0] for k in keys}, topic_id__in={k[1] for k in keys},
+    ).order_by('id')
+    to_update = []
+    for row in rows:
+        t = topics.get((row.user_id, row.topic_id))
+        if t is None:
+            continue
+        row.total_questions += t['total']
+        row.correct_answers += t['correct']
+        row.wrong_answers += t['total'] - t['correct']
+        row.total_time_spent += t['time']
+        row.last_practiced = t['last_at']
+        row.update_stats(save=False)
+        to_update.append(row)
+
+    UserTopicPerformance.objects.bulk_update(to_update, TOPIC_FIELDS)
+    return len(to_update)
+
+
+def rollup_batch(batch_size=ROLLUP_BATCH_SIZE):
+    """
+    Bitta paket: yig'ilmagan hodisalarni o'qish, yig'ma jadvallarga yozish va
+    hodisalarni belgilash — hammasi bitta tranzaksiyada. Hodisalar SKIP LOCKED bilan
+    olinadi — bir vaqtda ishlagan ikkinchi agregator ularni qayta sanamaydi.
+    Commit'dan keyin tegilgan userlar uchun refresh_user_analytics navbatga qo'yiladi.
+    Returns: {'events', 'daily', 'subjects', 'topics'} — hodisa bo'lmasa None.
+    """
+    with transaction.atomic():
+        events = list(
+            StatsEvent.objects.select_for_update(skip_locked=True)
+            .filter(rolled_up_at__isnull=True).order_by('id')[:batch_size]
+        )
+        if not events:
+            return None
+
+        subject_slugs = dict(Subject.objects.filter(
+            id__in={e.subject_id for e in events if e.subject_id}
+        ).values_list('id', 'slug'))
+        daily, subjects, topics = aggregate_events(events, subject_slugs)
+
+        report = {
+            'events': len(events),
+            'daily': _apply_daily(daily),
+            'subjects': _apply_subjects(subjects) if subjects else 0,
+            'topics': _apply_topics(topics) if topics else 0,
+        }
+        StatsEvent.objects.filter(id__in=[e.id for e in events]).update(rolled_up_at=timezone.now())
+        user_topics = touched_topics(events)
+        transaction.on_commit(lambda: _refresh_analytics(user_topics))
+    return report
+
+
+def touched_topics(events):
+    """[[user_id, [topic_id, ...]], ...] — hodisalardagi userlar va ularning mavzulari"""
+    touched = {}
+    for e in events:
+        touched.setdefault(e.user_id, set()).update(t[0] for t in e.topics or ())
+    return [[user_id, sorted(topic_ids)] for user_id, topic_ids in touched.items()]
+
+
+def _refresh_analytics(user_topics):
+    from .tasks import refresh_user_analytics
+    for start in range(0, len(user_topics), ANALYTICS_CHUNK_SIZE):
+        refresh_user_analytics.delay(user_topics[start:start + ANALYTICS_CHUNK_SIZE])
+
+
+def rollup_stats_events(batch_size=ROLLUP_BATCH_SIZE, max_batches=ROLLUP_MAX_BATCHES):
+    """
+    Yig'ilmagan hodisalarni paketlab yig'ish.
+    Odatda bitta agregator ishlaydi (cache lock) — band bo'lsa None. Lock muddati
+    o'tib ikkinchisi boshlansa ham hodisalar ikki marta sanalmaydi (rollup_batch).
+    Returns: {'events', 'daily', 'subjects', 'topics', 'lag_seconds'}
+    """
+    token = uuid.uuid4().hex
+    if not cache.add(ROLLUP_LOCK_KEY, token, ROLLUP_LOCK_TIMEOUT):
+        return None
+    try:
+        oldest = StatsEvent.objects.filter(rolled_up_at__isnull=True).order_by('id').values_list(
+            'occurred_at', flat=True
+        ).first()
+        total = {'events': 0, 'daily': 0, 'subjects': 0, 'topics': 0}
+        for _ in range(max_batches):
+            report = rollup_batch(batch_size)
+            if report is None:
+                break
+            for field, value in report.items():
+                total[field] += value
+            if report['events'] < batch_size:
+                break
+        total['lag_seconds'] = round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0
+        return total
+    finally:
+        # Faqat o'z lock'ini bo'shatadi (muddati o'tgan bo'lsa — boshqaniki)
+        if cache.get(ROLLUP_LOCK_KEY) == token:
+            cache.delete(ROLLUP_LOCK_KEY)
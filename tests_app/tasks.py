@@ -1,5 +1,6 @@
 from celery import shared_task
 from django.db import transaction
+from django.utils import timezone
 from django.db.models import F
 import logging
 
@@ -10,7 +11,8 @@ logger = logging.getLogger(__name__)
 def update_question_stats(self, question_id, is_correct):
     """
     Savol statistikasini background'da yangilash.
-    test_play_submit da har javobda chaqiriladi — DB lock qilmaydi.
+    Eski navbatdagi xabarlar uchun qoldirilgan — yangi kod
+    tests_app.question_stats.record_question_answers() dan foydalanadi.
     """
     try:
         from tests_app.models import Question
@@ -28,12 +30,85 @@ def update_question_stats(self, question_id, is_correct):
         raise self.retry(exc=exc)
 
 
+@shared_task
+def drain_question_stats():
+    """
+    Redis'da yig'ilgan savol hisoblagichlarini DB ga bitta batch UPDATE bilan yozish.
+    Celery beat tomonidan har 15 soniyada chaqiriladi.
+    """
+    from tests_app.question_stats import drain_question_stats as drain
+    report = drain()
+    if report and report.get('questions'):
+        logger.info(
+            f"drain_question_stats: {report['questions']} savol, {report['answers']} javob, "
+            f"lag={report['lag_seconds']}s, {report['answers_per_sec']} javob/s"
+        )
+    return report
+
+
+@shared_task
+def calibrate_questions():
+    """
+    Savol bankini javoblar matritsasidan IRT bo'yicha kalibrlash (tests_app.calibration).
+    Celery beat tomonidan har kecha chaqiriladi.
+    """
+    from tests_app.calibration import calibrate_question_bank
+    count = calibrate_question_bank()
+    logger.info(f"calibrate_questions: {count} ta savol kalibrlandi")
+    return count
+
+
+@shared_task
+def rollup_stats_events():
+    """
+    Urinish natijalari hodisalarini DailyUserStats, UserSubjectPerformance va
+    UserTopicPerformance ga yig'ish (tests_app.stats_rollup). Celery beat, har daqiqada.
+    """
+    from tests_app.stats_rollup import rollup_stats_events as rollup
+    report = rollup()
+    if report and report.get('events'):
+        logger.info(
+            f"rollup_stats_events: {report['events']} hodisa, {report['daily']} kun, "
+            f"{report['subjects']} fan, {report['topics']} mavzu, lag={report['lag_seconds']}s"
+        )
+    return report
+
+
+@shared_task
+def flush_answer_buffers():
+    """
+    Javob buferini davriy flush qilish (Celery beat, har daqiqada).
+    Jim qolgan yoki tashlab ketilgan urinishlarning javoblari ham DB ga tushadi.
+    """
+    from tests_app.answer_buffer import flush_idle_attempts
+    flushed = flush_idle_attempts()
+    if flushed:
+        logger.info(f"flush_answer_buffers: {flushed} ta urinish yozildi")
+    return flushed
+
+
+@shared_task(time_limit=60 * 30)
+def import_questions_file(job_id, path, subject_id, default_difficulty='medium', user_id=None):
+    """
+    Bulk savol import (manage_bulk_import) — fayl oqim bilan o'qiladi,
+    savollar bo'laklarda bulk_create qilinadi. Jarayon: bulk_import.get_status(job_id).
+    """
+    from tests_app.bulk_import import run_import
+    report = run_import(job_id, path, subject_id, default_difficulty, user_id)
+    logger.info(
+        f"import_questions_file {job_id}: {report['status']}, {report['created']} yaratildi, "
+        f"{report['duplicates']} takror, {report['skipped']} o'tkazildi"
+    )
+    return {k: v for k, v in report.items() if k != 'errors'}
+
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=30)
 def process_user_stats_after_test(self, attempt_id):
     """
     Test tugagandan keyin og'ir ishlarni background'da bajarish:
     - User xp, to'g'ri/noto'g'ri javoblar statistikasi
     - Activity log yozish
+    - Reyting doskalarini yangilash (Redis ZSET)
     - Cache tozalash
     - Analytics yangilash (UserTopicPerformance, UserSubjectPerformance, WeakTopicAnalysis)
     User bularni kutmasdan natija sahifasini ko'radi.
@@ -71,9 +146,14 @@ def process_user_stats_after_test(self, attempt_id):
         # User natijalar cache ni tozalash
         invalidate_results_cache.delay(user.id)
 
-        # Leaderboard cache ham yangilanishi kerak
-        from leaderboard.tasks import invalidate_leaderboard_cache
-        invalidate_leaderboard_cache.delay()
+        # Reyting: inkremental ZSET yangilash (top-100 qayta hisoblanmaydi)
+        from leaderboard.ranking import record_test_result
+        xp_total = user.__class__.objects.filter(id=user.id).values_list('xp_points', flat=True).first() or 0
+        record_test_result(
+            user.id, attempt.xp_earned, xp_total,
+            subject_id=attempt.test.subject_id,
+            day=timezone.localdate(attempt.started_at),
+        )
 
         # Analytics yangilash (mavzu, fan, sust mavzular, DTM ball)
         update_user_analytics.delay(attempt_id)
@@ -88,107 +168,56 @@ def process_user_stats_after_test(self, attempt_id):
 @shared_task(bind=True, max_retries=2, default_retry_delay=60)
 def update_user_analytics(self, attempt_id):
     """
-    Test natijasidan keyin barcha user analytics modellarini yangilash:
-    1. UserTopicPerformance — har bir mavzu uchun
-    2. UserSubjectPerformance — fan uchun
-    3. WeakTopicAnalysis — sust mavzularni aniqlash va saqlash
-    4. UserAnalyticsSummary — predicted_dtm_score va umumiy ko'rsatkichlar
+    Test natijasidan keyin user analytics:
+    1. UserTopicPerformance, UserSubjectPerformance — rollup_stats_events (beat) StatsEvent dan yozadi
+    2. WeakTopicAnalysis, UserAnalyticsSummary — shu rollup'dan keyin refresh_user_analytics
+    3. Agar DTM test bo'lsa — AI universitet tavsiyasi
     """
     try:
-        from tests_app.models import (
-            TestAttempt, AttemptAnswer,
-            UserTopicPerformance, UserSubjectPerformance, UserAnalyticsSummary
-        )
-        from ai_core.models import WeakTopicAnalysis
-        from django.utils import timezone
+        from tests_app.models import TestAttempt
 
-        attempt = TestAttempt.objects.select_related(
-            'user', 'test', 'test__subject'
-        ).get(id=attempt_id)
+        attempt = TestAttempt.objects.select_related('user', 'test').get(id=attempt_id)
         user = attempt.user
-        subject = attempt.test.subject if attempt.test else None
 
-        # Javoblarni mavzu bo'yicha guruhlash
-        answers = AttemptAnswer.objects.filter(attempt=attempt).select_related(
-            'question__topic', 'question__subject'
-        )
+        # --- DTM test — AI universitet tavsiyasi ---
+        test_type = attempt.test.test_type if attempt.test else None
+        if test_type in ('exam', 'block') and attempt.percentage >= 40:
+            from ai_core.tasks import generate_university_recommendation
+            generate_university_recommendation.delay(user.id, attempt_id)
+
+        logger.info(f"update_user_analytics OK: attempt_id={attempt_id}, user={user.id}")
+
+    except Exception as exc:
+        logger.error(f"update_user_analytics xato: attempt_id={attempt_id}, {exc}")
+        raise self.retry(exc=exc)
+
+
+@shared_task
+def refresh_user_analytics(user_topics):
+    """
+    Rollup yozgan mavzu/fan natijalari bo'yicha sust mavzular va UserAnalyticsSummary.
+    user_topics: [[user_id, [topic_id, ...]], ...] — stats_rollup.rollup_batch dan keyin.
+    """
+    from accounts.models import User
+
+    users = User.objects.in_bulk([user_id for user_id, _ in user_topics])
+    for user_id, topic_ids in user_topics:
+        user = users.get(user_id)
+        if user is None:
+            continue
+        _update_weak_topics(user, topic_ids)
+        _update_analytics_summary(user)
+
+
+def _update_weak_topics(user, topic_ids):
+    """WeakTopicAnalysis — shu urinishlarda ishlangan mavzular bo'yicha"""
+    try:
+        from tests_app.models import UserTopicPerformance
+        from ai_core.models import WeakTopicAnalysis
 
-        topic_data = {}  # {topic_id: {'topic': obj, 'subject': obj, 'correct': int, 'total': int, 'time': int}}
-        for ans in answers:
-            topic = ans.question.topic
-            if not topic:
-                continue
-            subj = ans.question.subject
-            tid = topic.id
-            if tid not in topic_data:
-                topic_data[tid] = {
-                    'topic': topic,
-                    'subject': subj,
-                    'correct': 0,
-                    'total': 0,
-                    'time': 0,
-                }
-            topic_data[tid]['total'] += 1
-            topic_data[tid]['time'] += ans.time_spent
-            if ans.is_correct:
-                topic_data[tid]['correct'] += 1
-
-        # --- 1. UserTopicPerformance yangilash ---
-        for tid, data in topic_data.items():
-            perf, _ = UserTopicPerformance.objects.get_or_create(
-                user=user,
-                topic=data['topic'],
-                defaults={'subject': data['subject']}
-            )
-            perf.total_questions = F('total_questions') + data['total']
-            perf.correct_answers = F('correct_answers') + data['correct']
-            perf.wrong_answers = F('wrong_answers') + (data['total'] - data['correct'])
-            perf.total_time_spent = F('total_time_spent') + data['time']
-            perf.last_practiced = timezone.now()
-            perf.save(update_fields=[
-                'total_questions', 'correct_answers', 'wrong_answers',
-                'total_time_spent', 'last_practiced'
-            ])
-            # Refresh va update_stats chaqirish
-            perf.refresh_from_db()
-            perf.update_stats()
-
-        # --- 2. UserSubjectPerformance yangilash ---
-        if subject:
-            subj_perf, _ = UserSubjectPerformance.objects.get_or_create(
-                user=user,
-                subject=subject
-            )
-            subj_perf.total_tests = F('total_tests') + 1
-            subj_perf.total_questions = F('total_questions') + attempt.total_questions
-            subj_perf.correct_answers = F('correct_answers') + attempt.correct_answers
-            subj_perf.total_time_spent = F('total_time_spent') + attempt.time_spent
-            subj_perf.last_practiced = timezone.now()
-            subj_perf.save(update_fields=[
-                'total_tests', 'total_questions', 'correct_answers',
-                'total_time_spent', 'last_practiced'
-            ])
-            subj_perf.refresh_from_db()
-
-            # average_score, best_score, last_score, predicted_dtm_score
-            if subj_perf.total_questions > 0:
-                new_avg = round((subj_perf.correct_answers / subj_perf.total_questions) * 100, 1)
-                subj_perf.average_score = new_avg
-                subj_perf.last_score = attempt.percentage
-                if attempt.percentage > subj_perf.best_score:
-                    subj_perf.best_score = attempt.percentage
-                # DTM bali: fan uchun o'rtacha ball × 0.3 (balllar tizimi: 30 ball = 100%)
-                subj_perf.predicted_dtm_score = round(new_avg * 0.3, 1)
-                subj_perf.save(update_fields=[
-                    'average_score', 'best_score', 'last_score', 'predicted_dtm_score'
-                ])
-
-        # --- 3. WeakTopicAnalysis yangilash ---
-        # Faqat kamida 5 ta savol ishlangan mavzularni tekshirish
         weak_threshold = 65.0  # 65% dan past = kuchsiz mavzu
-        for tid, data in topic_data.items():
-            perf = UserTopicPerformance.objects.filter(user=user, topic_id=tid).first()
-            if not perf or perf.total_questions < 5:
+        for perf in UserTopicPerformance.objects.filter(user=user, topic_id__in=topic_ids):
+            if perf.total_questions < 5:
                 continue  # Yetarli data yo'q
 
             accuracy = perf.current_score  # update_stats() dan keyin
@@ -198,9 +227,9 @@ def update_user_analytics(self, attempt_id):
                 priority = round((weak_threshold - accuracy) / weak_threshold * 10, 1)
                 WeakTopicAnalysis.objects.update_or_create(
                     user=user,
-                    topic=data['topic'],
+                    topic_id=perf.topic_id,
                     defaults={
-                        'subject': data['subject'],
+                        'subject_id': perf.subject_id,
                         'total_questions': perf.total_questions,
                         'correct_answers': perf.correct_answers,
                         'accuracy_rate': accuracy,
@@ -209,22 +238,10 @@ def update_user_analytics(self, attempt_id):
                 )
             else:
                 # Endi kuchsiz emas — o'chirish
-                WeakTopicAnalysis.objects.filter(user=user, topic_id=tid).delete()
-
-        # --- 4. UserAnalyticsSummary yangilash ---
-        _update_analytics_summary(user)
-
-        # --- 5. Agar DTM test bo'lsa — AI universitet tavsiyasi ---
-        test_type = attempt.test.test_type if attempt.test else None
-        if test_type in ('exam', 'block') and attempt.percentage >= 40:
-            from ai_core.tasks import generate_university_recommendation
-            generate_university_recommendation.delay(user.id, attempt_id)
-
-        logger.info(f"update_user_analytics OK: attempt_id={attempt_id}, user={user.id}, topics={len(topic_data)}")
+                WeakTopicAnalysis.objects.filter(user=user, topic_id=perf.topic_id).delete()
 
-    except Exception as exc:
-        logger.error(f"update_user_analytics xato: attempt_id={attempt_id}, {exc}")
-        raise self.retry(exc=exc)
+    except Exception as e:
+        logger.error(f"_update_weak_topics xato: user={user.id}, {e}")
 
 
 def _update_analytics_summary(user):
@@ -1,3 +1,426 @@
-from django.test import TestCase
+"""
+TestMakon.uz - Tests App Tests
+Test ishlash oqimi (test_play) uchun testlar
+"""
 
-# Create your tests here.
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .answer_buffer import flush_attempt_answers, load_answer_key
+from .attempt_snapshot import get_attempt_order, load_attempt_snapshot
+from .models import (
+    Answer, AttemptAnswer, DailyUserStats, Question, SavedQuestion, StatsEvent,
+    Subject, Test, TestAttempt, TestQuestion, Topic, UserSubjectPerformance,
+    UserTopicPerformance,
+)
+
+User = get_user_model()
+
+
+class BaseTestCase(TestCase):
+    """Umumiy setup: fan, 6 ta savol, test va boshlangan urinish"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            phone_number='+998901112233',
+            password='testpass123',
+            first_name='Ali',
+        )
+        self.subject = Subject.objects.create(name='Matematika', slug='matematika')
+        self.test = Test.objects.create(
+            title='Practice - Matematika',
+            slug='practice-test',
+            subject=self.subject,
+            time_limit=0,
+            shuffle_answers=True,
+        )
+        self.questions = []
+        for i in range(6):
+            q = Question.objects.create(subject=self.subject, text=f'Savol {i}')
+            for j in range(4):
+                Answer.objects.create(question=q, text=f'Javob {j}', is_correct=(j == 0), order=j)
+            TestQuestion.objects.create(test=self.test, question=q, order=i)
+            self.questions.append(q)
+        self.attempt = TestAttempt.objects.create(
+            user=self.user,
+            test=self.test,
+            total_questions=6,
+            status='in_progress',
+        )
+
+    def login(self):
+        self.client.login(username=self.user.phone_number, password='testpass123')
+
+
+class AttemptSnapshotTest(BaseTestCase):
+    """load_attempt_snapshot — bulk so'rovlar va muzlatilgan tartib"""
+
+    def test_snapshot_marks_answers_and_bookmarks(self):
+        """User javobi va bookmark to'g'ri belgilanadi"""
+        q = self.questions[2]
+        AttemptAnswer.objects.create(
+            attempt=self.attempt, question=q,
+            selected_answer=q.answers.first(), is_correct=True,
+        )
+        SavedQuestion.objects.create(user=self.user, question=self.questions[4])
+
+        data = load_attempt_snapshot(self.attempt, self.user)
+        self.assertEqual([item['question'].id for item in data], [q.id for q in self.questions])
+        self.assertEqual(data[2]['status'], 'answered')
+        self.assertEqual(data[0]['status'], 'unanswered')
+        self.assertTrue(data[4]['is_bookmarked'])
+        self.assertFalse(data[3]['is_bookmarked'])
+        self.assertTrue(all(len(item['answers']) == 4 for item in data))
+
+    def test_fixed_query_count(self):
+        """Tartib cache'da bo'lsa — savollar sonidan qat'i nazar 4 ta so'rov"""
+        get_attempt_order(self.attempt)
+        with self.assertNumQueries(4):
+            load_attempt_snapshot(self.attempt, self.user)
+
+    def test_answer_order_frozen_between_reloads(self):
+        """Sahifa qayta yuklanganda javoblar tartibi o'zgarmaydi"""
+        self.login()
+        url = reverse('tests_app:test_play', kwargs={'uuid': self.attempt.uuid})
+        first = self.client.get(url).context['questions_data']
+        second = self.client.get(url).context['questions_data']
+        self.assertEqual(
+            [[a.id for a in item['answers']] for item in first],
+            [[a.id for a in item['answers']] for item in second],
+        )
+
+    def test_navigate_returns_question_id(self):
+        """api_navigate muzlatilgan tartibdan savol ID sini qaytaradi"""
+        self.login()
+        response = self.client.get(
+            reverse('tests_app:api_navigate', kwargs={'uuid': self.attempt.uuid}),
+            {'index': 3},
+        )
+        self.assertEqual(response.json()['question_id'], self.questions[3].id)
+
+
+class AnswerBufferTest(BaseTestCase):
+    """test_play_submit — write-behind javob buferi"""
+
+    def submit(self, question, answer):
+        return self.client.post(
+            reverse('tests_app:test_play_submit', kwargs={'uuid': self.attempt.uuid}),
+            data=json.dumps({'question_id': question.id, 'answer_id': answer.id if answer else None}),
+            content_type='application/json',
+        )
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.login()
+
+    def test_submit_buffers_without_db_write(self):
+        """Javob buferga tushadi, AttemptAnswer hali yaratilmaydi"""
+        q = self.questions[0]
+        data = self.submit(q, q.answers.get(is_correct=True)).json()
+        self.assertTrue(data['is_correct'])
+        self.assertEqual(data['correct_answer_id'], q.answers.get(is_correct=True).id)
+        self.assertFalse(AttemptAnswer.objects.filter(attempt=self.attempt).exists())
+
+    def test_submit_uses_no_sql_with_cached_key(self):
+        """Javob kaliti cache'da bo'lsa — test jadvallariga SQL so'rov yo'q"""
+        load_answer_key(self.attempt)
+        q = self.questions[1]
+        answer = q.answers.get(order=1)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.submit(q, answer)
+        self.assertEqual(response.status_code, 200)
+        # Faqat auth/sessiya so'rovlari qoladi
+        self.assertFalse([c['sql'] for c in ctx.captured_queries if 'tests_app_' in c['sql']])
+
+    def test_answer_from_other_question_rejected(self):
+        """Boshqa savolning javobi — 404"""
+        response = self.submit(self.questions[0], self.questions[1].answers.first())
+        self.assertEqual(response.status_code, 404)
+
+    def test_finish_flushes_buffer(self):
+        """test_play_finish buferni bulk yozadi va natijani hisoblaydi"""
+        for q in self.questions[:3]:
+            self.submit(q, q.answers.get(is_correct=True))
+        self.submit(self.questions[3], self.questions[3].answers.get(order=2))
+        self.client.get(reverse('tests_app:test_play_finish', kwargs={'uuid': self.attempt.uuid}))
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(AttemptAnswer.objects.filter(attempt=self.attempt).count(), 4)
+        self.assertEqual(self.attempt.correct_answers, 3)
+        self.assertEqual(self.attempt.wrong_answers, 1)
+
+    def test_flush_is_idempotent_and_updates_changed_answer(self):
+        """Qayta flush dublikat yaratmaydi, o'zgargan javob yangilanadi"""
+        q = self.questions[0]
+        self.submit(q, q.answers.get(order=1))
+        self.assertEqual(flush_attempt_answers(self.attempt), 1)
+        self.submit(q, q.answers.get(is_correct=True))
+        self.assertEqual(flush_attempt_answers(self.attempt), 0)
+
+        answer = AttemptAnswer.objects.get(attempt=self.attempt, question=q)
+        self.assertTrue(answer.is_correct)
+
+    def test_answer_buffered_during_flush_is_flushed_later(self):
+        """Flush paytida kelgan javob keyingi davriy flush'da yoziladi"""
+        from unittest.mock import patch
+        from . import answer_buffer
+
+        q1, q2 = self.questions[0], self.questions[1]
+        self.submit(q1, q1.answers.first())
+        original = answer_buffer._log_created_answers
+
+        def submit_during_flush(attempt, created):
+            self.submit(q2, q2.answers.first())
+            original(attempt, created)
+
+        with patch.object(answer_buffer, '_log_created_answers', side_effect=submit_during_flush):
+            flush_attempt_answers(self.attempt)
+        self.assertFalse(AttemptAnswer.objects.filter(attempt=self.attempt, question=q2).exists())
+
+        with patch.object(answer_buffer, 'ANSWER_BUFFER_IDLE_SECONDS', 0):
+            self.assertEqual(answer_buffer.flush_idle_attempts(), 1)
+        self.assertTrue(AttemptAnswer.objects.filter(attempt=self.attempt, question=q2).exists())
+
+    def test_reload_shows_buffered_answer(self):
+        """Sahifa qayta yuklanganda buferdagi javob belgilangan"""
+        q = self.questions[5]
+        self.submit(q, q.answers.first())
+        data = load_attempt_snapshot(self.attempt, self.user)
+        self.assertEqual(data[5]['status'], 'answered')
+
+
+class QuestionStatsPipelineTest(BaseTestCase):
+    """Savol hisoblagichlari — agregatsiya va batch UPDATE"""
+
+    def test_apply_counts_single_update(self):
+        """Bir nechta savol bitta UPDATE bilan yangilanadi"""
+        from .question_stats import apply_question_counts
+        q1, q2 = self.questions[0], self.questions[1]
+        with CaptureQueriesContext(connection) as ctx:
+            apply_question_counts({q1.id: [3, 2], q2.id: [1, 0]})
+        self.assertEqual(len([c for c in ctx.captured_queries if c['sql'].startswith('UPDATE')]), 1)
+        q1.refresh_from_db()
+        q2.refresh_from_db()
+        self.assertEqual((q1.times_answered, q1.times_correct), (3, 2))
+        self.assertEqual((q2.times_answered, q2.times_correct), (1, 0))
+
+    def test_record_aggregates_duplicate_questions(self):
+        """Bir savolga bir nechta javob — bitta hisoblagichga yig'iladi"""
+        from .question_stats import record_question_answers
+        q = self.questions[0]
+        record_question_answers([(q.id, True), (q.id, False), (q.id, True)])
+        q.refresh_from_db()
+        self.assertEqual((q.times_answered, q.times_correct), (3, 2))
+
+    def test_flush_records_stats_for_new_answers(self):
+        """Bufer flush bo'lganda faqat yangi javoblar statistikaga qo'shiladi"""
+        self.login()
+        q = self.questions[2]
+        self.client.post(
+            reverse('tests_app:test_play_submit', kwargs={'uuid': self.attempt.uuid}),
+            data=json.dumps({'question_id': q.id, 'answer_id': q.answers.get(is_correct=True).id}),
+            content_type='application/json',
+        )
+        flush_attempt_answers(self.attempt)
+        flush_attempt_answers(self.attempt)
+        q.refresh_from_db()
+        self.assertEqual((q.times_answered, q.times_correct), (1, 1))
+
+
+class CalibrationTest(BaseTestCase):
+    """IRT kalibrlash — chunk bo'yicha o'qish, bulk yozish, qiyinlik bucket'lari"""
+
+    def _answer(self, attempts, correct_for):
+        """correct_for(k, i) — k-urinishda i-savol to'g'rimi"""
+        rows = []
+        for k in range(attempts):
+            attempt = TestAttempt.objects.create(user=self.user, test=self.test, status='completed')
+            for i, q in enumerate(self.questions):
+                rows.append(AttemptAnswer(attempt=attempt, question=q, is_correct=correct_for(k, i)))
+        AttemptAnswer.objects.bulk_create(rows)
+
+    def test_calibration_orders_questions_by_difficulty(self):
+        from .calibration import calibrate_question_bank
+        # i-savolni faqat k >= i*8 bo'lgan (kuchliroq) urinishlar to'g'ri yechadi
+        self._answer(48, lambda k, i: k >= i * 8)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(calibrate_question_bank(chunk_size=50), 6)
+        updates = [c for c in ctx.captured_queries if c['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+        params = dict(Question.objects.filter(subject=self.subject).values_list('id', 'irt_difficulty'))
+        b = [params[q.id] for q in self.questions]
+        self.assertEqual(b, sorted(b))
+        self.assertEqual(Question.objects.get(id=self.questions[0].id).difficulty, 'easy')
+        self.assertIn(Question.objects.get(id=self.questions[5].id).difficulty, ('hard', 'expert'))
+
+    def test_chunked_reading_matches_single_pass(self):
+        from .calibration import accumulate, iter_responses
+        self._answer(5, lambda k, i: (k + i) % 3 == 0)
+        qs = AttemptAnswer.objects.all()
+        self.assertEqual(accumulate(iter_responses(qs, 7)), accumulate(iter_responses(qs, 1000)))
+
+
+class StatsRollupTest(BaseTestCase):
+    """Natija hodisalari — append-only jurnal va paketli agregator"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.topic = Topic.objects.create(subject=self.subject, name='Algebra', slug='algebra')
+        Question.objects.filter(id__in=[q.id for q in self.questions[:4]]).update(topic=self.topic)
+
+    def _complete(self, correct):
+        AttemptAnswer.objects.bulk_create([
+            AttemptAnswer(attempt=self.attempt, question=q, is_correct=i < correct, time_spent=10)
+            for i, q in enumerate(self.questions)
+        ])
+        self.attempt.correct_answers = correct
+        self.attempt.wrong_answers = 6 - correct
+        self.attempt.percentage = round(correct / 6 * 100, 1)
+        self.attempt.xp_earned = correct * 10
+        self.attempt.status = 'completed'
+        self.attempt.completed_at = timezone.now()
+        self.attempt.save()
+
+    def test_events_rolled_up_into_all_tables(self):
+        from .stats_rollup import record_stats_event, rollup_stats_events
+        self._complete(correct=3)
+        self.attempt.save()  # qayta save — ikkinchi hodisa yozilmaydi
+        record_stats_event(
+            self.user.id, 'cert', 1, subject_id=self.subject.id,
+            questions=10, correct=8, wrong=2, xp=24, score=80,
+            topics=[[self.topic.id, self.subject.id, 2, 2, 0]],
+        )
+        self.assertEqual(StatsEvent.objects.count(), 2)
+
+        report = rollup_stats_events()
+        self.assertEqual(report['events'], 2)
+        self.assertEqual(rollup_stats_events()['events'], 0)
+
+        daily = DailyUserStats.objects.get(user=self.user)
+        self.assertEqual(
+            (daily.tests_taken, daily.questions_answered, daily.correct_answers, daily.xp_earned),
+            (2, 16, 11, 54),
+        )
+        self.assertEqual(daily.subjects_practiced, {'matematika': {'correct': 11, 'total': 16}})
+        self.assertEqual(sum(daily.activity_hours.values()), 2)
+
+        subject_perf = UserSubjectPerformance.objects.get(user=self.user, subject=self.subject)
+        self.assertEqual((subject_perf.total_tests, subject_perf.best_score, subject_perf.last_score), (2, 80, 80))
+
+        topic_perf = UserTopicPerformance.objects.get(user=self.user, topic=self.topic)
+        self.assertEqual((topic_perf.total_questions, topic_perf.correct_answers), (6, 5))
+        self.assertEqual(topic_perf.total_time_spent, 40)
+
+    def test_rollup_queries_do_not_grow_with_events(self):
+        from .stats_rollup import record_stats_event, rollup_batch
+
+        def count_queries(offset, events):
+            for i in range(events):
+                record_stats_event(
+                    self.user.id, 'competition', offset + i, subject_id=self.subject.id,
+                    questions=5, correct=i % 5, topics=[[self.topic.id, self.subject.id, 5, i % 5, 0]],
+                )
+            with CaptureQueriesContext(connection) as ctx:
+                rollup_batch()
+            return len(ctx.captured_queries)
+
+        self.assertEqual(count_queries(0, 3), count_queries(100, 30))
+        self.assertEqual(DailyUserStats.objects.get(user=self.user).tests_taken, 33)
+
+    def test_rollup_refreshes_weak_topics_and_summary(self):
+        """Sust mavzular va summary rollup yozgan natijalar bo'yicha yangilanadi"""
+        from ai_core.models import WeakTopicAnalysis
+        from .models import UserAnalyticsSummary
+        from .stats_rollup import record_stats_event, rollup_stats_events
+        record_stats_event(
+            self.user.id, 'cert', 1, subject_id=self.subject.id, questions=6, correct=1, wrong=5,
+            topics=[[self.topic.id, self.subject.id, 6, 1, 0]],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rollup_stats_events()
+
+        weak = WeakTopicAnalysis.objects.get(user=self.user, topic=self.topic)
+        self.assertEqual((weak.total_questions, weak.correct_answers), (6, 1))
+        self.assertTrue(UserAnalyticsSummary.objects.filter(user=self.user).exists())
+
+    def test_expired_lock_of_another_runner_is_kept(self):
+        """Lock muddati o'tib boshqa agregator olgan bo'lsa — uni o'chirmaydi"""
+        from unittest.mock import patch
+        from . import stats_rollup
+
+        def lock_taken_over(batch_size):
+            cache.set(stats_rollup.ROLLUP_LOCK_KEY, 'other')
+            return None
+
+        with patch.object(stats_rollup, 'rollup_batch', side_effect=lock_taken_over):
+            stats_rollup.rollup_stats_events()
+        self.assertEqual(cache.get(stats_rollup.ROLLUP_LOCK_KEY), 'other')
+        cache.delete(stats_rollup.ROLLUP_LOCK_KEY)
+
+
+class BulkImportTest(BaseTestCase):
+    """Bulk savol import: oqim, bo'lakli bulk_create, takrorlarni tashlash"""
+
+    CSV = (
+        'question_text,option_a,option_b,option_c,option_d,correct_answer,difficulty,topic_name\n'
+        'Yangi savol?,1,2,3,4,B,easy,Algebra\n'
+        '  savol 0 ,1,2,,,A,,\n'
+        "Xato javob?,1,2,,,E,,\n"
+        'Yana savol?,1,2,3,,C,expert,algebra\n'
+    )
+
+    def setUp(self):
+        super().setUp()
+        import tempfile
+        from django.test import override_settings
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user.is_staff = True
+        self.user.save()
+
+    def test_import_rows_dedups_and_uses_few_queries(self):
+        """Mavjud matn takrorlanmaydi, mavzu bir marta yaratiladi, so'rovlar qator soniga bog'liq emas"""
+        import io
+        from .bulk_import import import_rows, iter_rows
+
+        with CaptureQueriesContext(connection) as ctx:
+            report = import_rows(iter_rows(io.BytesIO(self.CSV.encode()), 'q.csv'), self.subject)
+
+        self.assertEqual((report['created'], report['duplicates'], report['skipped']), (2, 1, 1))
+        self.assertLessEqual(len(ctx.captured_queries), 10)
+        new = Question.objects.filter(subject=self.subject, topic__isnull=False)
+        self.assertEqual(new.count(), 2)
+        self.assertEqual(new.values('topic').distinct().count(), 1)
+        self.assertEqual(Answer.objects.filter(question__in=new, is_correct=True).count(), 2)
+
+    def test_upload_runs_job_and_reports_status(self):
+        """POST faylni Celery job'ga beradi, status endpoint natijani qaytaradi"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        self.login()
+        response = self.client.post(reverse('tests_app:manage_bulk_import'), {
+            'subject_id': self.subject.id,
+            'difficulty': 'medium',
+            'file': SimpleUploadedFile('savollar.csv', self.CSV.encode('utf-8-sig')),
+        })
+        self.assertEqual(response.status_code, 302)
+        job_id = response['Location'].split('job=')[1]
+
+        status = self.client.get(reverse('tests_app:manage_bulk_import_status', args=[job_id])).json()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['total'], 4)
+        self.assertEqual(status['created'], 2)
+        self.assertEqual(len(status['errors']), 1)
@@ -112,6 +112,7 @@ urlpatterns = [
     # ==========================================
     path('manage/import/', views.manage_bulk_import, name='manage_bulk_import'),
     path('manage/import/sample/', views.manage_download_sample_csv, name='manage_download_sample_csv'),
+    path('manage/import/status/<str:job_id>/', views.manage_bulk_import_status, name='manage_bulk_import_status'),
 
     # ==========================================
     # ESKI URL LAR (backward compatibility)
@@ -6,11 +6,12 @@ Professional Question Bank + Test System (OnePrep Style)
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.utils import timezone
 from django.db.models import Avg, Count, Q, Sum, F, Max
 from django.views.decorators.http import require_POST, require_GET
 from django.core.paginator import Paginator
+from django.urls import reverse
 from datetime import timedelta
 import random
 import json
@@ -21,7 +22,12 @@ from .models import (
     UserTopicPerformance, UserSubjectPerformance,
     DailyUserStats, UserActivityLog
 )
-from .tasks import update_question_stats, process_user_stats_after_test
+from .tasks import process_user_stats_after_test
+from .attempt_snapshot import load_attempt_snapshot, get_attempt_order, clear_attempt_order
+from .answer_buffer import (
+    get_answer_key, load_answer_key, buffer_answer,
+    flush_attempt_answers, finalize_attempt_answers,
+)
 
 
 # ============================================================
@@ -414,40 +420,9 @@ def test_play(request, uuid):
     if attempt.status == 'completed':
         return redirect('tests_app:test_play_result', uuid=uuid)
 
-    # Test va savollar
+    # Test va savollar — muzlatilgan tartib + bulk so'rovlar
     test = attempt.test
-    test_questions = TestQuestion.objects.filter(
-        test=test
-    ).select_related('question').order_by('order')
-
-    questions_data = []
-    for i, tq in enumerate(test_questions):
-        q = tq.question
-        answers = list(q.answers.all().order_by('order'))
-
-        if test.shuffle_answers:
-            random.shuffle(answers)
-
-        # User javobini tekshirish
-        user_answer = AttemptAnswer.objects.filter(
-            attempt=attempt,
-            question=q
-        ).first()
-
-        # Bookmark tekshirish
-        is_bookmarked = SavedQuestion.objects.filter(
-            user=request.user,
-            question=q
-        ).exists()
-
-        questions_data.append({
-            'index': i,
-            'question': q,
-            'answers': answers,
-            'user_answer': user_answer,
-            'is_bookmarked': is_bookmarked,
-            'status': 'answered' if user_answer else 'unanswered',
-        })
+    questions_data = load_attempt_snapshot(attempt, request.user)
 
     # Vaqt hisoblash
     if test.time_limit > 0:
@@ -478,48 +453,42 @@ def test_play(request, uuid):
 @require_POST
 def test_play_submit(request, uuid):
     """
-    AJAX orqali javob yuborish
+    AJAX orqali javob yuborish.
+    Javob write-behind buferga yoziladi, to'g'riligi cache'dagi javob kaliti
+    bo'yicha aniqlanadi — odatiy holatda SQL so'rov yo'q. AttemptAnswer ga
+    test_play_finish da yoki davriy flush task'da bulk yoziladi.
     """
-    attempt = get_object_or_404(
-        TestAttempt,
-        uuid=uuid,
-        user=request.user,
-        status='in_progress'
-    )
+    answer_key = get_answer_key(uuid, request.user.id)
+    if answer_key is None:
+        attempt = get_object_or_404(
+            TestAttempt,
+            uuid=uuid,
+            user=request.user,
+            status='in_progress'
+        )
+        answer_key = load_answer_key(attempt)
 
     try:
         data = json.loads(request.body)
-        question_id = data.get('question_id')
-        answer_id = data.get('answer_id')
-        time_spent = data.get('time_spent', 0)
+        question_id = int(data.get('question_id'))
+        answer_id = int(data['answer_id']) if data.get('answer_id') else None
+        time_spent = int(data.get('time_spent') or 0)
         current_index = data.get('current_index', 0)
     except:
         return JsonResponse({'success': False, 'error': 'Invalid data'}, status=400)
 
-    question = get_object_or_404(Question, id=question_id)
-
     # Javob null bo'lishi mumkin (skip)
-    selected_answer = None
-    is_correct = False
-
-    if answer_id:
-        selected_answer = get_object_or_404(Answer, id=answer_id)
-        is_correct = selected_answer.is_correct
-
-    # Javobni saqlash yoki yangilash
-    attempt_answer, created = AttemptAnswer.objects.update_or_create(
-        attempt=attempt,
-        question=question,
-        defaults={
-            'selected_answer': selected_answer,
-            'is_correct': is_correct,
-            'time_spent': time_spent,
-        }
-    )
-
-    # Question statistikasini background'da yangilash (DB lock qilmaydi)
-    if created:
-        update_question_stats.delay(question.id, is_correct)
+    result = buffer_answer(uuid, answer_key, question_id, answer_id, time_spent)
+    if result is None:
+        raise Http404("Savol yoki javob bu urinishga tegishli emas")
+    is_correct, correct_answer_id = result
+
+    # Imtihonga bog'langan test — live reyting proyeksiyasini yangilash
+    # (faqat imtihon ishtirokchilari — boshqalar reytingga tushmaydi)
+    from competitions.exam_standings import exam_for_test, is_participant, record_answer
+    exam = exam_for_test(answer_key.get('test_id'))
+    if exam and is_participant(exam['id'], request.user.id):
+        record_answer(exam, request.user, question_id, is_correct)
 
     # Session da joriy indexni saqlash
     request.session[f'attempt_{uuid}_current'] = current_index
@@ -527,8 +496,7 @@ def test_play_submit(request, uuid):
     return JsonResponse({
         'success': True,
         'is_correct': is_correct,
-        'correct_answer_id': question.answers.filter(is_correct=True).first().id if question.answers.filter(
-            is_correct=True).exists() else None,
+        'correct_answer_id': correct_answer_id,
     })
 
 
@@ -546,6 +514,9 @@ def test_play_finish(request, uuid):
     if attempt.status == 'completed':
         return redirect('tests_app:test_play_result', uuid=uuid)
 
+    # Buferdagi javoblarni DB ga yozish
+    finalize_attempt_answers(attempt)
+
     # Natijalarni hisoblash
     answers = AttemptAnswer.objects.filter(attempt=attempt)
 
@@ -582,10 +553,11 @@ def test_play_finish(request, uuid):
         from ai_core.tasks import generate_dtm_advice
         generate_dtm_advice.delay(attempt.id)
 
-    # Session tozalash
+    # Session va muzlatilgan tartibni tozalash
     session_key = f'attempt_{uuid}_current'
     if session_key in request.session:
         del request.session[session_key]
+    clear_attempt_order(attempt)
 
     return redirect('tests_app:test_play_result', uuid=uuid)
 
@@ -1041,6 +1013,9 @@ def api_test_status(request, uuid):
         user=request.user
     )
 
+    # Buferdagi javoblar ham hisobga kirsin
+    flush_attempt_answers(attempt)
+
     answers = AttemptAnswer.objects.filter(attempt=attempt)
     answered_count = answers.count()
     correct_count = answers.filter(is_correct=True).count()
@@ -1098,7 +1073,11 @@ def api_navigate(request, uuid):
     # Session ga saqlash
     request.session[f'attempt_{uuid}_current'] = index
 
-    return JsonResponse({'success': True, 'current_index': index})
+    # Savol ID si muzlatilgan tartibdan (cache) — qayta qurilmaydi
+    order = get_attempt_order(attempt)
+    question_id = order[index][0] if 0 <= index < len(order) else None
+
+    return JsonResponse({'success': True, 'current_index': index, 'question_id': question_id})
 
 
 @login_required
@@ -1145,6 +1124,8 @@ def api_time_sync(request, uuid):
         if remaining <= 0 and attempt.status == 'in_progress':
             attempt.status = 'timeout'
             attempt.save(update_fields=['status'])
+            # Javob kaliti o'chiriladi — vaqt tugagach javob qabul qilinmaydi
+            finalize_attempt_answers(attempt)
             return JsonResponse({
                 'remaining': 0,
                 'timeout': True,
@@ -2054,12 +2035,21 @@ def manage_test_delete(request, slug):
 
 @staff_member_required
 def manage_bulk_import(request):
-    """Staff: CSV yoki Excel orqali ko'plab savollarni yuklash."""
+    """
+    Staff: CSV yoki Excel orqali ko'plab savollarni yuklash.
+    Fayl saqlanadi va Celery job'da oqim bilan import qilinadi (bulk_import.py),
+    sahifa ?job=<id> bilan jarayonni ko'rsatadi.
+    """
+    from .bulk_import import SUPPORTED_EXTENSIONS, get_status, save_upload, start_job
+    from .tasks import import_questions_file
+
     subjects = Subject.objects.filter(is_active=True).order_by('name')
 
     if request.method == 'GET':
+        job_id = request.GET.get('job')
         return render(request, 'tests_app/manage/bulk_import.html', {
             'subjects': subjects,
+            'job': get_status(job_id) if job_id else None,
         })
 
     # POST — fayl yuklash
@@ -2072,112 +2062,27 @@ def manage_bulk_import(request):
         return render(request, 'tests_app/manage/bulk_import.html', {'subjects': subjects})
 
     subject = get_object_or_404(Subject, id=subject_id)
-    fname = uploaded.name.lower()
-
-    rows = []
-    error_msg = None
-
-    if fname.endswith('.csv'):
-        import csv, io
-        try:
-            decoded = uploaded.read().decode('utf-8-sig')
-            reader = csv.DictReader(io.StringIO(decoded))
-            rows = list(reader)
-        except Exception as e:
-            error_msg = f"CSV o'qishda xato: {e}"
-
-    elif fname.endswith(('.xlsx', '.xls')):
-        try:
-            import openpyxl
-            wb = openpyxl.load_workbook(uploaded, read_only=True, data_only=True)
-            ws = wb.active
-            headers = [str(c.value).strip().lower() if c.value else '' for c in next(ws.iter_rows(min_row=1, max_row=1))]
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                rows.append({headers[i]: (str(v).strip() if v is not None else '') for i, v in enumerate(row)})
-        except ImportError:
-            error_msg = "Excel uchun openpyxl kutubxonasi o'rnatilmagan. CSV formatidan foydalaning."
-        except Exception as e:
-            error_msg = f"Excel o'qishda xato: {e}"
-    else:
-        error_msg = "Faqat .csv, .xlsx yoki .xls formatlar qo'llab-quvvatlanadi."
-
-    if error_msg:
-        messages.error(request, error_msg)
+    if not uploaded.name.lower().endswith(SUPPORTED_EXTENSIONS):
+        messages.error(request, "Faqat .csv, .xlsx yoki .xls formatlar qo'llab-quvvatlanadi.")
         return render(request, 'tests_app/manage/bulk_import.html', {'subjects': subjects})
 
-    # Savollarni yaratish
-    created, skipped, errors = 0, 0, []
-    CORRECT_MAP = {'a': 0, 'b': 1, 'c': 2, 'd': 3}
-
-    for i, row in enumerate(rows, start=2):
-        def g(key):
-            # case-insensitive key lookup
-            for k, v in row.items():
-                if k and k.lower().strip() == key:
-                    return str(v).strip() if v else ''
-            return ''
-
-        question_text = g('question_text') or g('savol') or g('text')
-        opt_a = g('option_a') or g('a')
-        opt_b = g('option_b') or g('b')
-        opt_c = g('option_c') or g('c')
-        opt_d = g('option_d') or g('d')
-        correct_raw = (g('correct_answer') or g('correct') or g('javob')).strip().lower()
-        difficulty = g('difficulty') or g('qiyinlik') or default_difficulty
-        topic_name = g('topic_name') or g('topic') or g('mavzu') or ''
-        explanation = g('explanation') or g('tushuntirish') or ''
-
-        if not question_text or not opt_a or not opt_b:
-            errors.append(f"Qator {i}: savol matni yoki javoblar to'liq emas")
-            skipped += 1
-            continue
+    job_id, path = save_upload(uploaded)
+    start_job(job_id, subject.id)
+    import_questions_file.delay(job_id, path, subject.id, default_difficulty, request.user.id)
 
-        correct_idx = CORRECT_MAP.get(correct_raw)
-        if correct_idx is None:
-            errors.append(f"Qator {i}: to'g'ri javob noto'g'ri ({correct_raw!r}). A/B/C/D bo'lishi kerak")
-            skipped += 1
-            continue
+    return redirect(f"{reverse('tests_app:manage_bulk_import')}?job={job_id}")
 
-        if difficulty not in ('easy', 'medium', 'hard', 'expert'):
-            difficulty = default_difficulty
 
-        topic = None
-        if topic_name:
-            topic, _ = Topic.objects.get_or_create(
-                subject=subject,
-                name__iexact=topic_name,
-                defaults={'name': topic_name, 'slug': topic_name.lower().replace(' ', '-')}
-            )
-
-        q = Question.objects.create(
-            subject=subject,
-            topic=topic,
-            text=question_text,
-            difficulty=difficulty,
-            explanation=explanation,
-            created_by=request.user,
-        )
-        options = [opt_a, opt_b, opt_c, opt_d]
-        for idx, opt_text in enumerate(options):
-            if not opt_text:
-                continue
-            Answer.objects.create(
-                question=q,
-                text=opt_text,
-                is_correct=(idx == correct_idx),
-            )
-        created += 1
-
-    # Result message
-    msg = f"{created} ta savol muvaffaqiyatli qo'shildi."
-    if skipped:
-        msg += f" {skipped} ta qator o'tkazib yuborildi."
-    if errors:
-        messages.warning(request, msg + " Xatolar: " + "; ".join(errors[:5]))
-    else:
-        messages.success(request, msg)
-
-    return redirect('tests_app:manage_tests_list')
+@staff_member_required
+@require_GET
+def manage_bulk_import_status(request, job_id):
+    """Staff: bulk import jarayoni (sahifa polling qiladi)."""
+    from .bulk_import import get_status
+
+    job = get_status(job_id)
+    if job is None:
+        return JsonResponse({'success': False, 'error': 'Import topilmadi'}, status=404)
+    return JsonResponse({'success': True, **job})
 
 
 @staff_member_required